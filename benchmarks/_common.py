@@ -0,0 +1,13 @@
+"""
+Helpers shared by the benchmarks.
+"""
+import time
+
+
+def timed(f, *args):
+    """
+    Returns the result of f(*args) and the seconds it took.
+    """
+    time_start = time.perf_counter()
+    result = f(*args)
+    return result, time.perf_counter() - time_start
@@ -0,0 +1,62 @@
+"""
+Page load of the Google Flights searches of a recordings folder (see Scrape(record=...)), default vs lean browser profile:
+time until the results are ready, bytes transferred and number of flights parsed from the page.
+The recordings only give the searches to load: this needs Chrome and network access.
+
+python -m benchmarks.bench_browser_profile recordings_folder [n_pages]
+"""
+import os
+import sys
+import time
+
+from selenium.webdriver.support.ui import WebDriverWait
+
+from src.google_flight_analysis.browser import BrowserProfile
+from src.google_flight_analysis.replay import list_recordings, parse_recording_filename
+from src.google_flight_analysis.scrape import Scrape
+
+
+def searches(folder, n_pages):
+    res = []
+    for filepath in list_recordings(folder)[:n_pages]:
+        params = parse_recording_filename(os.path.basename(filepath))
+        res.append(Scrape(params['origin'], params['dest'], params['date_leave'], date_return=params['date_return']))
+    return res
+
+
+def load_pages(profile, scrapes, timeout=15):
+    """
+    Returns [(seconds until ready, bytes transferred, flights parsed)] for each search, loaded in one browser.
+    """
+    driver = profile.create_driver()
+    res = []
+    try:
+        for scrape in scrapes:
+            BrowserProfile.transferred_bytes(driver)  # empties the log
+            time_start = time.perf_counter()
+            driver.get(scrape._make_url())
+            WebDriverWait(driver, timeout).until(lambda d: Scrape._page_state(d)['lines'] > 40)
+            seconds = time.perf_counter() - time_start
+
+            n_bytes = BrowserProfile.transferred_bytes(driver)
+            n_flights = len(scrape._clean_results_batch(Scrape._get_flight_elements(driver)))
+            res.append((seconds, n_bytes, n_flights))
+    finally:
+        driver.quit()
+    return res
+
+
+if __name__ == "__main__":
+    folder = sys.argv[1]
+    n_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    scrapes = searches(folder, n_pages)
+
+    results = {name: load_pages(BrowserProfile.preset(name, log_network=True), scrapes)
+               for name in BrowserProfile.PRESETS}
+
+    print(f"{len(scrapes)} pages")
+    for name, pages in results.items():
+        seconds = sum(page[0] for page in pages)
+        n_bytes = sum(page[1] for page in pages)
+        print(f"{name:8} {seconds / len(pages):.2f} sec/page, {n_bytes / len(pages) / 1024:.0f} KiB/page, "
+              f"{sum(page[2] for page in pages)} flights")
@@ -0,0 +1,43 @@
+"""
+Pre-insert transform of the scraped rows (Database.transform_and_clean_df):
+ast.literal_eval string hacks (previous version) vs the adapters (adapt_for_postgres / adapt_for_mssql).
+
+python -m benchmarks.bench_db_transform [n_rows]
+"""
+import ast
+import sys
+
+import numpy as np
+import pandas as pd
+
+from benchmarks._common import timed
+from src.google_flight_analysis.adapters import adapt_for_postgres, adapt_for_mssql
+from src.google_flight_analysis.scrape import Scrape
+from src.google_flight_analysis.replay import load_tokens
+
+
+def literal_eval_transform(df):
+    """
+    Database.transform_and_clean_df before the adapters.
+    """
+    df["airlines"] = df.airlines.apply(lambda x: np.array(ast.literal_eval(str(x).replace("[", '"{').replace("]", '}"'))))
+    df["layover_location"] = df.layover_location.apply(lambda x: np.array(ast.literal_eval(str(x).replace("[", '"{').replace("]", '}"'))))
+    df['layover_time'] = df['layover_time'].fillna(np.nan).replace([np.nan], [None])
+    df["layover_location"] = df["layover_location"].fillna(np.nan).replace([np.nan], [None])
+    df["price_value"] = df["price_value"].fillna(np.nan).replace([np.nan], [None])
+    for col in df.select_dtypes(include='datetime').columns:
+        df[col] = df[col].astype(object).where(df[col].notna(), None)
+    return df
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    page = Scrape("DFW", "AVL", "2023-08-19")._clean_results_batch(load_tokens("assets/bigList.csv")).dataframe()
+    df = pd.concat([page] * (n_rows // len(page) + 1), ignore_index=True).iloc[:n_rows]
+
+    print(f"{n_rows} rows")
+    # the transforms modify their DataFrame: each gets its own copy
+    print(f"literal_eval:       {timed(literal_eval_transform, df.copy())[1]:.2f} sec")
+    print(f"adapt_for_postgres: {timed(adapt_for_postgres, df.copy())[1]:.2f} sec")
+    print(f"adapt_for_mssql:    {timed(adapt_for_mssql, df.copy())[1]:.2f} sec")
@@ -0,0 +1,33 @@
+"""
+Duration parsing of the travel_time and layover_time columns on 1M rows:
+row by row (Flight.get_duration_in_minutes_from_string through .apply) vs vectorized (Flight.get_durations_in_minutes).
+
+python -m benchmarks.bench_durations [n_rows]
+"""
+import sys
+
+import numpy as np
+import pandas as pd
+
+from benchmarks._common import timed
+from src.google_flight_analysis.flight import Flight
+
+
+def make_column(n_rows, seed=0):
+    rng = np.random.default_rng(seed)
+    pool = [f"{h} hr {m} min" for h in range(1, 24) for m in range(60)] + [f"{m} min" for m in range(1, 60)] + \
+           [f"{h} hr" for h in range(1, 24)] + [None, ["Change of airport"]]
+    return pd.Series([pool[i] for i in rng.integers(0, len(pool), n_rows)], dtype=object)
+
+
+if __name__ == "__main__":
+    n_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    column = make_column(n_rows)
+
+    expected, t_apply = timed(lambda s: s.apply(Flight.get_duration_in_minutes_from_string), column)
+    result, t_vectorized = timed(Flight.get_durations_in_minutes, column)
+
+    pd.testing.assert_series_equal(result, expected, check_dtype=False)
+    print(f"{n_rows} rows")
+    print(f"apply:      {t_apply:.2f} sec")
+    print(f"vectorized: {t_vectorized:.2f} sec ({t_apply / t_vectorized:.1f}x)")
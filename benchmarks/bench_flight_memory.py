@@ -0,0 +1,90 @@
+"""
+Memory held by parsed flights: bytes per Flight (slotted, parsed fields only) vs the previous layout
+(a __dict__ of ~30 attributes, including the parse-time lists _times, _daysOfWeek and _trash).
+
+python -m benchmarks.bench_flight_memory [n_flights ...]
+"""
+import sys
+import time
+import tracemalloc
+
+from src.google_flight_analysis.flight import Flight, _FlightParser, _parse_date
+from src.google_flight_analysis.replay import load_tokens
+from src.google_flight_analysis.scrape import Scrape
+
+
+class DictFlight:
+    """
+    Flight as it was laid out before __slots__: same parsed values, plus the scratch state.
+    """
+
+    def __init__(self, dl, roundtrip, queried_orig, queried_dest, price_trend, args):
+        parser = _FlightParser(dl, queried_orig, queried_dest).parse(args)
+        self._roundtrip = roundtrip
+        self._id = 1
+        self._origin = parser.origin
+        self._queried_orig = queried_orig
+        self._dest = parser.dest
+        self._queried_dest = queried_dest
+        self._date = dl
+        self._daysOfWeek = parser.days_of_week
+        self._depart_day_leave = parser.depart_day_leave
+        self._depart_day_arrive = parser.depart_day_arrive
+        self._depart_time_leave = parser.depart_time_leave
+        self._depart_time_arrive = parser.depart_time_arrive
+        self._dow = _parse_date(dl).isoweekday()
+        self._airline = parser.airline
+        self._flight_time = parser.flight_time
+        self._num_stops = parser.num_stops
+        self._return_day_leave = None
+        self._return_day_arrive = None
+        self._return_time_leave = None
+        self._return_time_arrive = None
+        self._stops = parser.stops
+        self._stops_locations = parser.stops_locations
+        self._co2 = parser.co2
+        self._emissions = parser.emissions
+        self._price = parser.price
+        self._currency = parser.currency
+        self._price_trend = price_trend
+        self._times = parser.times
+        self._has_train = parser.has_train
+        self._trash = parser.trash
+
+
+def load_flights_tokens():
+    _, flights_tokens = Scrape("DFW", "AVL", "2023-08-19")._split_results(load_tokens("assets/bigList.csv"))
+    return flights_tokens
+
+
+def bytes_per_flight(cls, flights_tokens, n_flights):
+    """
+    Returns the memory allocated per flight (including its share of the holding list) and the time taken.
+    """
+    price_trend = ("low", "44")
+    tracemalloc.start()
+    time_start = time.perf_counter()
+    before = tracemalloc.get_traced_memory()[0]
+
+    flights = [cls("2023-08-19", False, "DFW", "AVL", price_trend, flights_tokens[i % len(flights_tokens)])
+               for i in range(n_flights)]
+
+    allocated = tracemalloc.get_traced_memory()[0] - before
+    elapsed = time.perf_counter() - time_start
+    tracemalloc.stop()
+    del flights
+
+    return allocated / n_flights, elapsed
+
+
+if __name__ == "__main__":
+    sizes = [int(x) for x in sys.argv[1:]] or [100_000, 1_000_000]
+    flights_tokens = load_flights_tokens()
+
+    for n_flights in sizes:
+        old, t_old = bytes_per_flight(DictFlight, flights_tokens, n_flights)
+        new, t_new = bytes_per_flight(Flight, flights_tokens, n_flights)
+        print(f"{n_flights} flights")
+        print(f"__dict__:  {old:.0f} bytes/flight, {old * n_flights / 1024 ** 2:.0f} MB ({t_old:.1f} sec)")
+        print(f"__slots__: {new:.0f} bytes/flight, {new * n_flights / 1024 ** 2:.0f} MB ({t_new:.1f} sec)"
+              f" -{(1 - new / old) * 100:.0f}%")
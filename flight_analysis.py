@@ -7,15 +7,26 @@ import os
 logger_name = os.path.basename(__file__)
 logger = utils.setup_logger(logger_name)
 
+import argparse
 import csv
+import socket
 import numpy as np
 import pandas as pd
 from datetime import timedelta, datetime
-from utils import checkRoutes
 import configparser
 
 from src.google_flight_analysis.scrape import Scrape
+from src.google_flight_analysis.driver_pool import DriverPool
+from src.google_flight_analysis.browser import BrowserProfile
+from src.google_flight_analysis.executor import ScrapeExecutor
+from src.google_flight_analysis.planner import SchedulePlanner, FreshnessFilter
+from src.google_flight_analysis.cache import PageCache
 from src.google_flight_analysis.database import Database
+from src.google_flight_analysis.sink import DatabaseSink
+from src.google_flight_analysis.jobqueue import JobQueue
+from src.google_flight_analysis.checkpoint import RunCheckpoint, new_run_id
+from src.google_flight_analysis.retry import RetryPolicy, CircuitBreaker
+from src.google_flight_analysis.metrics import metrics
 import private.private as private
 
 # config
@@ -23,155 +34,158 @@ config = configparser.ConfigParser()
 config.read(os.path.join(os.path.dirname(__file__), "config.ini"))
 
 
+def open_job_queue(db):
+    """
+    Returns the JobQueue of the [queue] config section: a SQLite file, or a table in the database.
+    """
+    section = config["queue"]
+    options = {'lease_seconds': section.getint("lease_seconds", fallback=600),
+               'max_attempts': section.getint("max_attempts", fallback=3)}
+    if section.get("backend", fallback="sqlite") == "database":
+        queue = JobQueue.from_database(db, **options)
+    else:
+        queue = JobQueue.sqlite(section.get("sqlite_path", fallback="queue.db"), **options)
+    queue.create()
+    return queue
+
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--plan", action="store_true",
+                        help="add the planned scrapes to the job queue ([queue] in config.ini) instead of scraping them")
+    parser.add_argument("--worker", action="store_true",
+                        help="scrape the jobs of the job queue, alongside any number of other workers")
+    parser.add_argument("--resume", nargs="?", const="latest", metavar="RUN_ID",
+                        help="resume a run that did not finish (the latest one by default), see [checkpoint] in config.ini")
+    args = parser.parse_args()
 
     # TODO: feed this information in somehow else.
     ourCountry = 'US'
     ourCurrency = 'USD'
 
+    metrics.reset()
+
     # 1. scrape routes
     routes = utils.get_routes_from_config(config)
 
-    # verify config.ini formats
-    newMethod, newNewMethod = checkRoutes(routes)
-
     # TODO: find usage for airportData?
     # airportData = utils.updateAirportCodes(True)
 
-    # compute number of total scrapes
-    if newMethod:
-        n_total_scrapes = sum(2*[x[3] for x in routes], len(routes))
-    elif newNewMethod:
-        n_total_scrapes = sum(((x[4] + x[4]) + 1) ** 2 for x in routes)
-    else:
-        n_total_scrapes = sum([x[2] for x in routes])
-    
-    all_results = []
-    all_iter_times = []
-    n_iter = 1
-
-    # iterate over the routes
-    for route in routes:
-        origin = route[0]
-        destination = route[1]
-        date_range = []
-        
-        # [origin, destination, target_date (YYYY - MM - DD), flexible_day_range]
-        if newMethod:
-            flexibleDays = route[3]
-            date_obj = datetime.strptime(route[2], "%Y-%m-%d")
-            for counter in range(flexibleDays, 0, -1):
-                date_range.append((date_obj - timedelta(days=counter)))
-            date_range.append(date_obj)
-            for counter in range(flexibleDays):
-                date_range.append((date_obj + timedelta(days=counter+1)))
-        
-        # [origin, destination, to (YYYY - MM -DD), returndate (YYYY - MM - DD), flexible_day_range]
-        # TODO turn into def(s)
-        elif newNewMethod:
-            flexibleDays = route[4]
-            to_date_obj = datetime.strptime(route[2], "%Y-%m-%d")
-            return_date_obj = datetime.strptime(route[3], "%Y-%m-%d")
-            for counter in range(flexibleDays, 0, -1):
-                toDate = to_date_obj - timedelta(days=counter)
-                for counter2 in range(flexibleDays, 0, -1):
-                    date_range.append([toDate, (return_date_obj - timedelta(days=counter2))])
-                date_range.append([toDate, return_date_obj])
-                for counter3 in range(flexibleDays):
-                    date_range.append([toDate, (return_date_obj + timedelta(days=counter3+1))])
-            
-            toDate = to_date_obj
-            for counter2 in range(flexibleDays, 0, -1):
-                date_range.append([toDate, (return_date_obj - timedelta(days=counter2))])
-            date_range.append([toDate, return_date_obj])
-            for counter3 in range(flexibleDays):
-                date_range.append([toDate, (return_date_obj + timedelta(days=counter3+1))])
-
-            for counter in range(flexibleDays):
-                toDate = to_date_obj + timedelta(days=counter)
-                for counter2 in range(flexibleDays, 0, -1):
-                    date_range.append([toDate, (return_date_obj - timedelta(days=counter2))])
-                date_range.append([toDate, return_date_obj])
-                for counter3 in range(flexibleDays):
-                    date_range.append([toDate, (return_date_obj + timedelta(days=counter3+1))])
-
-            # remove anywhere returnDate is ON or BEFORE toDate
-            # TODO add parameter (min travel time) so we can also cut out trips that aren't X in length. Would need to go in config.ini
-
-            removal_dates = []
-            for index, dates in enumerate(date_range):
-                if dates[0] >= dates[1]:
-                    removal_dates.append(dates)
-            
-            for removal in removal_dates:
-                date_range.remove(removal)
-
-
-        # [origin, destination, range_of_days_from_today]
-        else:
-            date_range = [(datetime.today() + timedelta(days=i+1)) for i in range(route[2])]
-        
-        # [origin, destination, to (YYYY - MM -DD), returndate (YYYY - MM - DD), flexible_day_range]
-        if newNewMethod:
-            date_range_str = []
-            for date in date_range:
-                to_date_str = date[0].strftime("%Y-%m-%d")
-                from_date_str = date[1].strftime("%Y-%m-%d")
-                date_range_str.append([to_date_str, from_date_str])
-            
-            date_range = date_range_str
-        else:
-            date_range = [date.strftime("%Y-%m-%d") for date in date_range]
-
-        # iterate over dates
-        for i, date in enumerate(date_range):
-            if newNewMethod:
-                scrape = Scrape(origin, destination, date[0], ourCountry, ourCurrency, date[1])
-            else:
-                scrape = Scrape(origin, destination, date, ourCountry, ourCurrency)
-
-            try:
-                time_start = datetime.now()
-                
-                # run scrape
-                scrape.run_scrape()
-                
-                time_end = datetime.now()
-
-                time_iteration = (time_end - time_start).seconds + round(((time_end - time_start).microseconds * 1e-6), 2)
-                all_iter_times.append(time_iteration)
-                avg_iter_time = round(np.array(all_iter_times).mean(), 2)
-
-                if newNewMethod:
-                    logger.info(f"[{n_iter}/{n_total_scrapes}] [{time_iteration} sec - avg: {avg_iter_time}] Scraped: {origin} {destination} {date[0]} - {date[1]} - {scrape.data.shape[0]} results")
-                else:
-                    logger.info(f"[{n_iter}/{n_total_scrapes}] [{time_iteration} sec - avg: {avg_iter_time}] Scraped: {origin} {destination} {date} - {scrape.data.shape[0]} results")
-                all_results.append(scrape.data)
-            except Exception as e:
-                logger.error(f"ERROR: {origin} {destination} {date}")
-                logger.error(e)
-                
-            n_iter += 1
-
-    all_results_df = pd.concat(all_results)
-
-    # save to csv so we don't keep re-running
-    # if newNewMethod:
-    #     all_results_df.to_csv('flight-analysis/flight-analysis/assets/dataframe_roundtrip.csv', index=False)
-    # else:
-    #     all_results_df.to_csv('flight-analysis/flight-analysis/assets/dataframe_oneway.csv', index=False)
-
-
-    # grab our csv so we don't keep polling
-    # TODO need to choose to load oneway or round trip someway.
-    # all_results_df = pd.read_csv('flight-analysis/flight-analysis/assets/dataframe_oneway.csv')
-
-    # 2. add results to sql database
+    # warm browsers reused across scrapes, one per worker
+    workers = config.getint("scrape", "workers", fallback=1)
+    profile = BrowserProfile.preset(config.get("scrape", "browser_profile", fallback="default"))
+    driver_pool = DriverPool(lambda: Scrape.create_driver(profile), size=workers,
+                             max_pages=config.getint("driver_pool", "max_pages", fallback=50),
+                             max_rss_mb=config.getint("driver_pool", "max_rss_mb", fallback=None))
+    # pages scraped less than ttl_hours ago are served from the cache
+    cache = None
+    if config.has_option("cache", "folder"):
+        cache = PageCache(config.get("cache", "folder"),
+                          ttl=timedelta(hours=config.getfloat("cache", "ttl_hours", fallback=6)),
+                          max_bytes=config.getint("cache", "max_mb", fallback=500) * 1024 ** 2)
+    executor = ScrapeExecutor(workers, ourCountry, ourCurrency,
+                              min_interval=config.getfloat("scrape", "min_interval", fallback=0.0),
+                              driver_pool=driver_pool,
+                              record=config.get("scrape", "record_folder", fallback=None),
+                              cache=cache,
+                              # the rows of cached pages are in the database already
+                              skip_cached=True,
+                              extraction=config.get("scrape", "extraction", fallback="text"),
+                              retry_policy=RetryPolicy.from_config(config["retry"]) if config.has_section("retry") else None,
+                              circuit_breaker=(CircuitBreaker.from_config(config["circuit_breaker"])
+                                               if config.has_section("circuit_breaker") else None))
+
     # connect to database
     db = Database(db_host=private.DB_HOST, db_name=private.DB_NAME, db_user=private.DB_USER, db_pw=private.DB_PW, db_table=private.DB_TABLE, db_sql=private.DB_SQL)
 
     # prepare database and tables
     db.prepare_db_and_tables(overwrite_table=False)
 
-    # add results to database
-    db.add_pandas_df_to_db(all_results_df)
+    # checkpoints: the jobs done and the results not yet in the database are saved, for --resume
+    checkpoint = None
+    if not args.worker and not args.plan and config.has_option("checkpoint", "folder"):
+        folder = config.get("checkpoint", "folder")
+        run_id = RunCheckpoint.latest(folder) if args.resume == "latest" else args.resume
+        if args.resume is not None and run_id is None:
+            logger.info("No unfinished run to resume, starting a new one")
+        checkpoint = RunCheckpoint(folder, run_id)
+        logger.info(f"Run {checkpoint.run_id}" + (f" resumed, {checkpoint.n_done} jobs already done" if run_id else ""))
+    run_id = checkpoint.run_id if checkpoint is not None else new_run_id()
+
+    if args.worker:
+        # jobs claimed from the shared queue, with a lease renewed while they are scraped
+        queue = open_job_queue(db)
+        jobs = queue.consume(f"{socket.gethostname()}:{os.getpid()}", prefetch=workers)
+        logger.info(f"Worker started, {len(jobs)} jobs left in the queue")
+    else:
+        # incremental mode: searches already in the database and fresher than their window are not scraped again
+        skip = None
+        if config.getboolean("freshness", "enabled", fallback=False):
+            skip = FreshnessFilter.from_config(db, config["freshness"])
+        # resumed run: jobs scraped before the restart are not scraped again
+        if checkpoint is not None:
+            skip = (lambda job, fresh=skip: job in checkpoint or (fresh is not None and fresh(job)))
+
+        # one scrape job per (route, date), duplicates across overlapping routes removed
+        jobs = SchedulePlanner(routes,
+                               min_stay=config.getint("planner", "min_stay", fallback=None),
+                               max_stay=config.getint("planner", "max_stay", fallback=None),
+                               skip=skip)
+        logger.info(f"{jobs.count()} scrapes planned for {len(routes)} routes")
+
+        if args.plan:
+            queue = open_job_queue(db)
+            # the jobs done or failed in a previous run are planned again
+            queue.plan(jobs)
+            logger.info(f"Job queue: {queue.counts()}")
+            raise SystemExit(0)
+
+    # jobs are done once their results are in the database
+    def on_written(written):
+        if args.worker:
+            for job in written:
+                jobs.done(job)
+        elif checkpoint is not None:
+            checkpoint.commit(written)
+
+    # 2. scrape all jobs, N at a time, and add the results to the database as they come in
+    sink = DatabaseSink(db, method=config.get("database", "load_method", fallback="insert"),
+                        flush_rows=config.getint("database", "flush_rows", fallback=5000),
+                        queue_size=config.getint("database", "queue_size", fallback=4),
+                        parquet_folder=config.get("export", "parquet_folder", fallback=None),
+                        run_id=run_id, on_written=on_written)
+    try:
+        # results scraped before the restart that did not make it to the database
+        if checkpoint is not None:
+            for job, df in checkpoint.pending():
+                sink.write(df, job)
+
+        for job, df in executor.iter_results(jobs, on_error=jobs.failed if args.worker else None):
+            if checkpoint is not None:
+                checkpoint.save(job, df)
+            sink.write(df, job)
+    finally:
+        # the last batches are written (and their jobs done) before the jobs still held are given back
+        sink.close()
+        if args.worker:
+            jobs.close()
+        driver_pool.close()
+
+    if checkpoint is not None:
+        if sink.stats['failed_batches']:
+            # their results are still in the checkpoint
+            checkpoint.close()
+            logger.warning(f"{sink.stats['failed_batches']} batches not written to the database, "
+                           f"run `flight_analysis.py --resume {checkpoint.run_id}` to write them")
+        else:
+            checkpoint.finish()
+
+    if cache is not None:
+        logger.info(f"Page cache: {cache.stats}")
+
+    # time spent per phase (driver start, page load, parse, database...)
+    for line in metrics.summary():
+        logger.info(line)
+    for option in ("file", "json_file"):
+        if config.has_option("metrics", option):
+            metrics.export(config.get("metrics", option))
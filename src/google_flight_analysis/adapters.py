@@ -0,0 +1,224 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+__all__ = ['pg_array_literal', 'pg_copy_chunks', 'CopyStream', 'mssql_rows', 'adapt_for_postgres', 'adapt_for_mssql']
+
+# escapes of the Postgres COPY text format
+_COPY_ESCAPES = str.maketrans({'\\': '\\\\', '\t': '\\t', '\n': '\\n', '\r': '\\r'})
+_COPY_NULL = '\\N'
+
+# columns holding lists of strings (multi stop layovers can be a single "FRA, JFK" string)
+_LIST_COLUMNS = ['airlines', 'layover_location']
+
+
+def pg_array_literal(values):
+    """
+    Returns the Postgres array literal of a list of strings, for example:
+    ['Lufthansa', 'Air "Dolomiti", Inc'] --> {"Lufthansa","Air \\"Dolomiti\\", Inc"}
+    """
+    elements = []
+    for value in values:
+        if value is None:
+            elements.append('NULL')
+        else:
+            elements.append('"' + str(value).replace('\\', '\\\\').replace('"', '\\"') + '"')
+    return '{' + ','.join(elements) + '}'
+
+
+def adapt_for_postgres(df):
+    """
+    Returns a copy of a DataFrame ready to be inserted with psycopg2: list columns as Python lists
+    (adapted by psycopg2 to ARRAY[...] for the airlines text[] column) or array literals for the layover_location
+    text column (as written by COPY), missing values (NaN, NaT) as None.
+    """
+    return _adapt(df, {'airlines': lambda x: x, 'layover_location': pg_array_literal})
+
+
+def adapt_for_mssql(df):
+    """
+    Returns a copy of a DataFrame ready to be inserted with pyodbc: list columns as JSON arrays
+    (["Lufthansa", "Condor"], for the varchar columns), missing values (NaN, NaT) as None.
+    """
+    return _adapt(df, {'airlines': json.dumps, 'layover_location': json.dumps})
+
+
+def _adapt(df, list_adapters):
+    """
+    Maps every column to an object column of plain Python values (None where missing), then formats the list columns.
+    """
+    data = {}
+    for col in df.columns:
+        if col in list_adapters:
+            data[col] = _object_array(_adapt_list_column(df[col], list_adapters[col]))
+        else:
+            data[col] = _python_values(df[col])
+    return pd.DataFrame(data, index=df.index, dtype=object)
+
+
+def _python_values(s):
+    """
+    Returns the values of a column as an object array of Python values, None where missing,
+    converting whole numpy arrays at once instead of boxing pandas scalars one by one.
+    """
+    if pd.api.types.is_datetime64_any_dtype(s):
+        # NaT becomes None
+        return _object_array(s.to_numpy(dtype='datetime64[us]').tolist())
+
+    values = _object_array(s.to_numpy().tolist())
+    if not pd.api.types.is_bool_dtype(s) and not pd.api.types.is_integer_dtype(s):
+        values[s.isna().to_numpy()] = None
+    return values
+
+
+def _object_array(values):
+    """
+    Returns an object array, keeping lists as single elements.
+    """
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _adapt_list_column(s, adapter):
+    """
+    Returns adapter(list of strings) for each value of a list column, None where missing.
+    Airlines and layovers repeat a lot: each distinct list is adapted once.
+    """
+    cache = {}
+    values = []
+    for x in s.tolist():
+        if x is None or isinstance(x, float):
+            values.append(None)
+            continue
+
+        key = tuple(x) if isinstance(x, (list, np.ndarray)) else x
+        try:
+            values.append(cache[key])
+        except KeyError:
+            cache[key] = adapter(_as_list(x))
+            values.append(cache[key])
+    return values
+
+
+def _as_list(x):
+    """
+    Returns a list value as a list of strings.
+    Multi stop layovers are parsed as a single "FRA, JFK" string: they are split into a list.
+    """
+    if isinstance(x, str):
+        return x.split(", ")
+    return [str(v) for v in x]
+
+
+def pg_copy_chunks(df, chunk_size=10000):
+    """
+    Yields the rows of a DataFrame in the Postgres COPY text format, `chunk_size` rows at a time,
+    so that only one chunk is ever serialized in memory.
+    Missing values become NULL, list columns become array literals.
+    """
+    for chunk_start in range(0, len(df), chunk_size):
+        chunk = df.iloc[chunk_start:chunk_start + chunk_size]
+        columns = [_copy_list_column(chunk[col]) if col in _LIST_COLUMNS else _copy_column(chunk[col])
+                   for col in chunk.columns]
+        yield ''.join('\t'.join(row) + '\n' for row in zip(*columns))
+
+
+def _copy_column(s):
+    """
+    Returns the values of a column as COPY text fields.
+    """
+    if pd.api.types.is_bool_dtype(s):
+        return np.where(s.to_numpy(), 't', 'f').tolist()
+
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return s.dt.strftime('%Y-%m-%d %H:%M:%S.%f').fillna(_COPY_NULL).tolist()
+
+    if pd.api.types.is_numeric_dtype(s):
+        values = s
+        # integer columns with missing values are stored as float: write them back as integers (smallint columns)
+        if pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all():
+            values = s.astype('Int64')
+        return values.astype(str).where(s.notna(), _COPY_NULL).tolist()
+
+    return [_copy_field(x) for x in s.tolist()]
+
+
+def _copy_list_column(s):
+    return [_COPY_NULL if x is None else x for x in _adapt_list_column(s, lambda x: pg_array_literal(x).translate(_COPY_ESCAPES))]
+
+
+def _copy_field(x):
+    if x is None or (isinstance(x, float) and np.isnan(x)):
+        return _COPY_NULL
+    if isinstance(x, (list, tuple, np.ndarray)):
+        return pg_array_literal(x).translate(_COPY_ESCAPES)
+    return str(x).translate(_COPY_ESCAPES)
+
+
+class CopyStream:
+    """
+    Read-only file-like object over text chunks, as expected by cursor.copy_expert.
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = ''
+        self._pos = 0
+
+    def read(self, size=-1):
+        parts = []
+        n = 0
+        while size < 0 or n < size:
+            if self._pos >= len(self._buffer):
+                self._buffer = next(self._chunks, '')
+                self._pos = 0
+                if not self._buffer:
+                    break
+
+            available = len(self._buffer) - self._pos
+            take = available if size < 0 else min(size - n, available)
+            parts.append(self._buffer[self._pos:self._pos + take])
+            self._pos += take
+            n += take
+
+        return ''.join(parts)
+
+
+def mssql_rows(df):
+    """
+    Returns the rows of a DataFrame as a list of tuples of plain Python values (int, float, str, datetime, bool, None),
+    the only types pyodbc can bind with fast_executemany.
+    Missing values become None, arrays (airlines, layover locations) their string form.
+    """
+    return list(zip(*[_mssql_column(df[col]) for col in df.columns]))
+
+
+def _mssql_column(s):
+    if pd.api.types.is_datetime64_any_dtype(s):
+        return [None if pd.isna(x) else x.to_pydatetime() for x in s.tolist()]
+
+    if pd.api.types.is_bool_dtype(s):
+        return [bool(x) for x in s.tolist()]
+
+    if pd.api.types.is_numeric_dtype(s):
+        # integer columns with missing values are stored as float: write them back as integers (smallint columns)
+        integral = pd.api.types.is_float_dtype(s) and (s.dropna() % 1 == 0).all()
+        return [None if x != x else (int(x) if integral else x) for x in s.tolist()]
+
+    return [_mssql_field(x) for x in s.tolist()]
+
+
+def _mssql_field(x):
+    if x is None or (isinstance(x, float) and np.isnan(x)):
+        return None
+    if isinstance(x, pd.Timestamp):
+        return x.to_pydatetime()
+    if isinstance(x, np.ndarray) and x.ndim == 0:
+        return str(x)
+    if isinstance(x, (list, tuple, np.ndarray)):
+        return str(list(x))
+    if isinstance(x, np.generic):
+        return x.item()
+    return x
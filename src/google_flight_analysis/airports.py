@@ -0,0 +1,206 @@
+import csv
+import logging
+import os
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+__all__ = ['Airport', 'AirportIndex', 'AIRPORT_DATA_PATH']
+
+# logging
+logger_name = os.path.basename(__file__)
+logger = logging.getLogger(logger_name)
+
+AIRPORT_DATA_PATH = os.path.join(os.path.dirname(__file__), "..", "..", "assets", "airport_data.csv")
+
+# OpenFlights airports.dat: Airport ID, Name, City, Country, IATA, ICAO, Latitude, Longitude, Altitude,
+# Timezone (hours from UTC), DST, Tz database time zone, Type, Source
+_IATA, _ICAO, _LATITUDE, _LONGITUDE, _UTC_OFFSET, _TZ = 4, 5, 6, 7, 9, 11
+_NAME, _CITY, _COUNTRY = 1, 2, 3
+_NULL = '\\N'
+
+_EARTH_RADIUS_KM = 6371.0088
+
+Airport = namedtuple('Airport', ['iata', 'icao', 'name', 'city', 'country', 'latitude', 'longitude', 'utc_offset', 'tz'])
+
+
+class AirportIndex:
+    """
+    IATA-keyed index of the OpenFlights airports (assets/airport_data.csv), stored as one numpy array per field.
+    Single airports are looked up in O(1) with `index[code]`, whole columns of codes at once with
+    positions / coordinates / distance_km, and enrich adds distance, UTC times and price per km to
+    the output of Flight.dataframe without a Python lookup per row.
+    """
+
+    _ARRAYS = ['iata', 'icao', 'name', 'city', 'country', 'latitude', 'longitude', 'utc_offset', 'tz']
+
+    def __init__(self, iata, icao, name, city, country, latitude, longitude, utc_offset, tz):
+        self._iata = np.asarray(iata, dtype=str)
+        self._icao = np.asarray(icao, dtype=str)
+        self._name = np.asarray(name, dtype=str)
+        self._city = np.asarray(city, dtype=str)
+        self._country = np.asarray(country, dtype=str)
+        self._latitude = np.asarray(latitude, dtype=np.float64)
+        self._longitude = np.asarray(longitude, dtype=np.float64)
+        self._utc_offset = np.asarray(utc_offset, dtype=np.float64)
+        self._tz = np.asarray(tz, dtype=str)
+
+        # hash index: code -> position
+        self._index = pd.Index(self._iata)
+        if not self._index.is_unique:
+            raise ValueError("Duplicate IATA codes in the airport data.")
+
+    def __repr__(self):
+        return f"AirportIndex: {len(self)} airports"
+
+    def __len__(self):
+        return len(self._iata)
+
+    def __contains__(self, code):
+        return code in self._index
+
+    def __getitem__(self, code):
+        i = self._index.get_loc(code)
+        return Airport(*(getattr(self, f"_{field}")[i].item() for field in AirportIndex._ARRAYS))
+
+    @classmethod
+    def load(cls, path=AIRPORT_DATA_PATH, cache=None):
+        """
+        Loads the index from the OpenFlights CSV, or from `cache` (a .npz file) if it is newer than the CSV.
+        The cache is (re)written after parsing the CSV.
+        """
+        if cache is not None and os.path.isfile(cache) and os.path.getmtime(cache) >= os.path.getmtime(path):
+            with np.load(cache, allow_pickle=False) as arrays:
+                return cls(**{field: arrays[field] for field in cls._ARRAYS})
+
+        index = cls.from_csv(path)
+        if cache is not None:
+            index.save(cache)
+        return index
+
+    @classmethod
+    def from_csv(cls, path=AIRPORT_DATA_PATH):
+        """
+        Parses the OpenFlights CSV. Airports without an IATA code are left out, missing values (\\N) become
+        empty strings or NaN.
+        """
+        columns = {field: [] for field in cls._ARRAYS}
+        with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+            for row in csv.reader(csvfile):
+                row = AirportIndex._fix_row(row)
+                if row is None or row[_IATA] in (_NULL, ''):
+                    continue
+
+                columns['iata'].append(row[_IATA])
+                columns['icao'].append(_text(row[_ICAO]))
+                columns['name'].append(_text(row[_NAME]))
+                columns['city'].append(_text(row[_CITY]))
+                columns['country'].append(_text(row[_COUNTRY]))
+                columns['latitude'].append(_number(row[_LATITUDE]))
+                columns['longitude'].append(_number(row[_LONGITUDE]))
+                columns['utc_offset'].append(_number(row[_UTC_OFFSET]))
+                columns['tz'].append(_text(row[_TZ]))
+
+        return cls(**columns)
+
+    def save(self, path):
+        """
+        Saves the arrays in numpy's binary format, to be loaded back with load(cache=path).
+        """
+        # write and rename, so that readers never see a partial file
+        with open(path + ".tmp", 'wb') as f:
+            np.savez(f, **{field: getattr(self, f"_{field}") for field in AirportIndex._ARRAYS})
+        os.replace(path + ".tmp", path)
+
+    def positions(self, codes):
+        """
+        Returns the positions of the codes in the index arrays, -1 for unknown codes.
+        """
+        return self._index.get_indexer(np.asarray(codes, dtype=object))
+
+    def coordinates(self, codes):
+        """
+        Returns the latitudes and longitudes of the codes, NaN for unknown codes.
+        """
+        positions = self.positions(codes)
+        known = positions >= 0
+        latitude = np.where(known, self._latitude[positions], np.nan)
+        longitude = np.where(known, self._longitude[positions], np.nan)
+        return latitude, longitude
+
+    def distance_km(self, origins, destinations):
+        """
+        Returns the great-circle (haversine) distances in km between each origin and destination.
+        """
+        lat1, lon1 = (np.radians(x) for x in self.coordinates(origins))
+        lat2, lon2 = (np.radians(x) for x in self.coordinates(destinations))
+
+        a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+        return 2 * _EARTH_RADIUS_KM * np.arcsin(np.sqrt(a))
+
+    def to_utc(self, local_times, codes):
+        """
+        Converts naive local times at each airport to naive UTC times.
+        Times are converted one time zone at a time; airports without a time zone use their fixed UTC offset.
+        Unknown airports and non-existent local times give NaT.
+        """
+        local_times = pd.Series(pd.to_datetime(local_times)).reset_index(drop=True)
+        positions = self.positions(codes)
+        tz = np.where(positions >= 0, self._tz[positions], None)
+        utc = pd.Series(pd.NaT, index=local_times.index, dtype='datetime64[ns]')
+
+        for zone in pd.unique(tz[pd.notna(tz)]):
+            mask = tz == zone
+            if zone:
+                utc[mask] = (local_times[mask].dt.tz_localize(zone, ambiguous='NaT', nonexistent='NaT')
+                             .dt.tz_convert('UTC').dt.tz_localize(None))
+            else:
+                offset = self._utc_offset[positions[mask]]
+                utc[mask] = local_times[mask] - pd.to_timedelta(offset, unit='h')
+
+        return utc
+
+    def enrich(self, df):
+        """
+        Returns a copy of a Flight.dataframe DataFrame with the added columns:
+        distance_km (great-circle, origin to destination), the UTC departure and arrival times
+        (depart_departure_datetime_utc, ...) and price_per_km (over both legs for round trips).
+        """
+        df = df.copy()
+        origins = df['origin'].to_numpy(dtype=object)
+        destinations = df['destination'].to_numpy(dtype=object)
+
+        df['distance_km'] = self.distance_km(origins, destinations)
+
+        # the outbound leg leaves from the origin, the return leg from the destination
+        for col, codes in [('depart_departure_datetime', origins), ('depart_arrival_datetime', destinations),
+                           ('return_departure_datetime', destinations), ('return_arrival_datetime', origins)]:
+            if col in df.columns:
+                df[col + '_utc'] = self.to_utc(df[col], codes).to_numpy()
+
+        km = df['distance_km'] * np.where(df['one_way'].to_numpy(dtype=bool), 1, 2)
+        df['price_per_km'] = (df['price'] / km.where(km > 0)).astype(np.float64)
+
+        return df
+
+    @staticmethod
+    def _fix_row(row):
+        """
+        Returns the fields of an airports.dat row, or None for blank rows.
+        The CSV in assets was saved by splitting lines on commas and quoting each piece again: those rows
+        are joined back into the original line and parsed once more.
+        """
+        if len(row) <= 1:
+            return None
+        if any(field.startswith('"') for field in row):
+            row = next(csv.reader([','.join(row)]))
+        return row if len(row) > _TZ else None
+
+
+def _text(value):
+    return '' if value == _NULL else value
+
+
+def _number(value):
+    return np.nan if value in (_NULL, '') else float(value)
@@ -0,0 +1,177 @@
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+
+from src.google_flight_analysis.flight import Flight, _FlightParser
+
+__all__ = ['FlightBatch']
+
+
+class FlightBatch:
+    """
+    Parses the raw tokens of one or many result pages straight into typed DataFrame columns,
+    without creating a Flight object per result.
+    The resulting DataFrame has the same columns as Flight.dataframe.
+    """
+
+    # columns filled once per flight
+    _FLIGHT_COLUMNS = ['depart_departure_datetime', 'depart_departure_day', 'depart_arrival_datetime',
+                       'depart_arrival_day', 'return_departure_datetime', 'return_departure_day',
+                       'return_arrival_datetime', 'return_arrival_day', 'airlines', 'travel_time', 'origin',
+                       'destination', 'layover_n', 'layover_time', 'layover_location', 'price', 'price_currency',
+                       'has_train']
+
+    def __init__(self):
+        self._columns = {name: [] for name in FlightBatch._FLIGHT_COLUMNS}
+        # columns shared by all the flights of a page: (n_flights, price_trend, price_value, access_date, one_way)
+        self._pages = []
+        self._n_rows = 0
+
+    def __len__(self):
+        return self._n_rows
+
+    def __repr__(self):
+        return f"FlightBatch: {self._n_rows} flights from {len(self._pages)} pages"
+
+    def add_flights(self, flights_tokens, date_leave, round_trip, queried_orig, queried_dest, price_trend, access_date=None):
+        """
+        Parses the flights of one page, each given as its list of raw tokens.
+        """
+        parser = _FlightParser(date_leave, queried_orig, queried_dest)
+        n_flights = 0
+
+        for tokens in flights_tokens:
+            parser.reset()
+            parser.parse(tokens)
+            self._add_row(parser)
+            n_flights += 1
+
+        self._add_page(n_flights, price_trend, access_date, not round_trip)
+
+    def add_round_trips(self, options, date_leave, date_return, queried_orig, queried_dest, price_trend, access_date=None):
+        """
+        Parses the return flights harvested for each departing option of a round trip page (see
+        Scrape._harvest_return_flights), given as [(departing flight tokens, [return flight tokens, ...])].
+        Each return flight makes one row: the departing flight's columns, the return_* times of the return flight,
+        and the price shown next to the return flight (the price of the whole round trip).
+        """
+        depart_parser = _FlightParser(date_leave, queried_orig, queried_dest)
+        return_parser = _FlightParser(date_return, queried_dest, queried_orig)
+        n_flights = 0
+
+        for depart_tokens, returns_tokens in options:
+            depart_parser.reset()
+            depart_parser.parse(depart_tokens)
+            for tokens in returns_tokens:
+                return_parser.reset()
+                return_parser.parse(tokens)
+                self._add_row(depart_parser, return_parser)
+                n_flights += 1
+
+        self._add_page(n_flights, price_trend, access_date, False)
+
+    def _add_row(self, parser, return_parser=None):
+        columns = self._columns
+        columns['depart_departure_datetime'].append(parser.depart_time_leave)
+        columns['depart_departure_day'].append(parser.depart_day_leave)
+        columns['depart_arrival_datetime'].append(parser.depart_time_arrive)
+        columns['depart_arrival_day'].append(parser.depart_day_arrive)
+        columns['return_departure_datetime'].append(return_parser and return_parser.depart_time_leave)
+        columns['return_departure_day'].append(return_parser and return_parser.depart_day_leave)
+        columns['return_arrival_datetime'].append(return_parser and return_parser.depart_time_arrive)
+        columns['return_arrival_day'].append(return_parser and return_parser.depart_day_arrive)
+        columns['airlines'].append(parser.airline)
+        columns['travel_time'].append(_duration_minutes(parser.flight_time))
+        columns['origin'].append(parser.origin)
+        columns['destination'].append(parser.dest)
+        columns['layover_n'].append(parser.num_stops)
+        columns['layover_time'].append(_duration_minutes(parser.stops))
+        columns['layover_location'].append(parser.stops_locations)
+        columns['price'].append(parser.price if return_parser is None else return_parser.price)
+        columns['price_currency'].append(parser.currency if return_parser is None else return_parser.currency)
+        columns['has_train'].append(parser.has_train)
+
+    def _add_page(self, n_flights, price_trend, access_date, one_way):
+        access_date = datetime.today() if access_date is None else access_date
+        self._pages.append((n_flights, price_trend[0], price_trend[1], access_date, one_way))
+        self._n_rows += n_flights
+
+    def dataframe(self):
+        """
+        Returns the parsed flights as a DataFrame, with the columns of Flight.dataframe.
+        """
+        columns = self._columns
+        page_sizes = [page[0] for page in self._pages]
+
+        def page_column(i, dtype=object):
+            return np.repeat(np.array([page[i] for page in self._pages], dtype=dtype), page_sizes)
+
+        data = {
+            'depart_departure_datetime': _datetime_column(columns['depart_departure_datetime']),
+            'depart_departure_day': _object_column(columns['depart_departure_day']),
+            'depart_arrival_datetime': _datetime_column(columns['depart_arrival_datetime']),
+            'depart_arrival_day': _object_column(columns['depart_arrival_day']),
+            'return_departure_datetime': _datetime_column(columns['return_departure_datetime']),
+            'return_departure_day': _object_column(columns['return_departure_day']),
+            'return_arrival_datetime': _datetime_column(columns['return_arrival_datetime']),
+            'return_arrival_day': _object_column(columns['return_arrival_day']),
+            'airlines': _object_column(columns['airlines']),
+            'travel_time': _numeric_column(columns['travel_time']),
+            'origin': _object_column(columns['origin']),
+            'destination': _object_column(columns['destination']),
+            'layover_n': _numeric_column(columns['layover_n']),
+            'layover_time': _numeric_column(columns['layover_time']),
+            'layover_location': _object_column(columns['layover_location']),
+            'price': _numeric_column(columns['price']),
+            'price_currency': _object_column(columns['price_currency']),
+            'price_trend': page_column(1),
+            'price_value': page_column(2),
+            'access_date': page_column(3, dtype='datetime64[ns]'),
+            'one_way': page_column(4, dtype=bool),
+            'has_train': np.array(columns['has_train'], dtype=bool)
+        }
+        df = pd.DataFrame(data)
+
+        # add column: Days in Advance
+        df['days_advance'] = (df['depart_departure_datetime'] - df['access_date']).dt.days
+
+        return df
+
+
+def _object_column(values):
+    """
+    Returns an object array, keeping lists (airlines, layover locations) as single elements.
+    """
+    column = np.empty(len(values), dtype=object)
+    column[:] = values
+    return column
+
+
+def _datetime_column(values):
+    return np.array(values, dtype='datetime64[ns]')
+
+
+def _numeric_column(values):
+    """
+    Returns an int64 array, or a float64 array with NaN where values are missing.
+    """
+    column = np.array(values, dtype=np.float64)
+    if np.isnan(column).any():
+        return column
+    return column.astype(np.int64)
+
+
+def _duration_minutes(s):
+    """
+    Flight.get_duration_in_minutes_from_string, cached for the (very repetitive) duration strings.
+    """
+    if isinstance(s, list): # change of airport
+        return Flight.get_duration_in_minutes_from_string(s)
+    return _cached_duration_minutes(s)
+
+
+@lru_cache(maxsize=4096)
+def _cached_duration_minutes(s):
+    return Flight.get_duration_in_minutes_from_string(s)
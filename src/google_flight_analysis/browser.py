@@ -0,0 +1,132 @@
+import json
+import logging
+import os
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.chrome.service import Service
+from webdriver_manager.chrome import ChromeDriverManager
+
+__all__ = ['BrowserProfile']
+
+# logging
+logger_name = os.path.basename(__file__)
+logger = logging.getLogger(logger_name)
+
+# requests that play no part in the text of the results list: images, fonts, media and trackers
+_LEAN_BLOCKED_URLS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.webp", "*.ico", "*.svg",
+    "*.woff", "*.woff2", "*.ttf", "*.otf",
+    "*.mp4", "*.webm",
+    "*fonts.gstatic.com*", "*fonts.googleapis.com*",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googleadservices.com*",
+    "*/gen_204*", "*/log?*"
+]
+
+_LEAN_ARGUMENTS = [
+    "--blink-settings=imagesEnabled=false",
+    "--disable-extensions",
+    "--disable-background-networking",
+    "--disable-default-apps",
+    "--disable-sync",
+    "--disable-translate",
+    "--disable-notifications",
+    "--mute-audio",
+    "--no-first-run"
+]
+
+# 2: block
+_LEAN_PREFS = {
+    "profile.managed_default_content_settings.images": 2,
+    "profile.managed_default_content_settings.media_stream": 2,
+    "profile.managed_default_content_settings.notifications": 2,
+    "profile.managed_default_content_settings.geolocation": 2
+}
+
+
+class BrowserProfile:
+    """
+    Settings of the Chrome browsers that load the Google Flights pages.
+    On top of the Chrome options (arguments, prefs), requests matching `blocked_urls` are dropped by the
+    browser itself (DevTools Network.setBlockedURLs), before they are sent.
+    Presets:
+    - default: full headless Chrome, every resource of the page is loaded
+    - lean: images, fonts, media and tracking requests are blocked, background features turned off;
+      the window stays 1920x1080, as the results list hides some fields (layovers, emissions) in smaller windows
+    """
+
+    PRESETS = ('default', 'lean')
+
+    def __init__(self, name='custom', headless=True, window_size=(1920, 1080), incognito=True, arguments=None,
+                 prefs=None, blocked_urls=None, log_network=False):
+        self.name = name
+        self.headless = headless
+        self.window_size = window_size
+        self.incognito = incognito
+        self.arguments = [] if arguments is None else list(arguments)
+        self.prefs = {} if prefs is None else dict(prefs)
+        self.blocked_urls = [] if blocked_urls is None else list(blocked_urls)
+        # keeps the DevTools network events in the performance log, to measure the bytes transferred
+        self.log_network = log_network
+
+    def __repr__(self):
+        return f"BrowserProfile: {self.name}, {len(self.blocked_urls)} blocked url patterns"
+
+    @classmethod
+    def preset(cls, name, **kwargs):
+        """
+        Returns the profile of a preset (see PRESETS); keyword arguments override its settings.
+        """
+        if name == 'default':
+            return cls(name, **kwargs)
+        if name == 'lean':
+            settings = {'arguments': _LEAN_ARGUMENTS, 'prefs': _LEAN_PREFS, 'blocked_urls': _LEAN_BLOCKED_URLS}
+            return cls(name, **{**settings, **kwargs})
+        raise ValueError(f"Unknown browser profile {name}, expected one of {BrowserProfile.PRESETS}.")
+
+    def options(self):
+        """
+        Returns the Chrome options of the profile.
+        """
+        options = Options()
+        options.add_argument('--no-sandbox')
+        if self.headless:
+            options.add_argument('--headless')
+        # otherwise data such as layover location and emissions is not displayed
+        options.add_argument(f"--window-size={self.window_size[0]},{self.window_size[1]}")
+        if self.incognito:
+            options.add_argument("--incognito")
+        for argument in self.arguments:
+            options.add_argument(argument)
+        if self.prefs:
+            options.add_experimental_option("prefs", self.prefs)
+        if self.log_network:
+            options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        return options
+
+    def create_driver(self):
+        """
+        Starts a Chrome browser with the profile.
+        """
+        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=self.options())
+        if self.blocked_urls:
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": self.blocked_urls})
+        logger.debug(f"Chrome started with browser profile {self.name}")
+        return driver
+
+    @staticmethod
+    def transferred_bytes(driver):
+        """
+        Returns the bytes received over the network since the last call (log_network profiles only):
+        the sum of the encoded sizes of the finished requests in the performance log, which is emptied.
+        """
+        total = 0
+        for entry in driver.get_log("performance"):
+            # entries are JSON strings, only parse the ones that can matter
+            if "Network.loadingFinished" not in entry["message"]:
+                continue
+            message = json.loads(entry["message"])["message"]
+            if message["method"] == "Network.loadingFinished":
+                total += message["params"].get("encodedDataLength", 0)
+        return total
@@ -0,0 +1,170 @@
+import gzip
+import hashlib
+import heapq
+import json
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+
+__all__ = ['PageCache']
+
+# logging
+logger_name = os.path.basename(__file__)
+logger = logging.getLogger(logger_name)
+
+
+class PageCache:
+    """
+    Compressed on-disk cache of the raw text strings of scraped pages.
+    Entries are stored as {folder}/{key[:2]}/{key}_{timestamp}.json.gz, where key is the SHA-256 of
+    the page URL and timestamp the time of the scrape, so a URL can have many entries over time.
+    Pages scraped less than `ttl` ago are served from the cache; the oldest entries are evicted
+    once the cache grows over `max_bytes`.
+    """
+
+    def __init__(self, folder, ttl=timedelta(hours=6), max_bytes=None):
+        self._folder = folder
+        self._ttl = ttl if isinstance(ttl, timedelta) else timedelta(seconds=ttl)
+        self._max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+        # stats
+        self._hits = 0
+        self._misses = 0
+        self._stale = 0
+        self._evictions = 0
+
+        if not os.path.isdir(folder):
+            os.makedirs(folder)
+        # (scrape time, path) of all entries, oldest first: the folder is only listed once, here
+        self._index = [(PageCache._entry_time(path), path) for path in self._iter_entries()]
+        heapq.heapify(self._index)
+        self._size = sum(os.path.getsize(path) for _, path in self._index)
+
+    def __repr__(self):
+        return f"PageCache: {self._folder} ({round(self._size / 1024 ** 2, 2)} MB)"
+
+    @property
+    def stats(self):
+        return {
+            'hits': self._hits,
+            'misses': self._misses,
+            'stale': self._stale,
+            'evictions': self._evictions,
+            'bytes': self._size
+        }
+
+    def fresh(self, url, now=None):
+        """
+        Returns True if the cache holds an entry for the URL fresher than the TTL (without counting a hit or miss).
+        """
+        now = datetime.today() if now is None else now
+        with self._lock:
+            entries = self._url_entries(PageCache._key(url))
+        return bool(entries) and now - max(entries)[0] <= self._ttl
+
+    def get(self, url, now=None):
+        """
+        Returns a tuple (tokens, scraped_at) with the most recent entry for the URL,
+        or None if there is no entry fresher than the TTL.
+        """
+        now = datetime.today() if now is None else now
+        key = PageCache._key(url)
+
+        with self._lock:
+            entries = self._url_entries(key)
+            if not entries:
+                self._misses += 1
+                return None
+
+            scraped_at, path = max(entries)
+            if now - scraped_at > self._ttl:
+                self._misses += 1
+                self._stale += 1
+                return None
+
+            try:
+                with gzip.open(path, 'rt', encoding='utf-8') as f:
+                    entry = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Dropping unreadable cache entry {path}: {e}")
+                self._remove(path)
+                self._misses += 1
+                return None
+
+            self._hits += 1
+
+        return entry['tokens'], scraped_at
+
+    def put(self, url, tokens, scraped_at=None):
+        """
+        Stores the raw text strings of a page scraped from the URL.
+        """
+        scraped_at = datetime.today() if scraped_at is None else scraped_at
+        key = PageCache._key(url)
+        subfolder = os.path.join(self._folder, key[:2])
+        path = os.path.join(subfolder, f"{key}_{scraped_at.strftime('%Y%m%d%H%M%S%f')}.json.gz")
+
+        entry = {'url': url, 'scraped_at': scraped_at.isoformat(), 'tokens': list(tokens)}
+        data = gzip.compress(json.dumps(entry).encode('utf-8'))
+
+        with self._lock:
+            if not os.path.isdir(subfolder):
+                os.makedirs(subfolder)
+            # write and rename, so that readers never see a partial entry
+            with open(path + ".tmp", 'wb') as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+            self._size += len(data)
+            heapq.heappush(self._index, (scraped_at, path))
+
+            if self._max_bytes is not None and self._size > self._max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """
+        Deletes the oldest entries until the cache is back under max_bytes.
+        """
+        while self._index and self._size > self._max_bytes:
+            _, path = heapq.heappop(self._index)
+            # entries already removed (unreadable ones) are skipped
+            if self._remove(path):
+                self._evictions += 1
+
+    def _remove(self, path):
+        """
+        Deletes an entry, returns False if it was already gone.
+        """
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return False
+        self._size -= size
+        return True
+
+    def _url_entries(self, key):
+        subfolder = os.path.join(self._folder, key[:2])
+        if not os.path.isdir(subfolder):
+            return []
+        return [(PageCache._entry_time(f), os.path.join(subfolder, f))
+                for f in os.listdir(subfolder) if f.startswith(key) and f.endswith(".json.gz")]
+
+    def _iter_entries(self):
+        for subfolder in os.listdir(self._folder):
+            subfolder = os.path.join(self._folder, subfolder)
+            if not os.path.isdir(subfolder):
+                continue
+            for f in os.listdir(subfolder):
+                if f.endswith(".json.gz"):
+                    yield os.path.join(subfolder, f)
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _entry_time(path):
+        timestamp = os.path.basename(path).split("_")[1].split(".")[0]
+        return datetime.strptime(timestamp, '%Y%m%d%H%M%S%f')
@@ -0,0 +1,140 @@
+import logging
+import os
+import re
+import threading
+import uuid
+from datetime import datetime
+
+import pandas as pd
+
+from src.google_flight_analysis.executor import ScrapeJob, job_key
+
+__all__ = ['RunCheckpoint', 'new_run_id']
+
+# logging
+logger_name = os.path.basename(__file__)
+logger = logging.getLogger(logger_name)
+
+# {origin}_{dest}_{date_leave}[_{date_return}].pkl
+_RESULTS_REGEX = re.compile(r"([A-Z]{3})_([A-Z]{3})_(\d{4}-\d{2}-\d{2})(?:_(\d{4}-\d{2}-\d{2}))?\.pkl")
+
+_DONE_FILE = "done.txt"
+_FINISHED_FILE = "finished"
+_RESULTS_FOLDER = "results"
+
+
+def new_run_id():
+    """
+    Returns a new run id: start time and a random suffix, for example 20231028-141503-1a2b3c.
+    """
+    return f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+
+
+class RunCheckpoint:
+    """
+    Progress of a run, saved in {folder}/{run_id}/ so that a run that died can be resumed:
+    - the results of every scraped job are saved (save) until they are in the database
+    - done.txt lists the jobs whose results are in the database (commit), one per line, appended and synced
+    A resumed run skips the jobs of the checkpoint (`job in checkpoint`) and writes the saved results again
+    (pending). Results written to the database just before a crash, but not committed yet, can be written twice.
+    """
+
+    def __init__(self, folder, run_id=None):
+        self.run_id = new_run_id() if run_id is None else run_id
+        self._folder = os.path.join(folder, self.run_id)
+        self._results_folder = os.path.join(self._folder, _RESULTS_FOLDER)
+        os.makedirs(self._results_folder, exist_ok=True)
+
+        self._done = set()
+        done_path = os.path.join(self._folder, _DONE_FILE)
+        if os.path.isfile(done_path):
+            with open(done_path, 'r', encoding='utf-8') as f:
+                self._done = {line.strip() for line in f if line.strip()}
+        self._saved = {job_key(job) for job in self._saved_jobs()}
+        self._done_file = open(done_path, 'a', encoding='utf-8')
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"RunCheckpoint: run {self.run_id}, {len(self._done)} jobs done, {len(self._saved)} saved"
+
+    def __contains__(self, job):
+        """
+        True if the job was scraped in this run (its results are in the database, or saved to be written).
+        """
+        key = job_key(job)
+        return key in self._done or key in self._saved
+
+    @property
+    def n_done(self):
+        return len(self._done)
+
+    @classmethod
+    def latest(cls, folder):
+        """
+        Returns the id of the most recent run of the folder that did not finish, None if there is none.
+        """
+        if not os.path.isdir(folder):
+            return None
+        runs = [run for run in os.listdir(folder)
+                if os.path.isdir(os.path.join(folder, run)) and not os.path.exists(os.path.join(folder, run, _FINISHED_FILE))]
+        return max(runs) if runs else None
+
+    def save(self, job, df):
+        """
+        Saves the results of a job until they are committed.
+        """
+        path = self._results_path(job)
+        # write and rename, a crash never leaves a partial file
+        df.to_pickle(path + ".tmp")
+        os.replace(path + ".tmp", path)
+        with self._lock:
+            self._saved.add(job_key(job))
+
+    def commit(self, jobs):
+        """
+        Records jobs as done (their results are in the database) and deletes their saved results.
+        """
+        with self._lock:
+            for job in jobs:
+                self._done_file.write(job_key(job) + "\n")
+            self._done_file.flush()
+            os.fsync(self._done_file.fileno())
+
+            for job in jobs:
+                self._done.add(job_key(job))
+                self._saved.discard(job_key(job))
+                path = self._results_path(job)
+                if os.path.exists(path):
+                    os.remove(path)
+
+    def pending(self):
+        """
+        Yields (job, DataFrame) for the saved results that were not committed, to be written again.
+        """
+        for job in self._saved_jobs():
+            if job_key(job) not in self._done:
+                yield job, pd.read_pickle(self._results_path(job))
+
+    def finish(self):
+        """
+        Marks the run as finished: it is not resumed by latest() anymore.
+        """
+        self._done_file.close()
+        with open(os.path.join(self._folder, _FINISHED_FILE), 'w', encoding='utf-8') as f:
+            f.write(datetime.now().isoformat())
+        logger.info(f"Run {self.run_id} finished: {len(self._done)} jobs done")
+
+    def close(self):
+        self._done_file.close()
+
+    def _saved_jobs(self):
+        jobs = []
+        for filename in sorted(os.listdir(self._results_folder)):
+            match = _RESULTS_REGEX.fullmatch(filename)
+            if match:
+                jobs.append(ScrapeJob(*match.groups()))
+        return jobs
+
+    def _results_path(self, job):
+        filename = f"{job.origin}_{job.dest}_{job.date_leave}" + (f"_{job.date_return}" if job.date_return else "")
+        return os.path.join(self._results_folder, filename + ".pkl")
@@ -5,10 +5,14 @@ import psycopg2 #postgre
 import pyodbc #mssql
 import pandas as pd
 import numpy as np
-import ast
 import psycopg2.extras as extras
 import os
+import time
 import logging
+from contextlib import contextmanager
+
+from src.google_flight_analysis.adapters import pg_copy_chunks, CopyStream, mssql_rows, adapt_for_postgres, adapt_for_mssql
+from src.google_flight_analysis.metrics import metrics
 
 # logging
 logger_name = os.path.basename(__file__)
@@ -137,7 +141,8 @@ class Database:
                     access_date timestamp with time zone NOT NULL,
                     one_way boolean NOT NULL,
                     has_train boolean NOT NULL,
-                    days_advance smallint NOT NULL
+                    days_advance smallint NOT NULL,
+                    run_id text COLLATE pg_catalog."default"
                 )
 
                 TABLESPACE pg_default;
@@ -172,7 +177,8 @@ class Database:
                     access_date datetimeoffset NOT NULL,
                     one_way bit NOT NULL,
                     has_train bit NOT NULL,
-                    days_advance smallint NOT NULL
+                    days_advance smallint NOT NULL,
+                    run_id varchar(32)
                 );
                 """
             
@@ -192,21 +198,117 @@ class Database:
         else:
             if 'scraped' not in self.list_all_tables():
                 self.create_scraped_table(overwrite_table)
-        
+
+        # index for latest_access_dates (tables created before it existed get it here)
+        self.create_freshness_index()
+
+        # tables created before runs were checkpointed
+        self.add_run_id_column()
+
+    def add_run_id_column(self):
+        """
+        Adds the run_id column (the run that scraped each row, see RunCheckpoint) to the scraped table, if missing.
+        """
+        if self.db_sql == 'postgre':
+            query = "ALTER TABLE public.scraped ADD COLUMN IF NOT EXISTS run_id text;"
+        else:
+            query = "IF COL_LENGTH('scraped', 'run_id') IS NULL ALTER TABLE scraped ADD run_id varchar(32);"
+
+        cursor = self.conn.cursor()
+        cursor.execute(query)
+        cursor.close()
+
+    def create_freshness_index(self):
+        """
+        Creates the index that serves latest_access_dates, if missing.
+        Leading with access_date, it turns the query into a range scan over the recent rows only.
+        """
+        if self.db_sql == 'postgre':
+            query = """
+                CREATE INDEX IF NOT EXISTS scraped_freshness_idx ON public.scraped (access_date)
+                INCLUDE (origin, destination, depart_departure_datetime, return_departure_datetime, one_way);
+                """
+        else:
+            query = """
+                IF NOT EXISTS (SELECT * FROM sys.indexes WHERE name = 'scraped_freshness_idx')
+                CREATE INDEX scraped_freshness_idx ON scraped (access_date)
+                INCLUDE (origin, destination, depart_departure_datetime, return_departure_datetime, one_way);
+                """
+        cursor = self.conn.cursor()
+        cursor.execute(query)
+        cursor.close()
+
+    def latest_access_dates(self, since):
+        """
+        Returns the time of the latest scrape of every search scraped after `since`, as a dict
+        {(origin, destination, depart date, return date or None for one way): access_date}.
+        Dates are YYYY-MM-DD strings (as in ScrapeJob), access dates naive local datetimes.
+        """
+        if self.db_sql == 'postgre':
+            query = """
+                SELECT origin, destination, CAST(depart_departure_datetime AS date),
+                    CASE WHEN one_way THEN NULL ELSE CAST(return_departure_datetime AS date) END AS return_date,
+                    MAX(access_date)
+                FROM public.scraped
+                WHERE access_date >= %s
+                GROUP BY 1, 2, 3, 4;
+                """
+        else:
+            query = f"""
+                SELECT origin, destination, CAST(depart_departure_datetime AS date),
+                    CASE WHEN one_way = 1 THEN NULL ELSE CAST(return_departure_datetime AS date) END,
+                    CAST(MAX(access_date) AS datetime2)
+                FROM {self.db_table}
+                WHERE access_date >= ?
+                GROUP BY origin, destination, CAST(depart_departure_datetime AS date),
+                    CASE WHEN one_way = 1 THEN NULL ELSE CAST(return_departure_datetime AS date) END;
+                """
+
+        cursor = self.conn.cursor()
+        cursor.execute(query, (since,))
+        result = cursor.fetchall()
+        cursor.close()
+
+        latest = {}
+        for origin, destination, date_leave, date_return, access_date in result:
+            if date_leave is None:
+                continue
+            # timestamp with time zone / datetimeoffset: back to local time, as written by the scraper
+            if access_date.tzinfo is not None:
+                access_date = access_date.astimezone().replace(tzinfo=None)
+            key = (origin.strip(), destination.strip(), date_leave.strftime('%Y-%m-%d'),
+                   date_return.strftime('%Y-%m-%d') if date_return is not None else None)
+            latest[key] = access_date
+
+        return latest
+
     def transform_and_clean_df(self, df):
         """
         Some necessary cleaning and transforming operations to the df
-        before sending its content to the database
+        before sending its content to the database:
+        list columns become text[] (Postgres) or JSON arrays (MSSQL), missing values NULL.
+        """
+        with metrics.span("database", phase="transform", db=self.db_sql):
+            if self.db_sql == 'postgre':
+                return adapt_for_postgres(df)
+            return adapt_for_mssql(df)
+
+    def add_pandas_df_to_db(self, df, method='insert', raise_errors=False):
+        """
+        Adds the rows of a DataFrame to the scraped table.
+        method='bulk' loads them with the bulk path of the backend (Postgres: COPY, see copy_pandas_df_to_db,
+        MSSQL: batched fast_executemany, see bulk_insert_pandas_df_to_mssql),
+        method='insert' with multi-row INSERT statements.
+        The rows are added in a single transaction: all of them or none.
+        Database errors are logged and rolled back, then raised again if raise_errors.
         """
-        df["airlines"] = df.airlines.apply(lambda x: np.array(ast.literal_eval(str(x).replace("[", '"{').replace("]", '}"'))))
-        df["layover_location"] = df.layover_location.apply(lambda x: np.array(ast.literal_eval(str(x).replace("[", '"{').replace("]", '}"'))))
-        df['layover_time'] = df['layover_time'].fillna(np.nan).replace([np.nan], [None])
-        df["layover_location"] = df["layover_location"].fillna(np.nan).replace([np.nan], [None])
-        df["price_value"] = df["price_value"].fillna(np.nan).replace([np.nan], [None])
+        if method == 'bulk':
+            if self.db_sql == 'postgre':
+                return self.copy_pandas_df_to_db(df, raise_errors=raise_errors)
+            return self.bulk_insert_pandas_df_to_mssql(df, raise_errors=raise_errors)
+
+        time_start = time.perf_counter()
 
-        return df
-        
-    def add_pandas_df_to_db(self, df):
         # clean df
         df = self.transform_and_clean_df(df)
         
@@ -222,28 +324,28 @@ class Database:
         if self.db_sql == 'postgre':
             query  = "INSERT INTO %s(%s) VALUES %%s" % ('public.scraped', cols)
             try:
-                extras.execute_values(cursor, query, tuples)
+                with metrics.span("database", phase="insert", db=self.db_sql), self._transaction():
+                    extras.execute_values(cursor, query, tuples)
+                logger.info("{} rows added to table [{}] {}".format(len(df), self.db_table, Database._throughput(len(df), time_start)))
             except (Exception, psycopg2.DatabaseError) as error:
                 logger.error("Error: %s" % error)
-                self.conn.rollback()
+                if raise_errors:
+                    raise
+            finally:
                 cursor.close()
-            
-            logger.info("{} rows added to table [{}]".format(len(df), self.db_table))
-            cursor.close()
         else:
-            query = f"INSERT INTO {self.db_table}({cols}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+            query = f"INSERT INTO {self.db_table}({cols}) VALUES ({Database._placeholders(len(df.columns))})"
             try:
-                cursor.executemany(query, tuples)
-                logger.info("{} rows added to table [{}]".format(len(df), self.db_table))
+                with metrics.span("database", phase="insert", db=self.db_sql), self._transaction():
+                    cursor.executemany(query, tuples)
+                logger.info("{} rows added to table [{}] {}".format(len(df), self.db_table, Database._throughput(len(df), time_start)))
             except (Exception, pyodbc.DatabaseError) as error:
                 logger.error("Error: %s" % error)
-                self.conn.rollback()
-
-            cursor.close()
-            
-
+                if raise_errors:
+                    raise
+            finally:
+                cursor.close()
 
-        
         # # fix layover time
         # # TODO: improve this
         # cursor = self.conn.cursor()
@@ -256,4 +358,99 @@ class Database:
         #     ALTER COLUMN layover_time TYPE smallint;
         # """
         # cursor.execute(query)
-        # cursor.close()
\ No newline at end of file
+        # cursor.close()
+
+    def copy_pandas_df_to_db(self, df, chunk_size=10000, raise_errors=False):
+        """
+        Bulk loads the rows of a DataFrame into the scraped table with COPY FROM STDIN (Postgres only).
+        Rows are serialized and streamed `chunk_size` at a time, list columns (airlines) as native arrays.
+        COPY is a single statement: all the rows are loaded or none.
+        Returns the number of rows per second, None if the load failed (raised again if raise_errors).
+        """
+        if self.db_sql != 'postgre':
+            raise ValueError("COPY bulk load is only available for db_sql 'postgre'.")
+
+        time_start = time.perf_counter()
+        cols = ','.join(list(df.columns))
+        query = "COPY %s(%s) FROM STDIN" % ('public.scraped', cols)
+
+        cursor = self.conn.cursor()
+        try:
+            with metrics.span("database", phase="copy", db=self.db_sql):
+                cursor.copy_expert(query, CopyStream(pg_copy_chunks(df, chunk_size)))
+        except (Exception, psycopg2.DatabaseError) as error:
+            logger.error("Error: %s" % error)
+            self.conn.rollback()
+            cursor.close()
+            if raise_errors:
+                raise
+            return None
+
+        cursor.close()
+        logger.info("{} rows copied to table [{}] {}".format(len(df), self.db_table, Database._throughput(len(df), time_start)))
+
+        return len(df) / max(time.perf_counter() - time_start, 1e-9)
+
+    def bulk_insert_pandas_df_to_mssql(self, df, batch_size=5000, raise_errors=False):
+        """
+        Bulk inserts the rows of a DataFrame into the scraped table (MSSQL only).
+        Rows are sent with fast_executemany, one round trip per `batch_size` rows instead of per row,
+        and committed together at the end: a failure rolls back all of them, so the rows can be loaded again
+        without duplicates.
+        Returns the number of rows per second, None if the insert failed (raised again if raise_errors).
+        """
+        if self.db_sql != 'mssql':
+            raise ValueError("fast_executemany bulk insert is only available for db_sql 'mssql'.")
+
+        time_start = time.perf_counter()
+
+        # clean df
+        df = self.transform_and_clean_df(df)
+
+        cols = ','.join(list(df.columns))
+        query = f"INSERT INTO {self.db_table}({cols}) VALUES ({Database._placeholders(len(df.columns))})"
+        rows = mssql_rows(df)
+
+        cursor = self.conn.cursor()
+        cursor.fast_executemany = True
+        try:
+            with self._transaction():
+                for batch_start in range(0, len(rows), batch_size):
+                    with metrics.span("database", phase="bulk_insert", db=self.db_sql):
+                        cursor.executemany(query, rows[batch_start:batch_start + batch_size])
+        except (Exception, pyodbc.DatabaseError) as error:
+            logger.error("Error: %s (%s rows rolled back)" % (error, len(rows)))
+            if raise_errors:
+                raise
+            return None
+        finally:
+            cursor.close()
+
+        logger.info("{} rows added to table [{}] {}".format(len(rows), self.db_table, Database._throughput(len(rows), time_start)))
+
+        return len(rows) / max(time.perf_counter() - time_start, 1e-9)
+
+    @contextmanager
+    def _transaction(self):
+        """
+        Runs the enclosed statements in a single transaction (the connection is in autocommit otherwise):
+        committed if they all succeed, rolled back if one raises.
+        """
+        self.conn.autocommit = False
+        try:
+            yield
+            self.conn.commit()
+        except BaseException:
+            self.conn.rollback()
+            raise
+        finally:
+            self.conn.autocommit = True
+
+    @staticmethod
+    def _placeholders(n_columns):
+        return ', '.join(['?'] * n_columns)
+
+    @staticmethod
+    def _throughput(n_rows, time_start):
+        elapsed = time.perf_counter() - time_start
+        return "in {} sec ({} rows/sec)".format(round(elapsed, 2), round(n_rows / max(elapsed, 1e-9)))
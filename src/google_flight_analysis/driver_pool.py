@@ -0,0 +1,209 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psutil
+from selenium.common.exceptions import WebDriverException
+
+__all__ = ['DriverPool']
+
+# logging
+logger_name = os.path.basename(__file__)
+logger = logging.getLogger(logger_name)
+
+
+class DriverPool:
+    """
+    Keeps warm Chrome drivers that Scrape instances lease and return, instead of
+    launching and quitting a new browser for every scrape.
+    Drivers are health-checked before each lease and recycled after max_pages
+    pages or once their process tree uses more than max_rss_mb of memory.
+    """
+
+    def __init__(self, driver_factory, size=1, max_pages=50, max_rss_mb=None, reset_cookies=True):
+        self._driver_factory = driver_factory
+        self._size = size
+        self._max_pages = max_pages
+        self._max_rss_mb = max_rss_mb
+        self._reset_cookies = reset_cookies
+        self._idle = deque()
+        self._pages = {}
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+
+        # stats
+        self._n_started = 0
+        self._n_leases = 0
+        self._n_recycled = 0
+        self._n_unhealthy = 0
+        self._startup_seconds = 0.0
+
+    def __repr__(self):
+        return f"DriverPool: {len(self._idle)}/{self._size} idle"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def stats(self):
+        """
+        Returns a dict with the pool counters and the estimated browser startup time saved,
+        i.e. the average startup time multiplied by the number of leases served by a warm driver.
+        """
+        avg_startup = (self._startup_seconds / self._n_started) if self._n_started else 0.0
+        reused = max(self._n_leases - self._n_started, 0)
+        return {
+            'leases': self._n_leases,
+            'drivers_started': self._n_started,
+            'drivers_recycled': self._n_recycled,
+            'drivers_unhealthy': self._n_unhealthy,
+            'startup_seconds': round(self._startup_seconds, 2),
+            'avg_startup_seconds': round(avg_startup, 2),
+            'startup_seconds_saved': round(avg_startup * reused, 2)
+        }
+
+    def warm_up(self):
+        """
+        Starts drivers until the pool holds `size` idle ones.
+        """
+        while True:
+            with self._lock:
+                if len(self._pages) >= self._size:
+                    return
+            driver = self._start_driver()
+            with self._lock:
+                self._idle.append(driver)
+
+    @contextmanager
+    def lease(self):
+        """
+        Leases a warm driver for one scrape, returning it to the pool afterwards.
+        Blocks while all `size` drivers are leased.
+        """
+        self._slots.acquire()
+        try:
+            driver = self._acquire()
+            try:
+                yield driver
+            finally:
+                self._release(driver)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """
+        Quits all idle drivers and logs how much startup time the pool saved.
+        """
+        with self._lock:
+            drivers = list(self._idle)
+            self._idle.clear()
+        for driver in drivers:
+            self._quit(driver)
+
+        stats = self.stats
+        logger.info(f"Driver pool closed: {stats['leases']} leases served by {stats['drivers_started']} drivers, "
+                    f"~{stats['startup_seconds_saved']} sec of browser startup saved")
+
+    def _start_driver(self):
+        time_start = time.perf_counter()
+        driver = self._driver_factory()
+        elapsed = time.perf_counter() - time_start
+
+        with self._lock:
+            self._n_started += 1
+            self._startup_seconds += elapsed
+            self._pages[id(driver)] = 0
+
+        return driver
+
+    def _acquire(self):
+        while True:
+            with self._lock:
+                driver = self._idle.popleft() if self._idle else None
+            if driver is None:
+                driver = self._start_driver()
+                break
+            if DriverPool._is_healthy(driver):
+                break
+
+            logger.warning("Discarding unhealthy driver from pool.")
+            with self._lock:
+                self._n_unhealthy += 1
+            self._quit(driver)
+
+        with self._lock:
+            self._n_leases += 1
+
+        return driver
+
+    def _release(self, driver):
+        with self._lock:
+            self._pages[id(driver)] += 1
+            n_pages = self._pages[id(driver)]
+
+        recycle = (self._max_pages is not None and n_pages >= self._max_pages)
+        if not recycle and self._max_rss_mb is not None:
+            recycle = DriverPool._rss_mb(driver) > self._max_rss_mb
+
+        if not recycle:
+            try:
+                if self._reset_cookies:
+                    driver.delete_all_cookies()
+                driver.get("about:blank")
+            except WebDriverException:
+                recycle = True
+
+        if recycle:
+            with self._lock:
+                self._n_recycled += 1
+            self._quit(driver)
+        else:
+            with self._lock:
+                self._idle.append(driver)
+
+    def _quit(self, driver):
+        with self._lock:
+            self._pages.pop(id(driver), None)
+        try:
+            driver.quit()
+        except WebDriverException as e:
+            logger.warning(f"Driver quit failed: {e}")
+
+    @staticmethod
+    def _is_healthy(driver):
+        """
+        Returns True if the browser behind the driver still answers WebDriver commands.
+        """
+        try:
+            driver.current_url
+            return len(driver.window_handles) > 0
+        except WebDriverException:
+            return False
+
+    @staticmethod
+    def _rss_mb(driver):
+        """
+        Returns the resident memory (MB) of the chromedriver process and all the browser processes it spawned.
+        """
+        try:
+            process = psutil.Process(driver.service.process.pid)
+            rss = process.memory_info().rss
+            for child in process.children(recursive=True):
+                try:
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    continue
+        except (AttributeError, psutil.Error):
+            return 0.0
+
+        return rss / (1024 ** 2)
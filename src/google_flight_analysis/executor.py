@@ -0,0 +1,221 @@
+import logging
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from collections.abc import Sized
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+
+import pandas as pd
+
+from src.google_flight_analysis.scrape import Scrape
+from src.google_flight_analysis.driver_pool import DriverPool
+from src.google_flight_analysis.retry import NoFlightsError, RetryPolicy, classify
+
+__all__ = ['ScrapeJob', 'job_key', 'RateLimiter', 'ScrapeExecutor']
+
+# logging
+logger_name = os.path.basename(__file__)
+logger = logging.getLogger(logger_name)
+
+
+# one Google Flights search: one way if date_return is None, round trip otherwise
+ScrapeJob = namedtuple('ScrapeJob', ['origin', 'dest', 'date_leave', 'date_return'], defaults=[None])
+
+
+def job_key(job):
+    """
+    Returns the text key of a job, as stored in job queues and checkpoints.
+    """
+    return f"{job.origin}|{job.dest}|{job.date_leave}|{job.date_return or ''}"
+
+
+class RateLimiter:
+    """
+    Global rate limit shared by all workers: at most one page load every `min_interval` seconds.
+    """
+
+    def __init__(self, min_interval=0.0):
+        self._min_interval = min_interval
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """
+        Blocks until the caller is allowed to load the next page.
+        """
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self._min_interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class ScrapeExecutor:
+    """
+    Fans scrape jobs out to `workers` threads, each leasing its own browser from a DriverPool.
+    Results and progress are reported in job order, whatever order the workers finish in.
+    Failed pages are tried again as retry_policy says (once by default), and all workers stop loading pages
+    while circuit_breaker is open. A search without flights gives an empty DataFrame.
+    With skip_cached, pages served from the cache give an empty DataFrame too: their rows were already
+    returned when the page was scraped, and would be loaded twice.
+    """
+
+    def __init__(self, workers=1, country='US', currency='USD', min_interval=0.0, driver_pool=None, export=False, record=None, cache=None,
+                 extraction='text', browser_profile=None, retry_policy=None, circuit_breaker=None, skip_cached=False):
+        self._workers = workers
+        self._country = country
+        self._currency = currency
+        self._export = export
+        self._record = record
+        self._cache = cache
+        self._extraction = extraction
+        self._skip_cached = skip_cached
+        self._browser_profile = browser_profile
+        self._rate_limiter = RateLimiter(min_interval)
+        self._retry_policy = RetryPolicy(max_attempts=1) if retry_policy is None else retry_policy
+        self._circuit_breaker = circuit_breaker
+        self._driver_pool = driver_pool
+        self._lock = threading.Lock()
+        self._n_done = 0
+
+    def __repr__(self):
+        return f"ScrapeExecutor: {self._workers} workers"
+
+    @property
+    def workers(self):
+        return self._workers
+
+    def run(self, jobs):
+        """
+        Scrapes all jobs and returns their results concatenated in a single DataFrame,
+        with the same columns as Flight.dataframe.
+        """
+        results = [df for _, df in self.iter_results(jobs)]
+        if not results:
+            return pd.DataFrame()
+        return pd.concat(results, ignore_index=True)
+
+    def iter_results(self, jobs, on_error=None):
+        """
+        Scrapes all jobs and yields (job, DataFrame) tuples in job order.
+        Failed jobs are logged and skipped, after calling on_error(job, exception) if given.
+        Only 2 jobs per worker are scheduled ahead of the consumer, so results that were already yielded
+        are not kept in memory and finished work can be written out while the next pages are scraped.
+        `jobs` can be any iterable: sized ones (a list, a SchedulePlanner) are consumed lazily.
+        """
+        if not isinstance(jobs, Sized):
+            jobs = list(jobs)
+        n_jobs = len(jobs)
+        own_pool = self._driver_pool is None
+        driver_pool = (DriverPool(partial(Scrape.create_driver, self._browser_profile), size=self._workers)
+                       if own_pool else self._driver_pool)
+
+        self._n_done = 0
+        time_start = time.monotonic()
+        try:
+            with ThreadPoolExecutor(max_workers=self._workers) as pool:
+                jobs_iter = iter(jobs)
+                pending = deque((job, pool.submit(self._run_job, job, driver_pool))
+                                for job in islice(jobs_iter, 2 * self._workers))
+                try:
+                    n_iter = 0
+                    while pending:
+                        job, future = pending.popleft()
+                        for next_job in islice(jobs_iter, 1):
+                            pending.append((next_job, pool.submit(self._run_job, next_job, driver_pool)))
+                        n_iter += 1
+
+                        try:
+                            scrape, time_iteration = future.result()
+                            n_results = scrape.data.shape[0]
+                        except Exception as e:
+                            logger.error(f"ERROR: {ScrapeExecutor._job_str(job)}")
+                            logger.error(e)
+                            if on_error is not None:
+                                on_error(job, e)
+                            continue
+
+                        logger.info(f"[{n_iter}/{n_jobs}] [{time_iteration} sec - eta: {self._eta(time_start, n_jobs)}] "
+                                    f"Scraped: {ScrapeExecutor._job_str(job)} - {n_results} results")
+                        yield job, scrape.data
+                finally:
+                    # stop pending jobs if the caller stops consuming results early
+                    for _, future in pending:
+                        future.cancel()
+        finally:
+            if own_pool:
+                driver_pool.close()
+
+    def _run_job(self, job, driver_pool):
+        """
+        Runs a single scrape on a worker thread, with its retries.
+        Returns the Scrape object and the time it took in seconds.
+        """
+        scrape = Scrape(job.origin, job.dest, job.date_leave, self._country, self._currency, job.date_return,
+                        export=self._export, driver_pool=driver_pool, record=self._record,
+                        cache=self._cache, extraction=self._extraction)
+        try:
+            time_start = time.monotonic()
+            attempt = 1
+            while True:
+                # pages served from the cache do not load anything from Google
+                live = self._cache is None or not self._cache.fresh(scrape._make_url())
+                breaker = self._circuit_breaker if live else None
+                if breaker is not None:
+                    breaker.wait()
+                if live:
+                    self._rate_limiter.wait()
+
+                try:
+                    scrape.run_scrape()
+                except NoFlightsError as e:
+                    if breaker is not None:
+                        breaker.record_failure(e)
+                    logger.info(f"No flights: {ScrapeExecutor._job_str(job)}")
+                    scrape.data = pd.DataFrame()
+                    break
+                except Exception as e:
+                    if breaker is not None:
+                        breaker.record_failure(e)
+                    if not self._retry_policy.should_retry(e, attempt):
+                        raise
+                    delay = self._retry_policy.delay(attempt)
+                    logger.warning(f"{classify(e)} on {ScrapeExecutor._job_str(job)} "
+                                   f"(attempt {attempt}/{self._retry_policy.max_attempts}), retrying in {delay:.1f} sec")
+                    time.sleep(delay)
+                    attempt += 1
+                    continue
+
+                if breaker is not None:
+                    breaker.record_success()
+                if self._skip_cached and scrape.from_cache:
+                    logger.info(f"Served from the cache, rows not returned again: {ScrapeExecutor._job_str(job)}")
+                    scrape.data = pd.DataFrame()
+                break
+            time_iteration = round(time.monotonic() - time_start, 2)
+        finally:
+            with self._lock:
+                self._n_done += 1
+
+        return scrape, time_iteration
+
+    def _eta(self, time_start, n_total):
+        """
+        Returns the estimated remaining time as H:MM:SS, from the throughput of all finished jobs.
+        """
+        with self._lock:
+            n_done = self._n_done
+        if n_done == 0:
+            return "?"
+        remaining = (time.monotonic() - time_start) / n_done * (n_total - n_done)
+        return time.strftime("%H:%M:%S", time.gmtime(remaining))
+
+    @staticmethod
+    def _job_str(job):
+        if job.date_return is None:
+            return f"{job.origin} {job.dest} {job.date_leave}"
+        return f"{job.origin} {job.dest} {job.date_leave} - {job.date_return}"
@@ -7,44 +7,343 @@ import pandas as pd
 from tqdm import tqdm
 import re
 from os import path
+import uuid
+import pyarrow as pa
+import pyarrow.dataset as ds
+from functools import lru_cache
 
 __all__ = ['Flight']
 
 
+# token categories, in the order _FlightParser.feed tries them
+(_SKIP, _CHANGE_OF_AIRPORT, _TIME, _DURATION, _STOPS, _CO2, _EMISSIONS, _PRICE_EUR, _PRICE_USD,
+ _PRICE_UNAVAILABLE, _ROUTE, _LAYOVER, _MULTI_STOP, _AIRLINE) = range(14)
+
+# regex: AM/PM (for example: 10:30AM, 4:11PM)
+_TIME_REGEX = re.compile(r"\d{1,2}\:\d{2}(?:AM|PM)\+{0,1}\d{0,1}")
+_TIME_PARTS_REGEX = re.compile(r"(\d{1,2}):(\d{2})(AM|PM)")
+# regex:  3 hr 35 min, 45 min, 5 hr
+_DURATION_REGEX = re.compile(r"\d{1,2} (?:hr|min)$")
+_STOPS_REGEX = re.compile(r"\d stop")
+# regex: matches "FCO, JFK, ABC, DEF", "5 min Ancona", "3 hr 13 min FCO", "FCO, JFK"
+_LAYOVER_REGEX = re.compile(r"\d{0,2} (?:min|hr) (\d{0,2} (?:min|hr))?\w+")
+_LAYOVER_TIME_REGEX = re.compile(r"([0-9]+ hr )?([0-9]+ min )?")
+_CAMEL_CASE_REGEX = re.compile(r"([a-z])([A-Z])")
+
+_DAYS_OF_WEEK = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+# columns of the Parquet export
+_PARQUET_SCHEMA = pa.schema([
+    ('depart_departure_datetime', pa.timestamp('ns')),
+    ('depart_departure_day', pa.string()),
+    ('depart_arrival_datetime', pa.timestamp('ns')),
+    ('depart_arrival_day', pa.string()),
+    ('return_departure_datetime', pa.timestamp('ns')),
+    ('return_departure_day', pa.string()),
+    ('return_arrival_datetime', pa.timestamp('ns')),
+    ('return_arrival_day', pa.string()),
+    ('airlines', pa.list_(pa.string())),
+    ('travel_time', pa.int32()),
+    ('origin', pa.string()),
+    ('destination', pa.string()),
+    ('layover_n', pa.int16()),
+    ('layover_time', pa.int32()),
+    ('layover_location', pa.list_(pa.string())),
+    ('price', pa.int32()),
+    ('price_currency', pa.string()),
+    ('price_trend', pa.string()),
+    ('price_value', pa.string()),
+    ('access_date', pa.timestamp('ns')),
+    ('one_way', pa.bool_()),
+    ('has_train', pa.bool_()),
+    ('days_advance', pa.int32()),
+    ('run_id', pa.string()),
+    ('access_day', pa.string()),
+])
+
+# partition columns, stored in the directory names
+_PARQUET_PARTITIONING = ds.partitioning(
+    pa.schema([_PARQUET_SCHEMA.field(name) for name in ['origin', 'destination', 'access_day']]), flavor="hive")
+
+
+@lru_cache(maxsize=65536)
+def _classify_token(arg):
+    """
+    Returns the candidate categories of a token, in the order _FlightParser.feed tries them.
+    The list stops at the first category that does not depend on the flight parsed so far,
+    an exhausted list means the token is trash.
+    Tokens repeat a lot across flights and pages (airlines, "Nonstop", "1 stop"...), so the result is cached.
+    """
+    if arg is None or arg == "":
+        return (_SKIP,)
+    if arg == "Change of airport":
+        return (_CHANGE_OF_AIRPORT,)
+    if arg in ["round trip", "Climate friendly"] or arg.startswith("Delayed"):
+        return (_SKIP,)
+
+    candidates = []
+    if _TIME_REGEX.search(arg):
+        candidates.append(_TIME)
+    if _DURATION_REGEX.search(arg):
+        candidates.append(_DURATION)
+    if arg == "Nonstop" or _STOPS_REGEX.search(arg):
+        candidates.append(_STOPS)
+    if arg.endswith('CO2'):
+        candidates.append(_CO2)
+    if arg.endswith('emissions'):
+        candidates.append(_EMISSIONS)
+    if arg.replace(',','').isdigit():
+        candidates.append(_PRICE_EUR)
+    if '$' in arg:
+        candidates.append(_PRICE_USD)
+        return tuple(candidates)
+    if arg == "Price unavailable":
+        candidates.append(_PRICE_UNAVAILABLE)
+        return tuple(candidates)
+    if len(arg) == 6 and arg.isupper() or "Flight + Train" in arg:
+        candidates.append(_ROUTE)
+    if _LAYOVER_REGEX.search(arg):
+        candidates.append(_LAYOVER)
+    if ',' in arg:
+        candidates.append(_MULTI_STOP)
+    candidates.append(_AIRLINE)
+
+    return tuple(candidates)
+
+
+@lru_cache(maxsize=1024)
+def _parse_date(s):
+    return datetime.strptime(s, '%Y-%m-%d')
+
+
+@lru_cache(maxsize=4096)
+def _time_offset(arg):
+    """
+    Returns the offset from midnight of the flight date for a time token,
+    for example: 10:30AM --> 10:30 hours, 1:05AM+1 --> 1 day and 1:05 hours.
+    Returns None for tokens that are not strictly in that format.
+    """
+    days = 0
+    if arg[-2] == '+':
+        days = int(arg[-1])
+        arg = arg[:-2]
+
+    match = _TIME_PARTS_REGEX.fullmatch(arg)
+    if match is None:
+        return None
+
+    hours, minutes, am_pm = int(match.group(1)), int(match.group(2)), match.group(3)
+    if not (1 <= hours <= 12) or minutes > 59:
+        return None
+
+    return timedelta(days=days, hours=hours % 12 + (12 if am_pm == 'PM' else 0), minutes=minutes)
+
+
+def _parse_time(date, arg):
+    """
+    Returns the datetime of a time token (for example: 10:30AM, 4:11PM+1) on a date (YYYY-MM-DD),
+    by arithmetic on the cached date instead of parsing the full string.
+    """
+    offset = _time_offset(arg)
+    if offset is None:
+        # unusual token: let strptime parse it (or raise)
+        delta = timedelta(days = 0)
+        if arg[-2] == '+':
+            delta = timedelta(days = int(arg[-1]))
+            arg = arg[:-2]
+        return datetime.strptime(date + " " + arg, "%Y-%m-%d %I:%M%p") + delta
+
+    return _parse_date(date) + offset
+
+
+class _FlightParser:
+    """
+    Parse-time state of a single flight: the flight's tokens are fed one by one and classified
+    into its attributes. Used by Flight, and by FlightBatch which reuses one parser for a whole page.
+    """
+
+    __slots__ = ('date', 'queried_orig', 'queried_dest', 'times', 'days_of_week',
+                 'depart_time_leave', 'depart_time_arrive', 'depart_day_leave', 'depart_day_arrive',
+                 'origin', 'dest', 'airline', 'flight_time', 'num_stops', 'stops', 'stops_locations',
+                 'co2', 'emissions', 'price', 'currency', 'has_train', 'trash')
+
+    def __init__(self, date, queried_orig, queried_dest):
+        self.date = date
+        self.queried_orig = queried_orig
+        self.queried_dest = queried_dest
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the state of the previous flight.
+        """
+        self.times = []
+        self.days_of_week = []
+        self.depart_time_leave = None
+        self.depart_time_arrive = None
+        self.depart_day_leave = None
+        self.depart_day_arrive = None
+        self.origin = None
+        self.dest = None
+        self.airline = None
+        self.flight_time = None
+        self.num_stops = None
+        self.stops = None
+        self.stops_locations = None
+        self.co2 = None
+        self.emissions = None
+        self.price = None
+        self.currency = None
+        self.has_train = False
+        self.trash = []
+
+    def parse(self, args):
+        for arg in args:
+            self.feed(arg)
+        return self
+
+    def feed(self, arg: str):
+        """
+        Classifies a string (arg) into the correct attribute for a flight,
+        such as price, numer of layover stops, arrival time...
+        The candidate categories of the string are computed once by _classify_token,
+        the first one whose attribute is still empty wins.
+        """
+        for category in _classify_token(arg):
+            # handle empty strings and special cases
+            if category == _SKIP:
+                return
+
+            elif category == _CHANGE_OF_AIRPORT:
+                self.stops = self.stops_locations = ["Change of airport"]
+                return
+
+            # arrival or departure time
+            elif category == _TIME:
+                if len(self.times) < 2:
+                    time = _parse_time(self.date, arg)
+                    self.times += [time]
+                    self.days_of_week += [_DAYS_OF_WEEK[time.weekday()]]
+
+                    # if we have both arrival and departure time, set them
+                    if len(self.times) == 2:
+                        self.depart_time_leave = self.times[0]
+                        self.depart_time_arrive = self.times[1]
+                        self.depart_day_leave = self.days_of_week[0]
+                        self.depart_day_arrive = self.days_of_week[1]
+                    return
+
+            # flight time
+            elif category == _DURATION:
+                if self.flight_time is None:
+                    self.flight_time = arg
+                    return
+
+            # number of stops
+            elif category == _STOPS:
+                if self.num_stops is None:
+                    self.num_stops = (0 if arg == 'Nonstop' else int(arg.split()[0]))
+                    if self.num_stops == 0:
+                        self.stops_locations = ['NONSTOP']
+                    return
+
+            # co2
+            elif category == _CO2:
+                if self.co2 is None:
+                    self.co2 = int(arg.replace(',','').split()[0])
+                    return
+
+            # emissions
+            elif category == _EMISSIONS:
+                if self.emissions is None:
+                    emission_val = arg.split()[0]
+                    self.emissions = 0 if emission_val == 'Avg' else int(emission_val[:-1])
+                    return
+
+            # price, EUR
+            elif category == _PRICE_EUR:
+                if self.price is None:
+                    self.price = int(arg.replace(',',''))
+                    self.currency = 'EUR'
+                    return
+
+            # price, USD ($), over 1k has a comma must remove.
+            elif category == _PRICE_USD:
+                self.price = int(arg.replace('$','').replace(',',''))
+                self.currency = 'USD'
+                return
+
+            # Southwest does not have a price
+            elif category == _PRICE_UNAVAILABLE:
+                self.price = 0
+                self.currency = 'USD'
+                return
+
+            # origin/dest
+            elif category == _ROUTE:
+                if (self.origin is None) and (self.dest is None):
+                    if "Flight + Train" in arg:
+                        self.origin = self.queried_orig
+                        self.dest = self.queried_dest
+                        self.has_train = True
+                    else:
+                        self.origin = arg[:3]
+                        self.dest = arg[3:]
+                    return
+
+            # layover
+            elif category == _LAYOVER:
+                if self.stops_locations is None:
+                    if "," in arg: # multiple stops
+                        self.stops_locations = arg
+                        self.stops = arg.split(", ")[0]
+                    else: # single stop
+                        self.stops_locations = [arg.split(" ")[-1]]
+                        self.stops = _LAYOVER_TIME_REGEX.search(arg).group().strip()
+                    return
+
+            # check for 2 stops condition. Will have 2 stops and won't be change of airport
+            elif category == _MULTI_STOP:
+                if self.num_stops == 2 and self.stops != "Change of airport":
+                    self.stops_locations = arg.split(", ")
+                    return
+
+            # airline
+            elif category == _AIRLINE:
+                if self.airline is None:
+                    airline = arg.split("Operated")[0]
+
+                    # split camel case and make it into an array (list)
+                    self.airline = _CAMEL_CASE_REGEX.sub(r'\1, \2', airline).split(", ")
+                    return
+
+        # other (trash)
+        self.trash += [arg]
+
+
 class Flight:
+    """
+    One parsed result. Only the parsed fields are kept (no __dict__, no parse-time scratch lists),
+    as a day of scraping can hold millions of flights in memory.
+    """
+
+    __slots__ = ('_roundtrip', '_origin', '_dest', '_date', '_depart_day_leave', '_depart_day_arrive',
+                 '_depart_time_leave', '_depart_time_arrive', '_airline', '_flight_time', '_num_stops',
+                 '_return_day_leave', '_return_day_arrive', '_return_time_leave', '_return_time_arrive',
+                 '_stops', '_stops_locations', '_co2', '_emissions', '_price', '_currency', '_price_trend',
+                 '_has_train')
+
+    _id = 1
 
     def __init__(self, dl, roundtrip, queried_orig, queried_dest, price_trend, *args):
         self._roundtrip = roundtrip
-        self._id = 1
-        self._origin = None
-        self._queried_orig = queried_orig
-        self._dest = None
-        self._queried_dest = queried_dest
         self._date = dl
-        self._daysOfWeek = []
-        self._depart_day_leave = None
-        self._depart_day_arrive = None
-        self._depart_time_leave = None
-        self._depart_time_arrive = None
-        self._dow = datetime.strptime(dl, '%Y-%m-%d').isoweekday() # day of week
-        self._airline = None
-        self._flight_time = None
-        self._num_stops = None
         self._return_day_leave = None
         self._return_day_arrive = None
         self._return_time_leave = None
         self._return_time_arrive = None
-        self._stops = None
-        self._stops_locations = None
-        self._co2 = None
-        self._emissions = None
-        self._price = None
-        self._currency = None
         self._price_trend = price_trend
-        self._times = []
-        self.has_train = False
-        self._trash = []
-        self._parse_args(*args)
+        self._parse_args(queried_orig, queried_dest, *args)
 
     def __repr__(self):
         return f"{self._id}-{self._origin}-{self._dest}-{self._date}"
@@ -83,7 +382,8 @@ class Flight:
 
     @property
     def dow(self):
-        return self._dow
+        # day of week
+        return _parse_date(self._date).isoweekday()
 
     @property
     def airline(self):
@@ -166,130 +466,25 @@ class Flight:
         self._has_train = x
 
     
-    def _classify_arg(self, arg: str):
-            """
-            Classifies a string (arg) into the correct attribute for a flight,
-            such as price, numer of layover stops, arrival time...
-            """
-            
-            # handle empty strings
-            if arg is None or arg == "":
-                return
-            
-            # handle special cases
-            if arg == "Change of airport":
-                self._stops = self._stops_locations = ["Change of airport"]
-                return
-            elif arg in ["round trip", "Climate friendly"] or arg.startswith("Delayed"):
-                return
-
-            # arrival or departure time
-            # regex: AM/PM (for example: 10:30AM, 4:11PM)
-            if bool(re.search("\d{1,2}\:\d{2}(?:AM|PM)\+{0,1}\d{0,1}", arg)) and (len(self._times) < 2):
-                delta = timedelta(days = 0)
-                if arg[-2] == '+':
-                    delta = timedelta(days = int(arg[-1]))
-                    arg = arg[:-2]
-
-                date_format = "%Y-%m-%d %I:%M%p"
-                self._times += [datetime.strptime(self._date + " " + arg, date_format) + delta]
-                self._daysOfWeek += [(datetime.strptime(self._date + " " + arg, date_format) + delta).strftime("%A")]
-
-            # flight time       
-            # regex:  3 hr 35 min, 45 min, 5 hr
-            elif bool(re.search("\d{1,2} (?:hr|min)$", arg)) and (self._flight_time is None):
-                self._flight_time = arg
-    
-            # number of stops
-            elif ((arg == "Nonstop") or bool(re.search("\d stop", arg))) and (self._num_stops is None):
-                self._num_stops = (0 if arg == 'Nonstop' else int(arg.split()[0]))
-                if self._num_stops == 0:
-                    self._stops_locations = ['NONSTOP']
-
-            # co2 
-            elif arg.endswith('CO2') and (self._co2 is None):
-                arg = arg.replace(',','')
-                self._co2 = int(arg.split()[0])
-            
-            # emissions
-            elif arg.endswith('emissions') and (self._emissions is None):
-                emission_val = arg.split()[0]
-                self._emissions = 0 if emission_val == 'Avg' else int(emission_val[:-1])
-            
-            # price, EUR
-            elif arg.replace(',','').isdigit() and (self._price is None):
-                self._price = int(arg.replace(',',''))
-                self._currency = 'EUR'
-
-            # price, USD ($), over 1k has a comma must remove.
-            elif '$' in arg:
-                replaceStr1 = arg.replace('$','')
-                self._price = int(replaceStr1.replace(',',''))
-                self._currency = 'USD'
-            
-            # Southwest does not have a price
-            elif arg == "Price unavailable":
-                self._price = 0
-                self._currency = 'USD'
-
-            # origin/dest        
-            elif (len(arg) == 6 and arg.isupper() or "Flight + Train" in arg) and (self._origin is None) and (self._dest is None):
-                if "Flight + Train" in arg:
-                    self._origin = self._queried_orig
-                    self._dest = self._queried_dest
-                    self._has_train = True
-                else:
-                    self._origin = arg[:3]
-                    self._dest = arg[3:]
-
-            # layover
-            # regex 1: matches "FCO, JFK, ABC, DEF", "5 min Ancona", "3 hr 13 min FCO", "FCO, JFK"
-            elif bool(re.search("\d{0,2} (?:min|hr) (\d{0,2} (?:min|hr))?\w+", arg)) and self._stops_locations is None:
-                # get stops locations
-                if "," in arg: # multiple stops
-                    self._stops_locations = arg
-                else: # single stop
-                    self._stops_locations = [arg.split(" ")[-1]]
-                    
-                # get stops time
-                if "," in arg:
-                    self._stops = arg.split(", ")[0]
-                else:
-                    self._stops = re.search("([0-9]+ hr )?([0-9]+ min )?", arg).group().strip()
-            
-            # check for 2 stops condition. Will have 2 stops and won't be change of airport
-            elif (self._num_stops == 2 and self._stops != "Change of airport" and ',' in arg):
-                self._stops_locations = arg.split(", ")
-            
-            # airline
-            elif len(arg) > 0 and (self._airline is None):
-                if "Operated" in arg:
-                    airline = arg.split("Operated")[0]
-                else:
-                    airline = arg
-                    
-                # split camel case
-                airline = re.sub('([a-z])([A-Z])', r'\1, \2', airline)
-                
-                # make it into an array (list)
-                airline = airline.split(", ")
-        
-                self._airline = airline
-            
-            # other (trash)
-            else:
-                self._trash += [arg]
-                
-            # if we have both arrival and departure time, set them
-            if len(self._times) == 2:
-                self._depart_time_leave = self._times[0]
-                self._depart_time_arrive = self._times[1]
-                self._depart_day_leave = self._daysOfWeek[0]
-                self._depart_day_arrive = self._daysOfWeek[1]
-        
-    def _parse_args(self, args):
-        for arg in args:
-            self._classify_arg(arg)
+    def _parse_args(self, queried_orig, queried_dest, args):
+        parser = _FlightParser(self._date, queried_orig, queried_dest).parse(args)
+
+        self._origin = parser.origin
+        self._dest = parser.dest
+        self._depart_time_leave = parser.depart_time_leave
+        self._depart_time_arrive = parser.depart_time_arrive
+        self._depart_day_leave = parser.depart_day_leave
+        self._depart_day_arrive = parser.depart_day_arrive
+        self._airline = parser.airline
+        self._flight_time = parser.flight_time
+        self._num_stops = parser.num_stops
+        self._stops = parser.stops
+        self._stops_locations = parser.stops_locations
+        self._co2 = parser.co2
+        self._emissions = parser.emissions
+        self._price = parser.price
+        self._currency = parser.currency
+        self._has_train = parser.has_train
 
     @staticmethod
     def get_duration_in_minutes_from_string(s):
@@ -314,8 +509,29 @@ class Flight:
             m = int(re.split("hr|min", s)[-2])
 
         return 60*h + m
-        
-    
+
+    @staticmethod
+    def get_durations_in_minutes(values):
+        """
+        Vectorized get_duration_in_minutes_from_string over a whole column:
+        ["3 hr 20 min", "20 min", None, ["Change of airport"]] --> [200, 20, NaN, 0]
+        Durations take a few thousand distinct values at most: each one is parsed once, and the minutes
+        are spread back over the column with its factorized codes.
+        Returns an int64 Series, or float64 with NaN where values are missing.
+        """
+        s = pd.Series(values, dtype=object)
+
+        # lists (change of airport) are not hashable: factorize their string form.
+        # codes are numbered by first appearance, so the first rows of each code are in code order
+        codes, _ = pd.factorize(s.astype(str))
+        first = pd.Series(codes).drop_duplicates().index.to_numpy()
+        unique_minutes = np.array([Flight.get_duration_in_minutes_from_string(x) for x in s.iloc[first]], dtype=np.float64)
+
+        minutes = pd.Series(unique_minutes[codes], index=s.index)
+        if minutes.isna().any():
+            return minutes
+        return minutes.astype(np.int64)
+
     @staticmethod
     def dataframe(flights):
         """
@@ -375,8 +591,8 @@ class Flight:
         
         # further cleaning
 		# convert: travel time to duration
-        df['travel_time'] = df['travel_time'].apply(lambda x: Flight.get_duration_in_minutes_from_string(x))
-        df['layover_time'] = df['layover_time'].apply(lambda x: Flight.get_duration_in_minutes_from_string(x))
+        df['travel_time'] = Flight.get_durations_in_minutes(df['travel_time'])
+        df['layover_time'] = Flight.get_durations_in_minutes(df['layover_time'])
         
         # add column: Days in Advance
         df['days_advance'] = (df['depart_departure_datetime'] - df['access_date']).dt.days
@@ -395,7 +611,7 @@ class Flight:
         if not path.isdir(folder):
             raise FileNotFoundError(f"Check if folder {folder} esists")
     
-        access_date = datetime.strptime(df["access_date"][0], "%Y-%m-%d %H:%M:%S").strftime("%y%m%d_%H%M")
+        access_date = pd.Timestamp(df["access_date"].iloc[0]).strftime("%y%m%d_%H%M")
         days_in_advance = df["days_advance"].min()
         leave_date = datetime.strptime(date_leave, "%Y-%m-%d").strftime("%y%m%d")
         return_date = (datetime.strptime(date_return, "%Y-%m-%d").strftime("%y%m%d") if date_return else None)
@@ -409,3 +625,53 @@ class Flight:
         full_filepath = path.join(folder, res)
         
         df.to_csv(full_filepath, index=False)
+
+    @staticmethod
+    def export_to_parquet(df, folder="outputs/parquet"):
+        """
+        Appends a DataFrame of Flight.dataframe to a Parquet dataset partitioned as:
+        {folder}/origin={orig}/destination={dest}/access_day={access_date_YYYY-MM-DD}/{uuid}-{i}.parquet
+        Datetimes, integers and lists are stored as native types (see _PARQUET_SCHEMA).
+        """
+        if df.shape[0] == 0:
+            return
+
+        df = df.copy()
+        df['access_day'] = pd.to_datetime(df['access_date']).dt.strftime("%Y-%m-%d")
+        # multi stop layovers are parsed as a single "FRA, JFK" string
+        df['layover_location'] = [x.split(", ") if isinstance(x, str) else x for x in df['layover_location']]
+
+        schema = pa.schema([f for f in _PARQUET_SCHEMA if f.name in df.columns])
+        table = pa.Table.from_pandas(df[schema.names], schema=schema, preserve_index=False)
+        ds.write_dataset(table, folder, format="parquet", partitioning=_PARQUET_PARTITIONING,
+                         basename_template=f"{uuid.uuid4().hex}-{{i}}.parquet",
+                         existing_data_behavior="overwrite_or_ignore")
+
+    @staticmethod
+    def read_parquet(folder="outputs/parquet", origin=None, destination=None, start=None, end=None, columns=None):
+        """
+        Loads the flights exported with export_to_parquet. Only the partitions of the given route(s)
+        (a code or a list of codes) and access days from start to end (dates, inclusive) are read.
+        """
+        if not path.isdir(folder):
+            raise FileNotFoundError(f"Check if folder {folder} esists")
+
+        dataset = ds.dataset(folder, format="parquet", partitioning=_PARQUET_PARTITIONING, schema=_PARQUET_SCHEMA)
+
+        conditions = []
+        if origin is not None:
+            conditions.append(ds.field('origin').isin([origin] if isinstance(origin, str) else list(origin)))
+        if destination is not None:
+            conditions.append(ds.field('destination').isin([destination] if isinstance(destination, str) else list(destination)))
+        if start is not None:
+            conditions.append(ds.field('access_day') >= pd.Timestamp(start).strftime("%Y-%m-%d"))
+        if end is not None:
+            conditions.append(ds.field('access_day') <= pd.Timestamp(end).strftime("%Y-%m-%d"))
+
+        condition = None
+        for c in conditions:
+            condition = c if condition is None else condition & c
+
+        df = dataset.to_table(columns=columns, filter=condition).to_pandas()
+        return df.drop(columns=['access_day'], errors='ignore')
+
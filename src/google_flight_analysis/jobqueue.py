@@ -0,0 +1,447 @@
+import logging
+import os
+import sqlite3
+import threading
+from collections import namedtuple
+
+from src.google_flight_analysis.executor import ScrapeJob, job_key
+
+__all__ = ['JobQueue', 'QueueConsumer', 'QueuedJob']
+
+# logging
+logger_name = os.path.basename(__file__)
+logger = logging.getLogger(logger_name)
+
+# a job claimed from the queue: its row id, the ScrapeJob and how many times it was claimed (this time included)
+QueuedJob = namedtuple('QueuedJob', ['id', 'job', 'attempts'])
+
+# job statuses
+PENDING, LEASED, DONE, FAILED = 'pending', 'leased', 'done', 'failed'
+
+# leases are compared with the clock of the database, shared by all the hosts
+_NOW = {
+    'sqlite': "julianday('now')",
+    'postgre': "now()",
+    'mssql': "SYSUTCDATETIME()"
+}
+_LEASE_UNTIL = {
+    'sqlite': "julianday('now') + ? / 86400.0",
+    'postgre': "now() + ? * interval '1 second'",
+    'mssql': "DATEADD(second, ?, SYSUTCDATETIME())"
+}
+
+_CREATE_TABLE = {
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            job_key TEXT NOT NULL UNIQUE,
+            origin TEXT NOT NULL,
+            destination TEXT NOT NULL,
+            date_leave TEXT NOT NULL,
+            date_return TEXT,
+            priority INTEGER NOT NULL DEFAULT 0,
+            status TEXT NOT NULL DEFAULT 'pending',
+            worker TEXT,
+            lease_until REAL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            error TEXT
+        );
+        CREATE INDEX IF NOT EXISTS {table}_claim_idx ON {table} (status, priority, id);
+    """,
+    'postgre': """
+        CREATE TABLE IF NOT EXISTS {table} (
+            id bigserial PRIMARY KEY,
+            job_key text NOT NULL UNIQUE,
+            origin character(3) NOT NULL,
+            destination character(3) NOT NULL,
+            date_leave character(10) NOT NULL,
+            date_return character(10),
+            priority integer NOT NULL DEFAULT 0,
+            status text NOT NULL DEFAULT 'pending',
+            worker text,
+            lease_until timestamp with time zone,
+            attempts integer NOT NULL DEFAULT 0,
+            error text
+        );
+        CREATE INDEX IF NOT EXISTS {table}_claim_idx ON {table} (status, priority, id);
+    """,
+    'mssql': """
+        IF OBJECT_ID(N'{table}', N'U') IS NULL
+        BEGIN
+            CREATE TABLE {table} (
+                id bigint IDENTITY(1,1) PRIMARY KEY,
+                job_key varchar(64) NOT NULL UNIQUE,
+                origin char(3) NOT NULL,
+                destination char(3) NOT NULL,
+                date_leave char(10) NOT NULL,
+                date_return char(10),
+                priority int NOT NULL DEFAULT 0,
+                status varchar(16) NOT NULL DEFAULT 'pending',
+                worker nvarchar(128),
+                lease_until datetime2,
+                attempts int NOT NULL DEFAULT 0,
+                error nvarchar(max)
+            );
+            CREATE INDEX {table}_claim_idx ON {table} (status, priority, id);
+        END
+    """
+}
+
+_COLUMNS = "id, origin, destination, date_leave, date_return, attempts, priority"
+
+
+class JobQueue:
+    """
+    Durable table of scrape jobs shared by any number of worker processes, on one host (SQLite)
+    or many (the Postgres or MSSQL server of Database), without a broker.
+    Workers claim jobs with a lease of `lease_seconds`, keep them with heartbeats while they work, and mark
+    them done or failed. A job whose lease expired (its worker died or hung) is claimed again by another worker,
+    up to `max_attempts` claims, after which it is marked failed.
+    Claims never hand the same job to two workers: SQLite serializes them with BEGIN IMMEDIATE,
+    Postgres and MSSQL lock the claimed rows and skip the rows locked by other workers
+    (FOR UPDATE SKIP LOCKED / READPAST).
+    """
+
+    def __init__(self, conn, dialect='sqlite', table='scrape_jobs', lease_seconds=600, max_attempts=3):
+        if dialect not in _CREATE_TABLE:
+            raise ValueError(f"Unknown dialect {dialect}, expected one of {list(_CREATE_TABLE)}.")
+
+        self._conn = conn
+        self._dialect = dialect
+        self._table = table
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # one connection per queue, shared with the heartbeat thread of its consumer
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"JobQueue: {self._dialect} table {self._table}"
+
+    @classmethod
+    def sqlite(cls, path, **kwargs):
+        """
+        Returns the queue of a SQLite file, shared by the processes of a host.
+        """
+        conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return cls(conn, 'sqlite', **kwargs)
+
+    @classmethod
+    def from_database(cls, db, **kwargs):
+        """
+        Returns the queue in the database of a Database, on a connection of its own.
+        """
+        conn = db.connect_to_postgresql() if db.db_sql == 'postgre' else db.connect_to_mssql()
+        conn.autocommit = True
+        return cls(conn, db.db_sql, **kwargs)
+
+    def create(self):
+        """
+        Creates the job table if it does not exist.
+        """
+        script = _CREATE_TABLE[self._dialect].format(table=self._table)
+        with self._lock:
+            if self._dialect == 'sqlite':
+                self._conn.executescript(script)
+            else:
+                self._execute(script)
+
+    def add(self, jobs, priority=0):
+        """
+        Adds ScrapeJobs to the queue. Jobs already in the queue, whatever their status, are left as they are.
+        """
+        rows = [(job_key(job), job.origin, job.dest, job.date_leave, job.date_return, priority)
+                for job in jobs]
+        if self._dialect == 'sqlite':
+            query = f"""INSERT OR IGNORE INTO {self._table} (job_key, origin, destination, date_leave, date_return, priority)
+                        VALUES (?, ?, ?, ?, ?, ?)"""
+        elif self._dialect == 'postgre':
+            query = f"""INSERT INTO {self._table} (job_key, origin, destination, date_leave, date_return, priority)
+                        VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (job_key) DO NOTHING"""
+        else:
+            query = f"""INSERT INTO {self._table} (job_key, origin, destination, date_leave, date_return, priority)
+                        SELECT ?, ?, ?, ?, ?, ? WHERE NOT EXISTS (SELECT 1 FROM {self._table} WHERE job_key = ?)"""
+            rows = [row + (row[0],) for row in rows]
+
+        with self._lock:
+            self._executemany(query, rows)
+        logger.info(f"{len(rows)} jobs added to the queue {self._table}")
+
+    def plan(self, jobs, priority=0):
+        """
+        Schedules the jobs of a new run: the done and failed jobs of previous runs are deleted first,
+        so that they are scraped again. Pending and leased jobs are left as they are.
+        """
+        self.purge((DONE, FAILED))
+        self.add(jobs, priority)
+
+    def claim(self, worker, n=1):
+        """
+        Leases up to n jobs to a worker, highest priority first, and returns them as QueuedJobs.
+        Pending jobs and jobs whose lease expired can be claimed.
+        """
+        claimable = (f"(status = '{PENDING}' OR (status = '{LEASED}' AND lease_until < {_NOW[self._dialect]})) "
+                     f"AND attempts < ?")
+        lease_until = _LEASE_UNTIL[self._dialect]
+
+        with self._lock:
+            self._fail_exhausted()
+
+            if self._dialect == 'sqlite':
+                cursor = self._conn.cursor()
+                cursor.execute("BEGIN IMMEDIATE")
+                try:
+                    cursor.execute(f"SELECT {_COLUMNS} FROM {self._table} WHERE {claimable} "
+                                   f"ORDER BY priority DESC, id LIMIT ?", (self.max_attempts, n))
+                    rows = cursor.fetchall()
+                    cursor.executemany(f"UPDATE {self._table} SET status = '{LEASED}', worker = ?, "
+                                       f"lease_until = {lease_until}, attempts = attempts + 1 WHERE id = ?",
+                                       [(worker, self.lease_seconds, row[0]) for row in rows])
+                    cursor.execute("COMMIT")
+                except Exception:
+                    cursor.execute("ROLLBACK")
+                    raise
+                finally:
+                    cursor.close()
+                rows = [row[:5] + (row[5] + 1, row[6]) for row in rows]
+
+            elif self._dialect == 'postgre':
+                rows = self._fetchall(f"""
+                    UPDATE {self._table} SET status = '{LEASED}', worker = ?, lease_until = {lease_until},
+                        attempts = attempts + 1
+                    WHERE id IN (SELECT id FROM {self._table} WHERE {claimable}
+                                 ORDER BY priority DESC, id LIMIT ? FOR UPDATE SKIP LOCKED)
+                    RETURNING {_COLUMNS}""", (worker, self.lease_seconds, self.max_attempts, n))
+
+            else:
+                rows = self._fetchall(f"""
+                    WITH claimed AS (
+                        SELECT TOP (?) * FROM {self._table} WITH (ROWLOCK, UPDLOCK, READPAST)
+                        WHERE {claimable} ORDER BY priority DESC, id)
+                    UPDATE claimed SET status = '{LEASED}', worker = ?, lease_until = {lease_until},
+                        attempts = attempts + 1
+                    OUTPUT {', '.join('inserted.' + c for c in _COLUMNS.split(', '))}""",
+                    (n, self.max_attempts, worker, self.lease_seconds))
+
+        rows = sorted(rows, key=lambda row: (-row[6], row[0]))
+        return [QueuedJob(row[0], ScrapeJob(row[1].strip(), row[2].strip(), row[3], row[4]), row[5]) for row in rows]
+
+    def heartbeat(self, worker, ids):
+        """
+        Extends the leases of the jobs a worker still holds. Returns the number of leases extended:
+        a job missing from the count was reclaimed by another worker after its lease expired.
+        """
+        if not ids:
+            return 0
+        query = (f"UPDATE {self._table} SET lease_until = {_LEASE_UNTIL[self._dialect]} "
+                 f"WHERE status = '{LEASED}' AND worker = ? AND id IN ({JobQueue._placeholders(ids)})")
+        with self._lock:
+            return self._execute(query, (self.lease_seconds, worker, *ids))
+
+    def complete(self, ids):
+        """
+        Marks jobs as done.
+        """
+        if not ids:
+            return
+        query = (f"UPDATE {self._table} SET status = '{DONE}', lease_until = NULL, error = NULL "
+                 f"WHERE id IN ({JobQueue._placeholders(ids)})")
+        with self._lock:
+            self._execute(query, tuple(ids))
+
+    def fail(self, worker, id, error=None):
+        """
+        Gives a failed job back to the queue, or marks it failed once it was claimed max_attempts times.
+        A job given back loses a priority point: the jobs not tried yet are claimed before it.
+        """
+        query = (f"UPDATE {self._table} SET status = CASE WHEN attempts >= ? THEN '{FAILED}' ELSE '{PENDING}' END, "
+                 f"priority = priority - 1, lease_until = NULL, error = ? WHERE id = ? AND worker = ? AND status = '{LEASED}'")
+        with self._lock:
+            self._execute(query, (self.max_attempts, None if error is None else str(error)[:1000], id, worker))
+
+    def release(self, worker, ids=None):
+        """
+        Gives the jobs a worker holds (all of them, or only ids) back to the queue, without counting the claim.
+        """
+        query = (f"UPDATE {self._table} SET status = '{PENDING}', lease_until = NULL, attempts = attempts - 1 "
+                 f"WHERE status = '{LEASED}' AND worker = ?")
+        params = (worker,)
+        if ids is not None:
+            if not ids:
+                return 0
+            query += f" AND id IN ({JobQueue._placeholders(ids)})"
+            params += tuple(ids)
+        with self._lock:
+            return self._execute(query, params)
+
+    def counts(self, exclude_worker=None):
+        """
+        Returns the number of jobs per status, without the jobs leased by exclude_worker if given.
+        """
+        query = f"SELECT status, COUNT(*) FROM {self._table}"
+        params = ()
+        if exclude_worker is not None:
+            query += f" WHERE NOT (status = '{LEASED}' AND worker = ?)"
+            params = (exclude_worker,)
+        with self._lock:
+            rows = self._fetchall(query + " GROUP BY status", params)
+        return {PENDING: 0, LEASED: 0, DONE: 0, FAILED: 0, **{status: n for status, n in rows}}
+
+    def purge(self, statuses=(DONE,)):
+        """
+        Deletes the jobs with the given statuses, for example the done jobs of a previous run before adding new ones.
+        """
+        query = f"DELETE FROM {self._table} WHERE status IN ({JobQueue._placeholders(statuses)})"
+        with self._lock:
+            return self._execute(query, tuple(statuses))
+
+    def consume(self, worker, prefetch=1, poll_interval=5.0):
+        """
+        Returns a QueueConsumer: the jobs of the queue as an iterable of ScrapeJobs, for ScrapeExecutor.iter_results.
+        """
+        return QueueConsumer(self, worker, prefetch, poll_interval)
+
+    def _fail_exhausted(self):
+        """
+        Marks failed the jobs whose last allowed lease expired.
+        """
+        self._execute(f"UPDATE {self._table} SET status = '{FAILED}', error = 'lease expired' "
+                      f"WHERE status = '{LEASED}' AND lease_until < {_NOW[self._dialect]} AND attempts >= ?",
+                      (self.max_attempts,))
+
+    def _query(self, query):
+        # psycopg2 uses the format paramstyle, sqlite3 and pyodbc the qmark one
+        return query.replace("?", "%s") if self._dialect == 'postgre' else query
+
+    def _execute(self, query, params=()):
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(self._query(query), params)
+            return cursor.rowcount
+        finally:
+            cursor.close()
+
+    def _executemany(self, query, rows):
+        cursor = self._conn.cursor()
+        try:
+            cursor.executemany(self._query(query), rows)
+        finally:
+            cursor.close()
+
+    def _fetchall(self, query, params=()):
+        cursor = self._conn.cursor()
+        try:
+            cursor.execute(self._query(query), params)
+            return cursor.fetchall()
+        finally:
+            cursor.close()
+
+    @staticmethod
+    def _placeholders(values):
+        return ', '.join(['?'] * len(values))
+
+
+class QueueConsumer:
+    """
+    The jobs of a JobQueue as an iterable of ScrapeJobs for one worker: jobs are claimed `prefetch` at a time,
+    when the executor asks for them, and their leases are extended by a heartbeat thread until they are
+    marked done (done) or failed (failed). Iteration ends when no job is pending nor leased by another worker
+    anymore (the jobs this consumer holds are marked done after the iteration asked for the next job);
+    while other workers still hold leases, the consumer waits `poll_interval` seconds and tries again,
+    so that it picks up the jobs of workers that died.
+    Closing the consumer gives the jobs it still holds back to the queue.
+    """
+
+    def __init__(self, queue, worker, prefetch=1, poll_interval=5.0):
+        self._queue = queue
+        self._worker = worker
+        self._prefetch = prefetch
+        self._poll_interval = poll_interval
+        self._held = {}  # ScrapeJob -> QueuedJob
+        self._held_lock = threading.Lock()
+        self._stopped = threading.Event()
+
+        counts = queue.counts()
+        # other workers take their share: only used for the progress and ETA of the executor
+        self._n_jobs = counts[PENDING] + counts[LEASED]
+
+        self._heartbeat = threading.Thread(target=self._send_heartbeats, name="QueueHeartbeat", daemon=True)
+        self._heartbeat.start()
+
+    def __repr__(self):
+        return f"QueueConsumer: worker {self._worker}, {len(self._held)} jobs held"
+
+    def __len__(self):
+        return self._n_jobs
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __iter__(self):
+        while not self._stopped.is_set():
+            claimed = self._queue.claim(self._worker, self._prefetch)
+            if not claimed:
+                counts = self._queue.counts(exclude_worker=self._worker)
+                if counts[PENDING] == 0 and counts[LEASED] == 0:
+                    return
+                self._stopped.wait(self._poll_interval)
+                continue
+
+            with self._held_lock:
+                for queued in claimed:
+                    self._held[queued.job] = queued
+            for queued in claimed:
+                yield queued.job
+
+    def done(self, job):
+        """
+        Marks a job done.
+        """
+        with self._held_lock:
+            queued = self._held.pop(job, None)
+        if queued is not None:
+            self._queue.complete([queued.id])
+
+    def failed(self, job, error=None):
+        """
+        Gives a failed job back to the queue (see JobQueue.fail).
+        """
+        with self._held_lock:
+            queued = self._held.pop(job, None)
+        if queued is not None:
+            self._queue.fail(self._worker, queued.id, error)
+
+    def close(self):
+        """
+        Stops the heartbeats and gives the jobs still held back to the queue.
+        """
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        self._heartbeat.join()
+
+        with self._held_lock:
+            ids = [queued.id for queued in self._held.values()]
+            self._held = {}
+        if ids:
+            self._queue.release(self._worker, ids)
+            logger.info(f"{len(ids)} unfinished jobs given back to the queue")
+
+    def _send_heartbeats(self):
+        """
+        Heartbeat thread: extends the leases of the held jobs three times per lease.
+        """
+        interval = self._queue.lease_seconds / 3
+        while not self._stopped.wait(interval):
+            with self._held_lock:
+                ids = [queued.id for queued in self._held.values()]
+            try:
+                extended = self._queue.heartbeat(self._worker, ids)
+            except Exception as e:
+                logger.error(f"Heartbeat failed: {e}")
+                continue
+            if extended < len(ids):
+                logger.warning(f"{len(ids) - extended} leases of worker {self._worker} were lost")
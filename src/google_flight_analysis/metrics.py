@@ -0,0 +1,181 @@
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+__all__ = ['Histogram', 'Metrics', 'metrics']
+
+# upper bounds in seconds, from a cached parse to a timed out page
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30, 60)
+
+
+class Histogram:
+    """
+    Distribution of the observed values of one metric: count, sum, min, max and counts per bucket.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self._buckets) + 1)  # last one: over the highest bucket
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+
+    def __repr__(self):
+        return f"Histogram: {self.count} values, sum {round(self.sum, 3)}"
+
+    def observe(self, value):
+        self._counts[bisect_left(self._buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def cumulative_buckets(self):
+        """
+        Returns [(upper bound, number of values <= upper bound)], ending with (inf, count).
+        """
+        res = []
+        total = 0
+        for bound, n in zip(self._buckets + (float('inf'),), self._counts):
+            total += n
+            res.append((bound, total))
+        return res
+
+    def quantile(self, q):
+        """
+        Returns the upper bound of the bucket holding the q-th quantile (the max for the last bucket).
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        for bound, total in self.cumulative_buckets():
+            if total >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def to_dict(self):
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.quantile(0.5),
+            'p95': self.quantile(0.95),
+            'buckets': {('+Inf' if bound == float('inf') else str(bound)): total
+                        for bound, total in self.cumulative_buckets()}
+        }
+
+
+class Metrics:
+    """
+    Thread safe registry of timing histograms, keyed by metric name and labels.
+    Phases are timed with spans, for example:
+        with metrics.span("scrape", phase="page_load"):
+            driver.get(url)
+    records the duration in the histogram scrape_seconds{phase="page_load"}.
+    The registry can be exported as JSON or in the Prometheus text format.
+    """
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self._buckets = buckets
+        self._histograms = {}
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"Metrics: {len(self._histograms)} series"
+
+    def reset(self):
+        with self._lock:
+            self._histograms = {}
+
+    def observe(self, name, value, **labels):
+        """
+        Records a value in the histogram of the metric name and labels.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(self._buckets)
+            histogram.observe(value)
+
+    @contextmanager
+    def span(self, name, **labels):
+        """
+        Times the enclosed block (also when it raises) into the histogram {name}_seconds.
+        """
+        time_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(f"{name}_seconds", time.perf_counter() - time_start, **labels)
+
+    def get(self, name, **labels):
+        """
+        Returns the histogram of a metric name and labels, or None if nothing was recorded.
+        """
+        with self._lock:
+            return self._histograms.get((name, tuple(sorted(labels.items()))))
+
+    def to_dict(self):
+        """
+        Returns {name: [{'labels': {...}, 'count': ..., 'sum': ..., 'buckets': {...}, ...}]}.
+        """
+        with self._lock:
+            items = sorted(self._histograms.items())
+            res = {}
+            for (name, labels), histogram in items:
+                res.setdefault(name, []).append({'labels': dict(labels), **histogram.to_dict()})
+        return res
+
+    def to_json(self):
+        return json.dumps(self.to_dict(), indent=2)
+
+    def to_prometheus(self):
+        """
+        Returns the histograms in the Prometheus text exposition format.
+        """
+        lines = []
+        for name, series in self.to_dict().items():
+            lines.append(f"# TYPE {name} histogram")
+            for s in series:
+                labels = [f'{k}="{v}"' for k, v in s['labels'].items()]
+                for bound, total in s['buckets'].items():
+                    bucket_labels = ",".join(labels + ['le="%s"' % bound])
+                    lines.append(f"{name}_bucket{{{bucket_labels}}} {total}")
+                label_str = f"{{{','.join(labels)}}}" if labels else ""
+                lines.append(f"{name}_sum{label_str} {s['sum']}")
+                lines.append(f"{name}_count{label_str} {s['count']}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, filepath):
+        """
+        Writes the metrics to a file: Prometheus text format for .prom files, JSON otherwise.
+        """
+        folder = os.path.dirname(filepath)
+        if folder and not os.path.isdir(folder):
+            os.makedirs(folder)
+
+        with open(filepath, 'w', encoding='utf-8') as f:
+            f.write(self.to_prometheus() if filepath.endswith(".prom") else self.to_json())
+
+    def summary(self):
+        """
+        Returns one line per series: count, total, p50 and p95 seconds, slowest total first.
+        """
+        with self._lock:
+            items = sorted(self._histograms.items(), key=lambda item: -item[1].sum)
+        lines = []
+        for (name, labels), h in items:
+            label_str = ",".join(f"{k}={v}" for k, v in labels)
+            lines.append(f"{name}{{{label_str}}}: n={h.count} total={round(h.sum, 2)}s "
+                         f"p50<={round(h.quantile(0.5), 3)}s p95<={round(h.quantile(0.95), 3)}s")
+        return lines
+
+
+# registry of the pipeline (Scrape, Database...), exported once per run
+metrics = Metrics()
@@ -0,0 +1,156 @@
+from datetime import datetime, timedelta
+
+from src.google_flight_analysis.executor import ScrapeJob
+
+__all__ = ['SchedulePlanner', 'FreshnessFilter', 'route_jobs']
+
+_DATE_FORMAT = "%Y-%m-%d"
+
+
+def route_jobs(route, today=None, min_stay=None, max_stay=None):
+    """
+    Yields the scrape jobs of one route of config.ini, in date order. Supported formats:
+    [origin, destination, range_of_days_from_today]
+    [origin, destination, target_date (YYYY-MM-DD), flexible_day_range]
+    [origin, destination, to (YYYY-MM-DD), returndate (YYYY-MM-DD), flexible_day_range]
+    Round trips are only scraped if the stay (return - leave, in days) is between min_stay and max_stay:
+    returns on or before the departure day are always skipped.
+    """
+    origin, destination = route[0], route[1]
+
+    # [origin, destination, range_of_days_from_today]
+    if len(route) == 3 and isinstance(route[2], int):
+        today = datetime.today() if today is None else today
+        for i in range(route[2]):
+            yield ScrapeJob(origin, destination, (today + timedelta(days=i + 1)).strftime(_DATE_FORMAT))
+
+    # [origin, destination, target_date (YYYY-MM-DD), flexible_day_range]
+    elif len(route) == 4 and isinstance(route[3], int):
+        for date in _flexible_dates(route[2], route[3]):
+            yield ScrapeJob(origin, destination, date.strftime(_DATE_FORMAT))
+
+    # [origin, destination, to (YYYY-MM-DD), returndate (YYYY-MM-DD), flexible_day_range]
+    elif len(route) == 5 and isinstance(route[4], int):
+        return_dates = _flexible_dates(route[3], route[4])
+        for date_leave in _flexible_dates(route[2], route[4]):
+            for date_return in _stay_window(return_dates, date_leave, min_stay, max_stay):
+                yield ScrapeJob(origin, destination, date_leave.strftime(_DATE_FORMAT), date_return.strftime(_DATE_FORMAT))
+
+    else:
+        raise ValueError(f"Something wrong with config.ini route: {route}")
+
+
+def _flexible_dates(date, flexible_days):
+    """
+    Returns the dates from `flexible_days` days before to `flexible_days` days after the date.
+    """
+    date = datetime.strptime(date, _DATE_FORMAT)
+    return [date + timedelta(days=i) for i in range(-flexible_days, flexible_days + 1)]
+
+
+def _stay_window(return_dates, date_leave, min_stay=None, max_stay=None):
+    """
+    Returns the return dates (consecutive days) that give a valid stay when leaving on date_leave.
+    """
+    first = date_leave + timedelta(days=max(1, min_stay or 0))
+    last = return_dates[-1] if max_stay is None else min(return_dates[-1], date_leave + timedelta(days=max_stay))
+    if first > last:
+        return []
+
+    start = max(0, (first - return_dates[0]).days)
+    stop = (last - return_dates[0]).days + 1
+    return return_dates[start:stop]
+
+
+class SchedulePlanner:
+    """
+    Turns the routes of config.ini into a lazy stream of scrape jobs.
+    Jobs are generated route by route, in date order, and a job that was already generated by an
+    earlier (overlapping) route is skipped, so every search is scraped once per run.
+    Jobs for which `skip(job)` is True (for example a FreshnessFilter) are left out as well.
+    """
+
+    def __init__(self, routes, min_stay=None, max_stay=None, today=None, skip=None):
+        for route in routes:
+            if len(route) not in (3, 4, 5) or not isinstance(route[-1], int):
+                raise ValueError(f"Something wrong with config.ini route: {route}")
+        if min_stay is not None and max_stay is not None and min_stay > max_stay:
+            raise ValueError(f"min_stay ({min_stay}) is greater than max_stay ({max_stay}).")
+
+        self._routes = routes
+        self._min_stay = min_stay
+        self._max_stay = max_stay
+        self._today = datetime.today() if today is None else today
+        self._skip = skip
+        self._count = None
+
+    def __repr__(self):
+        return f"SchedulePlanner: {len(self._routes)} routes"
+
+    def __iter__(self):
+        seen = set()
+        for route in self._routes:
+            for job in route_jobs(route, self._today, self._min_stay, self._max_stay):
+                if job in seen:
+                    continue
+                seen.add(job)
+                if self._skip is None or not self._skip(job):
+                    yield job
+
+    def __len__(self):
+        return self.count()
+
+    def count(self):
+        """
+        Returns the exact number of jobs that will be generated.
+        """
+        if self._count is None:
+            self._count = sum(1 for _ in self)
+        return self._count
+
+
+class FreshnessFilter:
+    """
+    Skips the jobs scraped less than a freshness window ago, given the latest access date of every search
+    (see Database.latest_access_dates). The window is `default` unless the route has its own in `windows`,
+    keyed by (origin, destination).
+    """
+
+    # options of the [freshness] section that are not routes
+    _OPTIONS = ('enabled', 'hours')
+
+    def __init__(self, latest, default=timedelta(hours=24), windows=None, now=None):
+        self._latest = latest
+        self._default = default
+        self._windows = {} if windows is None else windows
+        self._now = datetime.today() if now is None else now
+
+    def __repr__(self):
+        return f"FreshnessFilter: {len(self._latest)} searches"
+
+    def __call__(self, job):
+        access_date = self._latest.get((job.origin, job.dest, job.date_leave, job.date_return))
+        if access_date is None:
+            return False
+        return self._now - access_date < self._windows.get((job.origin, job.dest), self._default)
+
+    @classmethod
+    def from_config(cls, db, section, now=None):
+        """
+        Builds the filter from a config section, querying the database once for the latest scrapes:
+        [freshness]
+        hours = 24      ; default window
+        dfw_avl = 6     ; DFW -> AVL searches are refreshed every 6 hours
+        """
+        now = datetime.today() if now is None else now
+        default = timedelta(hours=section.getfloat("hours", fallback=24))
+        windows = {}
+        for key in section:
+            if key in FreshnessFilter._OPTIONS:
+                continue
+            origin, dest = key.upper().split("_")
+            windows[(origin, dest)] = timedelta(hours=section.getfloat(key))
+
+        # only scrapes newer than the longest window can make a job fresh
+        max_window = max([default, *windows.values()])
+        return cls(db.latest_access_dates(now - max_window), default, windows, now)
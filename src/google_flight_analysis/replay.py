@@ -0,0 +1,69 @@
+import csv
+import os
+import re
+from datetime import datetime
+
+__all__ = ['save_tokens', 'load_tokens', 'recording_filename', 'parse_recording_filename', 'list_recordings']
+
+# {access_date_YYMMDD}_{access_time_HHMMSS}_{orig}_{dest}_{leave_date_YYMMDD}[_{return_date_YYMMDD}].csv
+_RECORDING_REGEX = re.compile(r"(\d{6}_\d{6})_([A-Z]{3})_([A-Z]{3})_(\d{6})(?:_(\d{6}))?\.csv")
+
+
+def save_tokens(tokens, filepath):
+    """
+    Saves the raw text strings of a results page, one per row (same format as assets/bigList.csv).
+    """
+    with open(filepath, 'w', newline='', encoding='utf-8') as csvfile:
+        writer = csv.writer(csvfile)
+        for token in tokens:
+            writer.writerow([token])
+
+
+def load_tokens(filepath):
+    """
+    Loads the raw text strings of a results page saved with save_tokens.
+    """
+    with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
+        return [row[0] if row else '' for row in csv.reader(csvfile)]
+
+
+def recording_filename(origin, dest, date_leave, date_return=None, access_date=None):
+    """
+    Format:
+    {access_date_YYMMDD}_{access_time_HHMMSS}_{orig}_{dest}_{leave_date_YYMMDD}[_{return_date_YYMMDD}].csv
+    """
+    access_date = datetime.today() if access_date is None else access_date
+
+    res = f"{access_date.strftime('%y%m%d_%H%M%S')}_{origin}_{dest}"
+    res += f"_{datetime.strptime(date_leave, '%Y-%m-%d').strftime('%y%m%d')}"
+    if date_return:
+        res += f"_{datetime.strptime(date_return, '%Y-%m-%d').strftime('%y%m%d')}"
+    res += ".csv"
+
+    return res
+
+
+def parse_recording_filename(filename):
+    """
+    Returns a dict with the scrape parameters (origin, dest, date_leave, date_return, access_date)
+    encoded in a recording filename, or None if the filename is not a recording.
+    """
+    match = _RECORDING_REGEX.fullmatch(os.path.basename(filename))
+    if match is None:
+        return None
+
+    access_date, origin, dest, date_leave, date_return = match.groups()
+    return {
+        'origin': origin,
+        'dest': dest,
+        'date_leave': datetime.strptime(date_leave, '%y%m%d').strftime('%Y-%m-%d'),
+        'date_return': (datetime.strptime(date_return, '%y%m%d').strftime('%Y-%m-%d') if date_return else None),
+        'access_date': datetime.strptime(access_date, '%y%m%d_%H%M%S')
+    }
+
+
+def list_recordings(folder):
+    """
+    Returns the paths of all recordings in a folder, oldest first.
+    """
+    return sorted(os.path.join(folder, f) for f in os.listdir(folder) if _RECORDING_REGEX.fullmatch(f))
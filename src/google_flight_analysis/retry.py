@@ -0,0 +1,217 @@
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+
+from selenium.common.exceptions import TimeoutException
+
+__all__ = ['ScrapeError', 'ScrapeTimeout', 'ConsentPageError', 'EmptyResultsError', 'NoFlightsError',
+           'classify', 'RetryPolicy', 'CircuitBreaker']
+
+# logging
+logger_name = os.path.basename(__file__)
+logger = logging.getLogger(logger_name)
+
+# failure kinds
+TIMEOUT = 'timeout'
+CONSENT = 'consent'
+EMPTY = 'empty'
+NO_FLIGHTS = 'no_flights'
+OTHER = 'other'
+
+
+class ScrapeError(Exception):
+    """
+    A Google Flights page that did not give results. kind is one of the failure kinds of this module.
+    """
+    kind = OTHER
+
+
+class ScrapeTimeout(ScrapeError):
+    """
+    The results did not load in time.
+    """
+    kind = TIMEOUT
+
+
+class ConsentPageError(ScrapeError):
+    """
+    Stuck on Google's Terms & Conditions page.
+    """
+    kind = CONSENT
+
+
+class EmptyResultsError(ScrapeError):
+    """
+    The page loaded, but no flight could be parsed from it.
+    """
+    kind = EMPTY
+
+
+class NoFlightsError(ScrapeError):
+    """
+    Google Flights has no flights for the search: retrying does not help.
+    """
+    kind = NO_FLIGHTS
+
+
+def classify(error):
+    """
+    Returns the failure kind of an exception raised by a scrape.
+    """
+    if isinstance(error, ScrapeError):
+        return error.kind
+    if isinstance(error, TimeoutException):
+        return TIMEOUT
+    return OTHER
+
+
+class RetryPolicy:
+    """
+    Which failed scrapes are tried again, and after how long: exponential backoff from base_delay seconds,
+    capped at max_delay, minus a random part of up to `jitter` of it so that workers do not retry in step.
+    Only the failure kinds of retry_on are retried, at most max_attempts attempts in all.
+    """
+
+    def __init__(self, max_attempts=3, base_delay=5.0, max_delay=120.0, jitter=0.5, retry_on=(TIMEOUT, CONSENT, EMPTY)):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.retry_on = frozenset(retry_on)
+
+    def __repr__(self):
+        return f"RetryPolicy: {self.max_attempts} attempts, {self.base_delay}-{self.max_delay} sec backoff"
+
+    @classmethod
+    def from_config(cls, section):
+        """
+        Builds the policy from a config.ini section (max_attempts, base_delay, max_delay, jitter).
+        """
+        return cls(max_attempts=section.getint("max_attempts", fallback=3),
+                   base_delay=section.getfloat("base_delay", fallback=5.0),
+                   max_delay=section.getfloat("max_delay", fallback=120.0),
+                   jitter=section.getfloat("jitter", fallback=0.5))
+
+    def should_retry(self, error, attempt):
+        """
+        True if a scrape that failed with error on its attempt-th attempt (from 1) is tried again.
+        """
+        return attempt < self.max_attempts and classify(error) in self.retry_on
+
+    def delay(self, attempt):
+        """
+        Returns the seconds to wait after the attempt-th failed attempt (from 1).
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * (1 - self.jitter * random.random())
+
+
+class CircuitBreaker:
+    """
+    Stops all workers from loading pages when failures spike, instead of wasting browser time on pages
+    Google will not serve. Opens once at least failure_rate of the last `window` page loads failed
+    (after min_calls of them), then lets no page through for cooldown seconds. After that, a single trial
+    page goes through: the circuit closes if it succeeds, and opens again if it fails.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, window=20, failure_rate=0.5, min_calls=10, cooldown=300.0, counted=(TIMEOUT, CONSENT, EMPTY)):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.counted = frozenset(counted)
+        self._outcomes = deque(maxlen=window)
+        self._state = CircuitBreaker.CLOSED
+        self._opened_at = None
+        self._trial = False
+        self._n_opened = 0
+        self._condition = threading.Condition()
+
+    def __repr__(self):
+        return f"CircuitBreaker: {self.state}, opened {self._n_opened} times"
+
+    @classmethod
+    def from_config(cls, section):
+        """
+        Builds the breaker from a config.ini section (window, failure_rate, min_calls, cooldown).
+        """
+        return cls(window=section.getint("window", fallback=20),
+                   failure_rate=section.getfloat("failure_rate", fallback=0.5),
+                   min_calls=section.getint("min_calls", fallback=10),
+                   cooldown=section.getfloat("cooldown", fallback=300.0))
+
+    @property
+    def state(self):
+        with self._condition:
+            return self._state
+
+    @property
+    def n_opened(self):
+        return self._n_opened
+
+    def wait(self):
+        """
+        Blocks until the caller is allowed to load a page.
+        """
+        with self._condition:
+            while True:
+                if self._state == CircuitBreaker.CLOSED:
+                    return
+                if self._state == CircuitBreaker.OPEN:
+                    remaining = self._opened_at + self.cooldown - time.monotonic()
+                    if remaining > 0:
+                        self._condition.wait(remaining)
+                        continue
+                    self._state = CircuitBreaker.HALF_OPEN
+                    self._trial = False
+                # half open: one trial page at a time
+                if not self._trial:
+                    self._trial = True
+                    return
+                self._condition.wait()
+
+    def record_success(self):
+        with self._condition:
+            self._outcomes.append(False)
+            if self._state == CircuitBreaker.HALF_OPEN:
+                logger.info("Circuit breaker closed: trial page loaded")
+                self._state = CircuitBreaker.CLOSED
+                self._outcomes.clear()
+                self._condition.notify_all()
+
+    def record_failure(self, error):
+        """
+        Records a failed page load. Only the failure kinds of `counted` count: a search without flights is
+        a page that loaded fine, other errors (a browser crash, a parsing bug) say nothing about Google.
+        """
+        kind = classify(error)
+        if kind == NO_FLIGHTS:
+            return self.record_success()
+        with self._condition:
+            if kind not in self.counted:
+                # lets another trial page through
+                if self._state == CircuitBreaker.HALF_OPEN:
+                    self._trial = False
+                    self._condition.notify_all()
+                return
+            self._outcomes.append(True)
+            if self._state == CircuitBreaker.HALF_OPEN:
+                self._open("trial page failed")
+            elif self._state == CircuitBreaker.CLOSED and len(self._outcomes) >= self.min_calls:
+                n_failed = sum(self._outcomes)
+                if n_failed >= self.failure_rate * len(self._outcomes):
+                    self._open(f"{n_failed} of the last {len(self._outcomes)} pages failed")
+
+    def _open(self, reason):
+        self._state = CircuitBreaker.OPEN
+        self._opened_at = time.monotonic()
+        self._trial = False
+        self._n_opened += 1
+        logger.warning(f"Circuit breaker open for {self.cooldown} sec: {reason}")
+        self._condition.notify_all()
@@ -2,32 +2,154 @@
 # author: Emanuele Salonico, 2023
 
 import logging
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.common.exceptions import TimeoutException
+from selenium.common.exceptions import TimeoutException, WebDriverException
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support import expected_conditions as EC
 from datetime import date, datetime, timedelta
 import re
 import os
+from bisect import bisect_left
 import csv
+import json
 import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
-from src.google_flight_analysis.flight import Flight
+from src.google_flight_analysis.flight import Flight, _TIME_REGEX
+from src.google_flight_analysis.batch import FlightBatch
+from src.google_flight_analysis.browser import BrowserProfile
+from src.google_flight_analysis.metrics import metrics
+from src.google_flight_analysis.retry import ScrapeTimeout, ConsentPageError, EmptyResultsError, NoFlightsError
+from src.google_flight_analysis.replay import save_tokens, load_tokens, recording_filename, parse_recording_filename, list_recordings
 
 # logging
 logger_name = os.path.basename(__file__)
 logger = logging.getLogger(logger_name)
 
+# runs in the browser and returns a few values about the page text, so that polling the page while it loads
+# transfers a handful of bytes instead of the whole text (see Scrape._page_state)
+_PAGE_STATE_SCRIPT = """
+const body = document.body;
+if (!body) {
+    return null;
+}
+const text = body.innerText || '';
+let lines = 0;
+if (body.id === 'yDmH0d') {
+    for (const line of text.split('\\n')) {
+        if (line.trim()) {
+            lines++;
+        }
+    }
+}
+return {
+    lines: lines,
+    terms: text.includes('Before you continue to Google'),
+    no_flights: text.includes('No results returned')
+};
+"""
+
+_EMPTY_PAGE_STATE = {'lines': 0, 'terms': False, 'no_flights': False}
+
+# departing options of a round trip results page
+_DEPARTING_OPTIONS_SCRIPT = "return document.querySelectorAll('ul.Rk10dc li.pIav2d').length;"
+
+# asynchronous script, one call per departing option (arguments: option index, timeout in ms):
+# clicks the option, waits for its return flights, extracts the return section (from its 'Sort by:'),
+# goes back to the departing flights and returns {departing: [lines of the option], returning: [lines]},
+# or {error: ...} if a step did not complete in time
+_HARVEST_RETURNS_SCRIPT = """
+const index = arguments[0], timeoutMs = arguments[1], done = arguments[arguments.length - 1];
+const lines = (element) => (element.innerText || '').split('\\n').map((line) => line.trim()).filter((line) => line);
+const waitFor = (condition, step, next) => {
+    const deadline = Date.now() + timeoutMs;
+    const poll = () => {
+        if (condition()) {
+            next();
+        } else if (Date.now() > deadline) {
+            done({error: 'timeout waiting for ' + step});
+        } else {
+            setTimeout(poll, 100);
+        }
+    };
+    poll();
+};
+
+const options = document.querySelectorAll('ul.Rk10dc li.pIav2d');
+if (index >= options.length) {
+    done({error: 'no departing option ' + index});
+    return;
+}
+const departing = lines(options[index]);
+(options[index].querySelector('div.JMc5Xc') || options[index]).click();
+
+waitFor(() => /returning/i.test(document.body.innerText), 'return flights', () => {
+    const page = lines(document.body);
+    const start = page.lastIndexOf('Sort by:');
+    const returning = start >= 0 ? page.slice(start) : page;
+
+    const back = document.querySelector('div.AMbwDd.zlyfOd');
+    if (back) {
+        back.click();
+    }
+    waitFor(() => /^Best departing flights$/m.test(document.body.innerText), 'departing flights',
+            () => done({departing: departing, returning: returning}));
+});
+"""
+
+# separate the harvested round trip options from the page text in the scraped results (and recordings)
+_DEPARTING_OPTION_MARKER = "[departing option]"
+_RETURN_SECTION_MARKER = "[return flights]"
+
+# extraction='cards': returns the flight cards of the results page with their fields already separated,
+# {price_trend: ..., cards: [{times: [departure, arrival], airline, duration, route, stops, layover,
+# emissions, price}]}. A card missing its times or price (markup changed) comes with its text lines instead.
+_FLIGHT_CARDS_SCRIPT = """
+const lines = (text) => (text || '').split('\\n').map((line) => line.trim()).filter((line) => line);
+const text = (card, selector) => {
+    const element = card.querySelector(selector);
+    return element ? element.innerText.trim() : null;
+};
+
+const priceTrend = lines(document.body.innerText).find((line) => line.startsWith('Prices are currently'));
+const cards = [];
+for (const card of document.querySelectorAll('li.pIav2d')) {
+    const fields = {
+        times: [text(card, 'span[aria-label^="Departure time"]'), text(card, 'span[aria-label^="Arrival time"]')],
+        airline: text(card, '.sSHqwe.tPgKwe.ogfYpf span'),
+        duration: text(card, 'div[aria-label^="Total duration"]'),
+        route: text(card, '.PTuQse.sSHqwe.tPgKwe.ogfYpf'),
+        stops: text(card, 'span[aria-label$="flight."]'),
+        layover: text(card, '.BbR8Ec .sSHqwe'),
+        emissions: text(card, 'div[aria-label^="Carbon emissions"]'),
+        price: text(card, '.YMlIz.FpEdX span')
+    };
+    if (!fields.times[0] || !fields.times[1] || !fields.price) {
+        cards.push({lines: lines(card.innerText)});
+    } else {
+        cards.push(fields);
+    }
+}
+return {price_trend: priceTrend || null, cards: cards};
+"""
+
+# first token of the results scraped with extraction='cards', followed by the JSON payload of _FLIGHT_CARDS_SCRIPT
+_CARDS_MARKER = "[flight cards]"
+
+# fields of a card, in the order they are fed to the parser
+_CARD_FIELDS = ['airline', 'duration', 'route', 'stops', 'layover', 'emissions', 'price']
+
+_EXTRACTIONS = ('text', 'cards')
+
 
 class Scrape:
 
-    def __init__(self, orig, dest, date_leave, country='US', currency='USD', date_return=None, export=False):
+    def __init__(self, orig, dest, date_leave, country='US', currency='USD', date_return=None, export=False, driver_pool=None,
+                 replay=None, record=None, cache=None, extraction='text', browser_profile=None):
+        if extraction not in _EXTRACTIONS:
+            raise ValueError(f"Unknown extraction mode {extraction}, expected one of {_EXTRACTIONS}.")
+
         self._origin = orig
         self._dest = dest
         self._date_leave = date_leave
@@ -38,11 +160,23 @@ class Scrape:
         self._url = None
         self._country = country
         self._currency = currency
+        self._driver_pool = driver_pool
+        self._replay = replay
+        self._record = record
+        self._cache = cache
+        self._extraction = extraction
+        self._browser_profile = browser_profile
+        self._access_date = None
+        self._from_cache = False
 
     def run_scrape(self):
-        self._data = self._scrape_data()
+        with metrics.span("scrape", phase="total"):
+            self._data = self._scrape_data()
 
-        if self._export:
+        # export=True or 'csv': one CSV per scrape in outputs/, 'parquet': append to outputs/parquet
+        if self._export == 'parquet':
+            Flight.export_to_parquet(self._data)
+        elif self._export:
             Flight.export_to_csv(self._data, self._origin,
                                  self._dest, self._date_leave, self._date_return)
 
@@ -126,27 +260,87 @@ class Scrape:
     def url(self):
         return self._url
 
-    def create_driver(self):
-        options = Options()
-        options.add_argument('--no-sandbox')
-        options.add_argument('--headless')
-        # otherwise data such as layover location and emissions is not displayed
-        options.add_argument("--window-size=1920,1080")
-        options.add_argument("--incognito")
-        # options.add_argument('--disable-dev-shm-usage')
-        driver = webdriver.Chrome(service=Service(
-            ChromeDriverManager().install()), options=options)
+    @property
+    def from_cache(self):
+        """
+        True if the last run_scrape was served from the cache (the page was not loaded again).
+        """
+        return self._from_cache
+
+    @property
+    def replay(self):
+        return self._replay
+
+    @property
+    def record(self):
+        return self._record
+
+    @classmethod
+    def from_recording(cls, filepath, **kwargs):
+        """
+        Returns a Scrape that replays a page recorded with record=folder,
+        with the airports, dates and access date encoded in the recording's filename.
+        """
+        params = parse_recording_filename(filepath)
+        if params is None:
+            raise ValueError(f"Not a recording filename: {filepath}")
+
+        scrape = cls(params['origin'], params['dest'], params['date_leave'], date_return=params['date_return'],
+                     replay=filepath, **kwargs)
+        scrape._access_date = params['access_date']
+        return scrape
+
+    @staticmethod
+    def replay_folder(folder):
+        """
+        Re-parses all the pages recorded in a folder and returns a single DataFrame of their results,
+        without a browser or network.
+        """
+        batch = FlightBatch()
+        for filepath in list_recordings(folder):
+            scrape = Scrape.from_recording(filepath)
+            scrape._clean_results_batch(scrape._replay_results(), batch)
+
+        return batch.dataframe()
+
+    @staticmethod
+    def create_driver(profile=None):
+        """
+        Starts a Chrome browser with a BrowserProfile (the 'default' preset if None).
+        """
+        profile = BrowserProfile.preset('default') if profile is None else profile
+        with metrics.span("scrape", phase="driver_start"):
+            driver = profile.create_driver()
 
         return driver
 
     def _scrape_data(self):
         """
         Scrapes the Google Flights page and returns a DataFrame of the results.
+        If a DriverPool was given, a warm driver is leased from it instead of starting a new browser.
+        In replay mode, the recorded page is parsed instead, and pages found in the cache are not scraped again.
         """
-        driver = self.create_driver()
         self._url = self._make_url()
-        flight_results = self._get_results(driver)
-        driver.quit()
+        cached = None
+        if self._cache is not None and self._replay is None:
+            with metrics.span("scrape", phase="cache_get"):
+                cached = self._cache.get(self._url)
+
+        if self._replay is not None:
+            flight_results = self._clean_results_batch(self._replay_results()).dataframe()
+        elif cached is not None:
+            results, self._access_date = cached
+            self._from_cache = True
+            flight_results = self._clean_results_batch(results).dataframe()
+        elif self._driver_pool is not None:
+            with self._driver_pool.lease() as driver:
+                flight_results = self._get_results(driver)
+        else:
+            driver = Scrape.create_driver(self._browser_profile)
+            try:
+                flight_results = self._get_results(driver)
+            finally:
+                driver.quit()
 
         return flight_results
 
@@ -176,107 +370,178 @@ class Scrape:
     def _get_results(self, driver):
         """
         Returns the scraped flight results as a DataFrame.
+        Raises a ScrapeError (see retry.py) if the page gave no results: ScrapeTimeout, ConsentPageError,
+        NoFlightsError, or EmptyResultsError if no flight could be parsed from the page.
         """
-        results = None
-        try:
-            results = Scrape._make_url_request(self._url, driver, self._date_return)
-        except TimeoutException:
-            logger.error(f"Scrape timeout reached. It could mean that no flights exist for the combination of airports and dates." )
-            return -1
-        if self._date_return is None:
-            flights = self._clean_results_oneway(results)
-        else:
-            flights = self._clean_results_roundtrip(results)
-        return Flight.dataframe(flights)
+        results = Scrape._make_url_request(self._url, driver, self._date_return, self._extraction)
+
+        self._access_date = datetime.today()
+        if self._record is not None:
+            self._record_results(results)
+
+        flight_results = self._clean_results_batch(results).dataframe()
+        if flight_results.empty:
+            raise EmptyResultsError(f"No flights parsed from {len(results)} lines: {self._url}")
+        # only pages that gave flights are cached, a failed page is loaded again
+        if self._cache is not None:
+            self._cache.put(self._url, results, self._access_date)
+
+        return flight_results
+
+    def _replay_results(self):
+        """
+        Returns the recorded raw text strings to replay: either the list itself or the content of a recording file.
+        """
+        if isinstance(self._replay, (str, os.PathLike)):
+            return load_tokens(self._replay)
+        return list(self._replay)
+
+    def _record_results(self, results):
+        """
+        Saves the raw text strings of a live page in the record folder, to be replayed later.
+        """
+        if not os.path.isdir(self._record):
+            raise FileNotFoundError(f"Check if folder {self._record} exists")
+
+        filename = recording_filename(self._origin, self._dest, self._date_leave, self._date_return, self._access_date)
+        save_tokens(results, os.path.join(self._record, filename))
 
     def _clean_results_oneway(self, result):
         """
-        Cleans and organizes the raw text strings scraped from the Google Flights results page.
+        Cleans and organizes the raw text strings scraped from the Google Flights results page,
+        returning a Flight object per result.
         """
-        res2 = [x.encode("ascii", "ignore").decode().strip() for x in result]
+        price_trend, flights_tokens = self._split_results(result)
 
-        price_trend_dirty = [
-            x for x in res2 if x.startswith("Prices are currently")]
+        return [
+            Flight(
+                self._date_leave,  # date_leave
+                self._round_trip,  # round_trip
+                self._origin,
+                self._dest,
+                price_trend,
+                tokens) for tokens in flights_tokens
+        ]
+
+    def _clean_results_batch(self, result, batch=None):
+        """
+        Same as _clean_results_oneway, but parses the results straight into the columns of a FlightBatch.
+        Pass the same batch for many pages to build a single DataFrame from all of them.
+        """
+        with metrics.span("scrape", phase="parse"):
+            result, options = Scrape._split_round_trip_options(result)
+            if result and result[0] == _CARDS_MARKER:
+                price_trend, flights_tokens = Scrape._split_cards(result)
+            else:
+                # with harvested return flights, those of the page's own return section are not needed
+                price_trend, flights_tokens = self._split_results(result, return_section=not options)
+
+            batch = FlightBatch() if batch is None else batch
+            batch.add_flights(flights_tokens, self._date_leave, self._round_trip, self._origin, self._dest, price_trend,
+                              self._access_date)
+            if options:
+                batch.add_round_trips(self._round_trip_tokens(options), self._date_leave, self._date_return,
+                                      self._origin, self._dest, price_trend, self._access_date)
+
+        return batch
+
+    @staticmethod
+    def _split_cards(result):
+        """
+        Returns the price trend and the list of tokens of each flight from the results of extraction='cards'.
+        The fields of a card become its tokens (the text lines for cards without fields).
+        """
+        payload = json.loads(result[1])
+
+        price_trend = payload.get('price_trend')
+        price_trend = Scrape.extract_price_trend([_ascii(price_trend)] if price_trend else [])
+
+        flights_tokens = []
+        for card in payload['cards']:
+            if 'lines' in card:
+                tokens = [_ascii(x) for x in card['lines']]
+                # the card's text starts with its departure time
+                start = next((i for i, x in enumerate(tokens) if _TIME_REGEX.search(x)), None)
+                if start is None:
+                    continue
+                tokens = tokens[start:]
+            else:
+                tokens = [_ascii(x) for x in card['times']]
+                for field in _CARD_FIELDS:
+                    if card.get(field):
+                        tokens += [_ascii(x) for x in card[field].split('\n')]
+            flights_tokens.append(tokens)
+
+        return price_trend, flights_tokens
+
+    @staticmethod
+    def _split_round_trip_options(result):
+        """
+        Splits the scraped results into the text of the page and the options harvested by _harvest_return_flights:
+        [(text of the departing option, text of its return section)].
+        """
+        if _DEPARTING_OPTION_MARKER not in result:
+            return result, []
+
+        starts = [i for i, x in enumerate(result) if x == _DEPARTING_OPTION_MARKER]
+        options = []
+        for start, end in zip(starts, starts[1:] + [len(result)]):
+            option = result[start + 1:end]
+            split = option.index(_RETURN_SECTION_MARKER) if _RETURN_SECTION_MARKER in option else len(option)
+            options.append((option[:split], option[split + 1:]))
+
+        return result[:starts[0]], options
+
+    def _round_trip_tokens(self, options):
+        """
+        Returns [(tokens of the departing flight, [tokens of each return flight])] for the harvested options.
+        Options whose departing flight or return flights cannot be found in their text are left out.
+        """
+        res = []
+        for departing, returning in options:
+            departing = [_ascii(x) for x in departing]
+            # the option's text starts with its departure time
+            start = next((i for i, x in enumerate(departing) if _TIME_REGEX.search(x)), None)
+            if start is None or not returning:
+                logger.error(f"Round trip option without flight: {departing}")
+                continue
+            try:
+                _, returns_tokens = self._split_results(returning, return_section=False)
+            except ValueError as e:
+                logger.error(e)
+                continue
+            res.append((departing[start:], returns_tokens))
+
+        return res
+
+    def _split_results(self, result, return_section=True):
+        """
+        Splits the raw text strings scraped from the Google Flights results page
+        into the price trend of the page and a list of tokens for each flight.
+        For round trips, the flights of the return section are included unless return_section is False.
+        """
+        res2 = [_ascii(x) for x in result]
+        markers = Scrape._scan_markers(res2)
+
+        price_trend_dirty = [res2[i] for i in markers['price_trend']]
         price_trend = Scrape.extract_price_trend(price_trend_dirty)
 
+        sections = Scrape._section_spans(markers, len(res2))
+        if not sections:
+            raise ValueError(f"No results section ('Sort by:') in list: {res2}")
+
         # grab destination info
-        skip_mid_end = False
-        start = res2.index("Sort by:")+1
-        try:
-            mid_start = res2.index("Price insights")
-        except ValueError:
-            try:
-                mid_start = res2.index("Other flights")
-            except:
-                try:
-                    mid_start = [i for i, x in enumerate(res2) if x.endswith('more flights')][0]
-                    skip_mid_end = True
-                except:
-                    try:
-                        mid_start = ([i for i, x in enumerate(res2[start_return:]) if x.startswith('Language')][0]) + start_return
-                        skip_mid_end = True
-                    except:
-                        logger.error(f"mid_start failure with list: {res2}")
-        res3 = res2[start:mid_start]
-        
-        mid_end = -1
-        if not skip_mid_end:
-            try:
-                mid_end = res2.index("Other departing flights")+1
-            except:
-                try:
-                    mid_end = res2.index("Other flights")+1
-                except:
-                    logger.error(f"mid_end failure with list: {res2}")
-            
-            try:
-                end = [i for i, x in enumerate(res2) if x.endswith('more flights')][0]
-            except:
-                try:
-                    end = [i for i, x in enumerate(res2) if 'Hide' in x][0]
-                except:
-                    logger.error(f"end failure with list: {res2}")
-            res3 += res2[mid_end:end]
+        res3 = []
+        for start, end in sections[0]:
+            res3 += res2[start:end]
 
         #   grab return info
-        if self._date_return != None:
-            skip_mid_end_return = False
-            start_return = res2.index("Sort by:", start + 1)+1
-            try:
-                mid_start_return = res2.index("Price insights", start_return + 1)
-            except ValueError:
-                try:
-                    mid_start_return = res2.index("Other flights", start_return + 1)
-                except:
-                    try:
-                        mid_start_return = ([i for i, x in enumerate(res2[start_return:]) if x.endswith('more flights')][0]) + start_return
-                        skip_mid_end_return = True
-                    except:
-                        try:
-                            mid_start_return = ([i for i, x in enumerate(res2[start_return:]) if x.startswith('Language')][0]) + start_return
-                            skip_mid_end_return = True
-                        except:
-                            logger.error(f"mid_start_return failure with list: {res2}")
-            res3 += res2[start_return:mid_start_return]
-
-            mid_end_return = -1
-            if not skip_mid_end_return:
-                try:
-                    mid_end_return = res2.index("Other departing flights", mid_end + 1)
-                except:
-                    try:
-                        mid_end_return = res2.index("Other flights", mid_end + 1)
-                    except:
-                        logger.error(f"mid_end_return failure with list: {res2}")
-
-                try:
-                    end_return = [i for i, x in enumerate(res2[end:]) if x.endswith('more flights')][0]
-                except:
-                    try:
-                        end_return = [i for i, x in enumerate(res2[end:]) if 'Hide' in x][0]
-                    except:
-                        logger.error(f"end_return failure with list: {res2}")
-                res3 = res2[mid_end_return:end_return]
+        if self._date_return != None and return_section:
+            if len(sections) > 1:
+                for start, end in sections[1]:
+                    res3 += res2[start:end]
+            else:
+                logger.error(f"return section failure with list: {res2}")
 
         matches = []
         # Enumerate over the list 'res3'
@@ -287,8 +552,7 @@ class Scrape:
                 continue
 
             # Check if the element ends with 'AM' or 'PM' (or AM+, PM+)
-            is_time_format = bool(
-                re.search("\d{1,2}\:\d{2}(?:AM|PM)\+{0,1}\d{0,1}", element))
+            is_time_format = bool(_TIME_REGEX.search(element))
 
             # If the element doesn't end with '+' and is in time format, then add it to the matches list
             if (element[-2] == '+' or is_time_format):
@@ -299,17 +563,91 @@ class Scrape:
         # Keep only every second item in the matches list
         matches = matches[::2]
 
-        flights = [
-            Flight(
-                self._date_leave,  # date_leave
-                self._round_trip,  # round_trip
-                self._origin,
-                self._dest,
-                price_trend,
-                res3[matches[i]:matches[i+1]]) for i in range(len(matches)-1)
-        ]
+        flights_tokens = [res3[matches[i]:matches[i+1]] for i in range(len(matches)-1)]
+
+        return price_trend, flights_tokens
+
+    @staticmethod
+    def _scan_markers(res2):
+        """
+        Returns the positions of all the section markers of a results page, found in a single pass over its text strings:
+        'Sort by:' (one per results section), 'Price insights', 'Other flights', 'Other departing flights',
+        '... more flights', 'Hide', 'Language...' and the price trend ('Prices are currently...').
+        """
+        markers = {kind: [] for kind in ['sort_by', 'price_insights', 'other_flights', 'other_departing_flights',
+                                          'more_flights', 'hide', 'language', 'price_trend']}
+        exact = {
+            "Sort by:": markers['sort_by'],
+            "Price insights": markers['price_insights'],
+            "Other flights": markers['other_flights'],
+            "Other departing flights": markers['other_departing_flights']
+        }
+
+        for i, x in enumerate(res2):
+            if x in exact:
+                exact[x].append(i)
+            if x.endswith('more flights'):
+                markers['more_flights'].append(i)
+            if 'Hide' in x:
+                markers['hide'].append(i)
+            if x.startswith('Language'):
+                markers['language'].append(i)
+            if x.startswith("Prices are currently"):
+                markers['price_trend'].append(i)
+
+        return markers
+
+    @staticmethod
+    def _section_spans(markers, n):
+        """
+        Returns, for each results section of the page (departing flights, then returning flights),
+        the list of (start, end) spans of its flights:
+        - from 'Sort by:' to 'Price insights' or 'Other flights', then from 'Other departing flights'
+          (or 'Other flights') to '... more flights' (or 'Hide')
+        - or, without price insights nor other flights, from 'Sort by:' to '... more flights' (or 'Language')
+        Each marker is looked up by bisection within its section, so the whole page is handled in linear time.
+        """
+        def first(kind, lo, hi):
+            positions = markers[kind]
+            i = bisect_left(positions, lo)
+            if i < len(positions) and positions[i] < hi:
+                return positions[i]
+            return None
+
+        sections = []
+        sort_by = markers['sort_by']
+        for k, sort_by_index in enumerate(sort_by):
+            start = sort_by_index + 1
+            limit = (sort_by[k + 1] if k + 1 < len(sort_by) else n)
+
+            mid_start = first('price_insights', start, limit)
+            if mid_start is None:
+                mid_start = first('other_flights', start, limit)
+            if mid_start is None:
+                end = first('more_flights', start, limit)
+                if end is None:
+                    end = first('language', start, limit)
+                if end is None:
+                    logger.error(f"mid_start failure in section starting at {start}")
+                    end = limit
+                sections.append([(start, end)])
+                continue
+
+            spans = [(start, mid_start)]
+            mid_end = first('other_departing_flights', start, limit)
+            if mid_end is None:
+                mid_end = first('other_flights', start, limit)
+            end = first('more_flights', start, limit)
+            if end is None:
+                end = first('hide', start, limit)
 
-        return flights
+            if mid_end is None or end is None:
+                logger.error(f"mid_end/end failure in section starting at {start}")
+            else:
+                spans.append((mid_end + 1, end))
+            sections.append(spans)
+
+        return sections
 
     #TODO: Finish cleaning results.
     # Thought is round trip is different enough from oneway to separate def.
@@ -346,32 +684,29 @@ class Scrape:
             return (None, None)
 
     @staticmethod
-    def _identify_google_terms_page(page_source: str):
-        """
-        Returns True if the page html represent Google's Terms and Coditions page.
-        """
-        if "Before you continue to Google" in page_source:
-            return True
-        return False
-
-    @staticmethod
-    def _make_url_request(url, driver, dateReturn):
+    def _make_url_request(url, driver, dateReturn, extraction='text'):
         """
         Get raw results from Google Flights page.
         Also handles auto acceptance of Google's Terms & Conditions page.
+        extraction='text' returns the text strings of the whole page, 'cards' the structured flight cards
+        (see _get_flight_cards).
+        Raises ConsentPageError if the terms page cannot be accepted, NoFlightsError if Google has no flights
+        for the search and ScrapeTimeout if the results do not load in time.
         """
         timeout = 15
-        driver.get(url)
+        with metrics.span("scrape", phase="page_load"):
+            driver.get(url)
         moreFlights = False
 
         # detect Google's Terms & Conditions page (not always there, only in EU)
-        if Scrape._identify_google_terms_page(driver.page_source):
-            WebDriverWait(driver, timeout).until(
-                lambda s: Scrape._identify_google_terms_page(s.page_source))
-
-            # click on accept terms button
-            WebDriverWait(driver, timeout).until(EC.element_to_be_clickable(
-                (By.XPATH, "//button[contains(., 'Accept all')]"))).click()
+        if Scrape._page_state(driver)['terms']:
+            with metrics.span("scrape", phase="consent"):
+                # click on accept terms button
+                try:
+                    WebDriverWait(driver, timeout).until(EC.element_to_be_clickable(
+                        (By.XPATH, "//button[contains(., 'Accept all')]"))).click()
+                except TimeoutException:
+                    raise ConsentPageError(f"Terms & Conditions page not accepted: {url}")
 
         #   Click the more flights button at bottom of screen to load more flights
         if moreFlights:
@@ -385,55 +720,99 @@ class Scrape:
         # wait for flight data to load and initial XPATH cleaning
         # originally this was 100, but once expanding More Flights, you get upward of 1000+ results.
         # TODO: Identify 'Help Center' for now, but I think it pops up before page is fully loaded..?
-        if moreFlights:
-            WebDriverWait(driver, timeout).until(
-                lambda d: len(Scrape._get_flight_elements(d)) > 250)
+        # the page is polled with _page_state, its whole text is only pulled once it is ready
+        min_lines = 250 if moreFlights else 40
+        # a page without flights is ready too: it is not waited for until the timeout
+        state = _EMPTY_PAGE_STATE
+        def ready(d):
+            nonlocal state
+            state = Scrape._page_state(d)
+            return state['lines'] > min_lines or state['no_flights']
+
+        with metrics.span("scrape", phase="wait_results"):
+            try:
+                WebDriverWait(driver, timeout).until(ready)
+            except TimeoutException:
+                if state['terms']:
+                    raise ConsentPageError(f"Still on the Terms & Conditions page after {timeout} sec: {url}")
+                raise ScrapeTimeout(f"Results not loaded after {timeout} sec ({state['lines']} lines): {url}")
+        if state['no_flights']:
+            raise NoFlightsError(f"No flights: {url}")
+
+        if extraction == 'cards':
+            with metrics.span("scrape", phase="extract_cards"):
+                results = Scrape._get_flight_cards(driver)
         else:
-            WebDriverWait(driver, timeout).until(
-                lambda d: len(Scrape._get_flight_elements(d)) > 40)
-
-        results = Scrape._get_flight_elements(driver)
+            with metrics.span("scrape", phase="extract_text"):
+                results = Scrape._get_flight_elements(driver)
 
-        # TODO: This needs further testing scenarios
         if dateReturn != None:
-            depart_headers = driver.find_elements(By.XPATH, "//ul[@class='Rk10dc']")
-            for i in range(len(depart_headers)):
-                depart_header_element = driver.find_elements(By.XPATH, "//ul[@class='Rk10dc']")[i]
-                #   now we have to check how many flights are in this header element.
-                group_element = depart_header_element.find_elements(By.XPATH, ".//li[@class='pIav2d']")
-                for j in range(len(group_element)):
-                    depart_header_element = driver.find_elements(By.XPATH, "//ul[@class='Rk10dc']")[i]
-                    group_element = depart_header_element.find_elements(By.XPATH, ".//li[@class='pIav2d']")[j]
-                    #   once inside the list item, find the element with button and click
-                    flight_element = group_element.find_element(By.XPATH, ".//div[@class='JMc5Xc']")
-                    driver.execute_script("arguments[0].click();", flight_element)
-                    
-                    WebDriverWait(driver, timeout).until(
-                        lambda d: any('returning' in element.lower() for element in Scrape._get_flight_elements(d)))
-
-                    results += Scrape._get_flight_elements(driver)
-
-                    return_element = driver.find_element(By.XPATH, "//div[@class='AMbwDd zlyfOd']")
-                    driver.execute_script("arguments[0].click();", return_element)
-
-                    WebDriverWait(driver, timeout).until(
-                        # lambda d: len(Scrape._get_flight_elements(d)) > 40)
-                        lambda d: 'Best departing flights' in Scrape._get_flight_elements(d))
-        
-        # TODO: This is just here because roundtrips take a long time to parse for debug.
-        # with open('bigList.csv', 'w', newline='', encoding='utf-8') as csvfile:
-        #     writer = csv.writer(csvfile)
-        #     for index in range(len(results)):
-        #         try:
-        #             writer.writerow([results[index]])
-        #         except:
-        #             writer.writerow("NONE")
-        
+            with metrics.span("scrape", phase="return_flights"):
+                results += Scrape._harvest_return_flights(driver, timeout)
+
         return results
 
+    @staticmethod
+    def _harvest_return_flights(driver, timeout):
+        """
+        Visits every departing option of a round trip results page and collects its return flights.
+        Each option takes a single (asynchronous) script call, which clicks it, waits in the page for the
+        return flights, extracts only the return section and goes back to the departing flights.
+        Returns, for each option: _DEPARTING_OPTION_MARKER, the text of the departing option,
+        _RETURN_SECTION_MARKER, then the text of its return section.
+        Stops at the first option that fails (an error of the script, or of the driver), keeping the options
+        harvested so far.
+        """
+        n_options = driver.execute_script(_DEPARTING_OPTIONS_SCRIPT) or 0
+        # the script waits twice (return flights, then departing flights) for at most timeout seconds each;
+        # pooled drivers are reused by other scrapes: their script timeout is restored afterwards
+        previous_timeout = driver.timeouts.script
+        driver.set_script_timeout(2 * timeout + 5)
+
+        results = []
+        try:
+            for i in range(n_options):
+                try:
+                    option = driver.execute_async_script(_HARVEST_RETURNS_SCRIPT, i, timeout * 1000)
+                except (TimeoutException, WebDriverException) as e:
+                    option = {'error': e}
+                if not option or 'error' in option:
+                    logger.error(f"Return flights of departing option {i + 1}/{n_options} not harvested: "
+                                 f"{option and option['error']}")
+                    break
+                results += [_DEPARTING_OPTION_MARKER, *option['departing'], _RETURN_SECTION_MARKER, *option['returning']]
+        finally:
+            driver.set_script_timeout(previous_timeout)
+
+        return results
+
+    @staticmethod
+    def _page_state(driver):
+        """
+        Returns what the readiness checks need to know about the page, computed in the browser:
+        {'lines': non-empty lines of the results page text, 'terms': True on Google's Terms & Conditions page,
+        'returning': the return flights are shown, 'departing': the departing flights are shown}.
+        """
+        state = driver.execute_script(_PAGE_STATE_SCRIPT)
+        return {**_EMPTY_PAGE_STATE, **state} if state else _EMPTY_PAGE_STATE
+
+    @staticmethod
+    def _get_flight_cards(driver):
+        """
+        Returns the flight cards of the page, extracted by a single script: _CARDS_MARKER and the JSON payload.
+        """
+        return [_CARDS_MARKER, json.dumps(driver.execute_script(_FLIGHT_CARDS_SCRIPT))]
+
     @staticmethod
     def _get_flight_elements(driver):
         """
         Returns all html elements that contain/have to do with flight data.
         """
         return driver.find_element(by=By.XPATH, value='//body[@id = "yDmH0d"]').text.split('\n')
+
+
+def _ascii(s):
+    """
+    Drops the non ascii characters of a text string of the page (narrow spaces in times, dashes in routes...).
+    """
+    return s.encode("ascii", "ignore").decode().strip()
@@ -0,0 +1,162 @@
+import logging
+import os
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from src.google_flight_analysis.flight import Flight
+
+__all__ = ['DatabaseSink']
+
+# logging
+logger_name = os.path.basename(__file__)
+logger = logging.getLogger(logger_name)
+
+# tells the writer thread to stop
+_STOP = object()
+
+
+class DatabaseSink:
+    """
+    Writes scrape results to a Database while scraping goes on.
+    Results are buffered until `flush_rows` rows are collected (0: flush after every write), then handed
+    to a background writer thread through a queue of at most `queue_size` batches. When the database is
+    slower than the scrapers, write() blocks instead of piling results up in memory.
+    With `parquet_folder`, every batch is also appended to that Parquet dataset (see Flight.export_to_parquet):
+    batches make far fewer and larger files than one export per scrape.
+    With `run_id`, every row gets it in the run_id column. Once a batch is in the database,
+    on_written(jobs) is called (from the writer thread) with the jobs given to write() for its rows.
+    """
+
+    def __init__(self, db, method='insert', flush_rows=5000, queue_size=4, parquet_folder=None, run_id=None,
+                 on_written=None):
+        self._db = db
+        self._parquet_folder = parquet_folder
+        self._run_id = run_id
+        self._on_written = on_written
+        self._method = method
+        self._flush_rows = flush_rows
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._buffer = []
+        self._buffered_jobs = []
+        self._buffered_rows = 0
+        self._closed = False
+
+        # stats
+        self._rows_written = 0
+        self._batches = 0
+        self._failed_batches = 0
+
+        self._writer = threading.Thread(target=self._write_batches, name="DatabaseSink", daemon=True)
+        self._writer.start()
+
+    def __repr__(self):
+        return f"DatabaseSink: {self._rows_written} rows written in {self._batches} batches"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def stats(self):
+        return {
+            'rows_written': self._rows_written,
+            'batches': self._batches,
+            'failed_batches': self._failed_batches,
+            'rows_buffered': self._buffered_rows
+        }
+
+    def write(self, df, job=None):
+        """
+        Adds the results of one scrape (a DataFrame with the columns of Flight.dataframe), of the job if given.
+        """
+        if self._closed:
+            raise ValueError("Cannot write to a closed DatabaseSink.")
+        if job is not None:
+            self._buffered_jobs.append(job)
+        if df is None or df.shape[0] == 0:
+            # nothing to write, but the job is done: reported with the next batch
+            return
+
+        self._buffer.append(df)
+        self._buffered_rows += df.shape[0]
+        if self._buffered_rows >= self._flush_rows:
+            self.flush()
+
+    def flush(self):
+        """
+        Hands the buffered results to the writer thread (blocks while the queue is full).
+        """
+        if not self._buffer and not self._buffered_jobs:
+            return
+
+        if not self._buffer:
+            batch = None
+        else:
+            batch = self._buffer[0] if len(self._buffer) == 1 else pd.concat(self._buffer, ignore_index=True)
+            if self._run_id is not None:
+                batch = batch.assign(run_id=self._run_id)
+        jobs = self._buffered_jobs
+        self._buffer = []
+        self._buffered_jobs = []
+        self._buffered_rows = 0
+        self._queue.put((batch, jobs))
+
+    def close(self):
+        """
+        Flushes the remaining results and waits until everything has been written.
+        """
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(_STOP)
+        self._writer.join()
+
+        logger.info(f"{self._rows_written} rows written to the database in {self._batches} batches"
+                    f" ({self._failed_batches} failed)")
+
+    def _write_batches(self):
+        """
+        Writer thread: adds each batch to the database, in the order they were flushed.
+        """
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+
+            batch, jobs = item
+            if batch is None:
+                self._report_written(jobs)
+                continue
+
+            if self._parquet_folder is not None:
+                try:
+                    Flight.export_to_parquet(batch, self._parquet_folder)
+                except Exception as e:
+                    logger.error(f"Error exporting {batch.shape[0]} rows to {self._parquet_folder}: {e}")
+
+            time_start = time.perf_counter()
+            try:
+                self._db.add_pandas_df_to_db(batch, method=self._method, raise_errors=True)
+            except Exception as e:
+                self._failed_batches += 1
+                logger.error(f"Error writing {batch.shape[0]} rows to the database: {e}")
+                continue
+
+            self._rows_written += batch.shape[0]
+            self._batches += 1
+            logger.debug(f"Batch of {batch.shape[0]} rows written in {round(time.perf_counter() - time_start, 2)} sec")
+            self._report_written(jobs)
+
+    def _report_written(self, jobs):
+        if self._on_written is None or not jobs:
+            return
+        try:
+            self._on_written(jobs)
+        except Exception as e:
+            logger.error(f"Error reporting {len(jobs)} written jobs: {e}")
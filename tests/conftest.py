@@ -0,0 +1,38 @@
+import pytest
+
+
+class FakeElement:
+    def __init__(self, text):
+        self.text = text
+
+
+class PageDriver:
+    """
+    Driver of a page that gets ready after a few polls: execute_script returns the states in order
+    (the last one repeats), find_element returns the whole text.
+    """
+
+    def __init__(self, states, text):
+        self._states = list(states)
+        self._text = text
+        self.scripts = 0
+        self.text_pulls = 0
+
+    def get(self, url):
+        pass
+
+    def execute_script(self, script, *args):
+        self.scripts += 1
+        return self._states.pop(0) if len(self._states) > 1 else self._states[0]
+
+    def find_element(self, by=None, value=None):
+        self.text_pulls += 1
+        return FakeElement(self._text)
+
+
+@pytest.fixture
+def page_driver():
+    """
+    Returns PageDriver, to build drivers of pages polled by Scrape._make_url_request: page_driver(states, text).
+    """
+    return PageDriver
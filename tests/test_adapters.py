@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from src.google_flight_analysis.adapters import pg_array_literal, pg_copy_chunks, CopyStream, mssql_rows, \
+    adapt_for_postgres, adapt_for_mssql
+
+
+def test_pg_array_literal_quotes_elements():
+    assert pg_array_literal(["Lufthansa", "Condor"]) == '{"Lufthansa","Condor"}'
+    assert pg_array_literal(['Air "Dolomiti", Inc', "a\\b"]) == '{"Air \\"Dolomiti\\", Inc","a\\\\b"}'
+    assert pg_array_literal([]) == '{}'
+
+
+def test_pg_copy_chunks_nulls_and_types():
+    df = pd.DataFrame({
+        'depart_departure_datetime': [datetime(2023, 8, 19, 17, 17), None],
+        'airlines': [["Allegiant"], ["United", "Tab\there"]],
+        'travel_time': [118, 233],
+        'layover_time': [np.nan, 52.0],
+        'layover_location': [["NONSTOP"], "FRA, JFK"],
+        'price_value': [None, '44'],
+        'one_way': [True, False],
+    })
+
+    text = ''.join(pg_copy_chunks(df, chunk_size=1))
+
+    assert text.split('\n') == [
+        '2023-08-19 17:17:00.000000\t{"Allegiant"}\t118\t\\N\t{"NONSTOP"}\t\\N\tt',
+        '\\N\t{"United","Tab\\there"}\t233\t52\t{"FRA","JFK"}\t44\tf',
+        '',
+    ]
+
+
+def test_copy_stream_reads_across_chunks():
+    chunks = ["abc\n", "defgh\n", "i\n"]
+    stream = CopyStream(chunks)
+
+    parts = []
+    while True:
+        data = stream.read(4)
+        if not data:
+            break
+        parts.append(data)
+
+    assert parts == ["abc\n", "defg", "h\ni\n"]
+
+
+def test_mssql_rows_are_plain_python_values():
+    df = pd.DataFrame({
+        'depart_departure_datetime': [datetime(2023, 8, 19, 17, 17), None],
+        'airlines': [np.array("{Allegiant}"), np.array("{United,Delta}")],
+        'travel_time': [118, 233],
+        'layover_time': [np.nan, 52.0],
+        'price_value': [None, '44'],
+        'one_way': [True, False],
+    })
+
+    rows = mssql_rows(df)
+
+    assert rows == [
+        (datetime(2023, 8, 19, 17, 17), "{Allegiant}", 118, None, None, True),
+        (None, "{United,Delta}", 233, 52, '44', False),
+    ]
+    assert [type(x) for x in rows[1][1:]] == [str, int, int, str, bool]
+
+
+def test_adapt_list_columns():
+    df = pd.DataFrame({
+        'airlines': [["Air \"Dolomiti\", Inc"], ["United", "Delta"]],
+        'layover_location': ["FRA, JFK", None],
+        'layover_time': [52.0, np.nan],
+        'return_departure_datetime': pd.to_datetime([None, "2023-08-28 10:00"]),
+    })
+
+    pg = adapt_for_postgres(df)
+    assert pg['airlines'].tolist() == [['Air "Dolomiti", Inc'], ["United", "Delta"]]
+    assert pg['layover_location'].tolist() == ['{"FRA","JFK"}', None]
+    assert pg['layover_time'].tolist() == [52.0, None]
+    assert pg['return_departure_datetime'].iloc[0] is None
+
+    ms = adapt_for_mssql(df)
+    assert ms['airlines'].tolist() == ['["Air \\"Dolomiti\\", Inc"]', '["United", "Delta"]']
+    assert ms['layover_location'].tolist() == ['["FRA", "JFK"]', None]
+    # the original frame is not modified
+    assert df['layover_location'].iloc[0] == "FRA, JFK"
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.google_flight_analysis.airports import AirportIndex
+from src.google_flight_analysis.scrape import Scrape
+from src.google_flight_analysis.replay import load_tokens
+
+
+@pytest.fixture(scope="module")
+def airports():
+    return AirportIndex.from_csv("assets/airport_data.csv")
+
+
+def test_lookup(airports):
+    dfw = airports["DFW"]
+    assert (dfw.latitude, dfw.longitude, dfw.tz) == (32.896801, -97.038002, "America/Chicago")
+    # name split on its comma in the saved CSV
+    assert airports["EVE"].name == "Harstad/Narvik Airport, Evenes"
+    assert "XXX" not in airports
+    assert list(airports.positions(["DFW", "XXX"]) >= 0) == [True, False]
+
+
+def test_binary_cache_roundtrip(airports, tmp_path):
+    cache = str(tmp_path / "airports.npz")
+    airports.save(cache)
+    loaded = AirportIndex.load("assets/airport_data.csv", cache=cache)
+
+    assert len(loaded) == len(airports)
+    assert loaded["MUC"] == airports["MUC"]
+
+
+def test_enrich(airports):
+    df = airports.enrich(Scrape("DFW", "AVL", "2023-08-19")._clean_results_batch(load_tokens("assets/bigList.csv")).dataframe())
+
+    # AVL -> FLL, both on Eastern Daylight Time in August
+    assert df['distance_km'].iloc[0] == pytest.approx(1066, abs=1)
+    assert df['depart_departure_datetime_utc'].iloc[0] == pd.Timestamp("2023-08-19 21:17")
+    assert df['depart_arrival_datetime_utc'].iloc[0] == pd.Timestamp("2023-08-19 23:15")
+    assert df['return_departure_datetime_utc'].isna().all()
+    assert np.allclose(df['price_per_km'], df['price'] / df['distance_km'])
+
+
+def test_to_utc_unknown_airport_and_nonexistent_time(airports):
+    utc = airports.to_utc(pd.Series(pd.to_datetime(["2023-03-26 02:30", "2023-01-01 12:00"])), ["MUC", "XXX"])
+    assert utc.isna().all()
@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from src.google_flight_analysis.browser import BrowserProfile
+
+
+def test_presets():
+    default = BrowserProfile.preset('default')
+    lean = BrowserProfile.preset('lean')
+
+    assert default.blocked_urls == [] and default.prefs == {}
+    assert "*.woff2" in lean.blocked_urls
+    assert lean.prefs["profile.managed_default_content_settings.images"] == 2
+
+    # both keep the window size the results list needs
+    for profile in (default, lean):
+        arguments = profile.options().arguments
+        assert "--window-size=1920,1080" in arguments and "--headless" in arguments
+    assert "--blink-settings=imagesEnabled=false" in lean.options().arguments
+
+    assert BrowserProfile.preset('lean', blocked_urls=[]).blocked_urls == []
+    with pytest.raises(ValueError):
+        BrowserProfile.preset('tiny')
+
+
+def test_transferred_bytes():
+    def entry(method, params):
+        return {'message': json.dumps({'message': {'method': method, 'params': params}})}
+
+    class FakeDriver:
+        def get_log(self, name):
+            assert name == "performance"
+            return [entry("Network.loadingFinished", {'encodedDataLength': 1000}),
+                    entry("Network.requestWillBeSent", {}),
+                    entry("Network.loadingFinished", {'encodedDataLength': 24})]
+
+    assert BrowserProfile.transferred_bytes(FakeDriver()) == 1024
+    options = BrowserProfile.preset('lean', log_network=True).options()
+    assert options.to_capabilities()["goog:loggingPrefs"] == {"performance": "ALL"}
@@ -0,0 +1,82 @@
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from src.google_flight_analysis.cache import PageCache
+from src.google_flight_analysis.executor import ScrapeJob, ScrapeExecutor
+from src.google_flight_analysis.scrape import Scrape
+from src.google_flight_analysis.replay import load_tokens
+
+
+URL = "https://www.google.com/travel/flights?q=Flights%20to%20AVL%20from%20DFW%20on%202023-08-19%20oneway&curr=USD&gl=US"
+
+
+def test_page_cache_ttl(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=timedelta(hours=1))
+    scraped_at = datetime(2023, 8, 1, 10, 0)
+    cache.put(URL, ["a", "b"], scraped_at)
+
+    assert cache.get(URL, now=scraped_at + timedelta(minutes=30)) == (["a", "b"], scraped_at)
+    assert cache.get(URL, now=scraped_at + timedelta(hours=2)) is None
+    assert cache.get(URL + "x", now=scraped_at) is None
+    assert cache.stats['hits'] == 1
+    assert cache.stats['misses'] == 2
+    assert cache.stats['stale'] == 1
+
+
+def test_page_cache_evicts_oldest_entries(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=timedelta(days=1000))
+    tokens = [str(i) for i in range(1000)]
+    cache.put(URL, tokens, datetime(2023, 8, 1))
+    entry_size = cache.stats['bytes']
+
+    cache = PageCache(str(tmp_path), ttl=timedelta(days=1000), max_bytes=int(entry_size * 1.5))
+    assert cache.stats['bytes'] == entry_size
+    cache.put(URL + "2", tokens, datetime(2023, 8, 2))
+
+    assert cache.stats['evictions'] == 1
+    assert cache.get(URL, now=datetime(2023, 8, 3)) is None
+    assert cache.get(URL + "2", now=datetime(2023, 8, 3)) is not None
+
+
+def test_page_cache_eviction_does_not_list_the_folder(tmp_path, monkeypatch):
+    tokens = [str(i) for i in range(1000)]
+    cache = PageCache(str(tmp_path), ttl=timedelta(days=1000))
+    cache.put(URL, tokens, datetime(2023, 8, 1))
+    cache = PageCache(str(tmp_path), ttl=timedelta(days=1000), max_bytes=int(cache.stats['bytes'] * 2.5))
+
+    def listed():
+        raise AssertionError("cache folder listed")
+
+    monkeypatch.setattr(cache, "_iter_entries", listed)
+    for day in range(2, 6):
+        cache.put(URL + str(day), tokens, datetime(2023, 8, day))
+
+    # room for 2 entries: the 3 oldest are evicted, oldest first
+    assert cache.stats['evictions'] == 3
+    assert cache.get(URL + "3", now=datetime(2023, 8, 6)) is None
+    assert cache.get(URL + "4", now=datetime(2023, 8, 6)) is not None
+
+
+def test_scrape_served_from_cache(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=timedelta(hours=1))
+    scrape = Scrape("DFW", "AVL", "2023-08-19", cache=cache)
+    cache.put(scrape._make_url(), load_tokens("assets/bigList.csv"))
+
+    # no driver pool and no browser: the page can only come from the cache
+    scrape.run_scrape()
+    assert isinstance(scrape.data, pd.DataFrame)
+    assert scrape.data.shape[0] == 8
+    assert cache.stats['hits'] == 1
+
+
+def test_executor_skips_cached_rows(tmp_path):
+    cache = PageCache(str(tmp_path), ttl=timedelta(hours=1))
+    job = ScrapeJob("DFW", "AVL", "2023-08-19")
+    cache.put(Scrape(job.origin, job.dest, job.date_leave)._make_url(), load_tokens("assets/bigList.csv"))
+
+    # no driver pool and no browser: the page can only come from the cache
+    [(_, df)] = ScrapeExecutor(driver_pool=object(), cache=cache).iter_results([job])
+    assert df.shape[0] == 8
+    [(_, df)] = ScrapeExecutor(driver_pool=object(), cache=cache, skip_cached=True).iter_results([job])
+    assert df.empty
@@ -0,0 +1,70 @@
+import json
+
+import pandas as pd
+import pytest
+
+from src.google_flight_analysis.scrape import Scrape, _CARDS_MARKER
+from src.google_flight_analysis.replay import load_tokens
+
+
+class FakeDriver:
+    def __init__(self, payload):
+        self._payload = payload
+        self.scripts = 0
+
+    def execute_script(self, script, *args):
+        self.scripts += 1
+        return self._payload
+
+
+@pytest.fixture(scope="module")
+def scrape():
+    return Scrape("AVL", "FLL", "2023-08-19")
+
+
+@pytest.fixture(scope="module")
+def text_flights(scrape):
+    # the flights of the recorded page, as sliced from its text
+    return scrape._split_results(load_tokens("assets/bigList.csv"))[1]
+
+
+def test_unknown_extraction_mode():
+    with pytest.raises(ValueError):
+        Scrape("AVL", "FLL", "2023-08-19", extraction="html")
+
+
+def test_cards_parse_like_page_text(scrape, text_flights):
+    # the recorded page has no fields, only the text lines of each card
+    payload = {'price_trend': "Prices are currently typical",
+               'cards': [{'lines': ["Best"] + tokens} for tokens in text_flights]}
+    driver = FakeDriver(payload)
+    results = Scrape._get_flight_cards(driver)
+
+    assert driver.scripts == 1
+    assert results[0] == _CARDS_MARKER
+
+    df = scrape._clean_results_batch(results).dataframe()
+    expected = scrape._clean_results_batch(load_tokens("assets/bigList.csv")).dataframe()
+    columns = ['depart_departure_datetime', 'depart_arrival_datetime', 'airlines', 'travel_time', 'origin',
+               'destination', 'layover_n', 'layover_time', 'price']
+    pd.testing.assert_frame_equal(df[columns], expected[columns])
+    assert (df['price_trend'] == "typical").all()
+
+
+def test_card_fields():
+    payload = {'price_trend': None, 'cards': [{
+        'times': ["6:00 AM", "9:37 AM"], 'airline': "Delta", 'duration': "3 hr 37 min",
+        'route': "AVL–FLL", 'stops': "1 stop", 'layover': "46 min ATL",
+        'emissions': "156 kg CO2e\n+73% emissions", 'price': "$217"}]}
+    scrape = Scrape("AVL", "FLL", "2023-08-19")
+    df = scrape._clean_results_batch([_CARDS_MARKER, json.dumps(payload)]).dataframe()
+
+    row = df.iloc[0]
+    assert str(row['depart_departure_datetime']) == "2023-08-19 06:00:00"
+    assert str(row['depart_arrival_datetime']) == "2023-08-19 09:37:00"
+    assert row['airlines'] == ["Delta"]
+    assert (row['origin'], row['destination']) == ("AVL", "FLL")
+    assert (row['travel_time'], row['layover_n'], row['layover_time']) == (217, 1, 46)
+    assert row['layover_location'] == ["ATL"]
+    assert (row['price'], row['price_currency']) == (217, "USD")
+    assert row['price_trend'] is None
@@ -0,0 +1,76 @@
+import pandas as pd
+
+from src.google_flight_analysis.checkpoint import RunCheckpoint
+from src.google_flight_analysis.executor import ScrapeJob
+from src.google_flight_analysis.sink import DatabaseSink
+
+ONE_WAY = ScrapeJob("DFW", "AVL", "2023-10-01")
+ROUND_TRIP = ScrapeJob("DFW", "AVL", "2023-10-01", "2023-10-08")
+OTHER = ScrapeJob("JFK", "IST", "2023-10-02")
+
+
+def results(*prices):
+    return pd.DataFrame({'price': list(prices)})
+
+
+def test_resume_skips_done_and_rewrites_saved(tmp_path):
+    checkpoint = RunCheckpoint(str(tmp_path))
+    checkpoint.save(ONE_WAY, results(1, 2))
+    checkpoint.save(ROUND_TRIP, results(3))
+    checkpoint.commit([ONE_WAY])
+    assert ONE_WAY in checkpoint and ROUND_TRIP in checkpoint and OTHER not in checkpoint
+    # the run dies here
+    checkpoint.close()
+
+    assert RunCheckpoint.latest(str(tmp_path)) == checkpoint.run_id
+    resumed = RunCheckpoint(str(tmp_path), checkpoint.run_id)
+    assert resumed.n_done == 1
+    assert ONE_WAY in resumed and ROUND_TRIP in resumed
+
+    pending = list(resumed.pending())
+    assert [job for job, _ in pending] == [ROUND_TRIP]
+    assert list(pending[0][1]['price']) == [3]
+
+    resumed.commit([ROUND_TRIP])
+    assert list(resumed.pending()) == []
+    resumed.finish()
+    assert RunCheckpoint.latest(str(tmp_path)) is None
+
+
+def test_sink_reports_written_jobs():
+    written = []
+
+    class RecordingDatabase:
+        def __init__(self):
+            self.run_ids = []
+
+        def add_pandas_df_to_db(self, df, method='insert', raise_errors=False):
+            self.run_ids.extend(df['run_id'])
+
+    db = RecordingDatabase()
+    with DatabaseSink(db, flush_rows=3, run_id="run-1", on_written=written.extend) as sink:
+        sink.write(results(1, 2), ONE_WAY)
+        sink.write(results(), OTHER)
+        sink.write(results(3), ROUND_TRIP)
+
+    # a job without results is done too
+    assert set(written) == {ONE_WAY, OTHER, ROUND_TRIP}
+    assert db.run_ids == ["run-1"] * 3
+
+
+def test_jobs_of_a_failed_batch_are_not_committed(tmp_path):
+    class FailingDatabase:
+        def add_pandas_df_to_db(self, df, method='insert', raise_errors=False):
+            raise ValueError("connection lost")
+
+    checkpoint = RunCheckpoint(str(tmp_path))
+    with DatabaseSink(FailingDatabase(), flush_rows=0, on_written=checkpoint.commit) as sink:
+        for job, prices in [(ONE_WAY, (1, 2)), (ROUND_TRIP, (3,))]:
+            checkpoint.save(job, results(*prices))
+            sink.write(results(*prices), job)
+
+    assert sink.stats['failed_batches'] == 2 and checkpoint.n_done == 0
+    # the results are kept, to be written again on resume
+    assert [job for job, _ in checkpoint.pending()] == [ONE_WAY, ROUND_TRIP]
+    checkpoint.close()
+    assert RunCheckpoint.latest(str(tmp_path)) == checkpoint.run_id
@@ -0,0 +1,62 @@
+import pytest
+from selenium.common.exceptions import WebDriverException
+
+from src.google_flight_analysis.driver_pool import DriverPool
+
+
+class FakeDriver:
+    def __init__(self):
+        self.alive = True
+        self.quit_called = False
+        self.window_handles = ["main"]
+
+    @property
+    def current_url(self):
+        if not self.alive:
+            raise WebDriverException("browser is gone")
+        return "about:blank"
+
+    def get(self, url):
+        pass
+
+    def delete_all_cookies(self):
+        pass
+
+    def quit(self):
+        self.quit_called = True
+
+
+def test_driver_pool_reuses_warm_driver():
+    started = []
+    pool = DriverPool(lambda: started.append(FakeDriver()) or started[-1], max_pages=10)
+
+    for _ in range(3):
+        with pool.lease() as driver:
+            assert driver is started[0]
+    pool.close()
+
+    assert len(started) == 1
+    assert started[0].quit_called
+    assert pool.stats['leases'] == 3
+    assert pool.stats['drivers_started'] == 1
+
+
+def test_driver_pool_recycles_and_replaces_unhealthy_drivers():
+    started = []
+    pool = DriverPool(lambda: started.append(FakeDriver()) or started[-1], max_pages=2)
+
+    with pool.lease():
+        pass
+    with pool.lease():
+        pass
+    # max_pages reached: the first driver is quit and a new one is started
+    assert started[0].quit_called
+
+    with pool.lease() as driver:
+        assert driver is started[1]
+    started[1].alive = False
+    with pool.lease() as driver:
+        assert driver is started[2]
+
+    assert pool.stats['drivers_recycled'] == 1
+    assert pool.stats['drivers_unhealthy'] == 1
@@ -0,0 +1,27 @@
+import time
+import pandas as pd
+
+from src.google_flight_analysis.scrape import Scrape
+from src.google_flight_analysis.executor import ScrapeJob, RateLimiter, ScrapeExecutor
+
+
+def test_rate_limiter_spaces_page_loads():
+    limiter = RateLimiter(min_interval=0.05)
+    time_start = time.monotonic()
+    for _ in range(3):
+        limiter.wait()
+    assert time.monotonic() - time_start >= 0.1
+
+
+def test_executor_returns_results_in_job_order(monkeypatch):
+    def fake_run_scrape(self):
+        # later jobs finish first
+        time.sleep(0.01 * (3 - int(self.date_leave[-1])))
+        self.data = pd.DataFrame({'origin': [self.origin], 'depart_departure_datetime': [self.date_leave]})
+
+    monkeypatch.setattr(Scrape, "run_scrape", fake_run_scrape)
+    jobs = [ScrapeJob("MUC", "FCO", f"2023-10-0{i}") for i in range(1, 4)]
+
+    df = ScrapeExecutor(workers=3, driver_pool=object()).run(jobs)
+
+    assert list(df['depart_departure_datetime']) == ["2023-10-01", "2023-10-02", "2023-10-03"]
@@ -0,0 +1,130 @@
+from datetime import datetime
+
+import pytest
+import pandas as pd
+
+from src.google_flight_analysis.flight import Flight
+from src.google_flight_analysis.scrape import Scrape
+from src.google_flight_analysis.replay import load_tokens
+
+
+def load_big_list():
+    return load_tokens("assets/bigList.csv")
+
+
+def make_flight(args, date="2023-08-19"):
+    return Flight(date, False, "DFW", "AVL", (None, None), args)
+
+
+def test_flights_from_big_list():
+    flights = Scrape("DFW", "AVL", "2023-08-19")._clean_results_oneway(load_big_list())
+
+    assert len(flights) == 8
+    assert [f.price for f in flights] == [76, 217, 268, 264, 268, 268, 268, 268]
+
+    flight = flights[3]
+    assert flight.depart_time_leave == datetime(2023, 8, 19, 15, 48)
+    assert flight.depart_time_arrive == datetime(2023, 8, 19, 22, 10)
+    assert flight.depart_day_leave == "Saturday"
+    assert flight.airline == ["United"]
+    assert flight.flight_time == "6 hr 22 min"
+    assert (flight.origin, flight.dest) == ("AVL", "FLL")
+    assert (flight.num_stops, flight.stops, flight.stops_locations) == (1, "1 hr 5 min", ["ORD"])
+    assert (flight.co2, flight.emissions, flight.currency) == (234, 160, "USD")
+
+
+@pytest.mark.parametrize("args, attribute, expected", [
+    (["11:50PM", "6:05AM+1"], "depart_time_arrive", datetime(2023, 8, 20, 6, 5)),
+    (["12:15AM", "12:45PM"], "depart_time_leave", datetime(2023, 8, 19, 0, 15)),
+    (["12:15AM", "12:45PM"], "depart_time_arrive", datetime(2023, 8, 19, 12, 45)),
+    (["LufthansaCondorOperated by Eurowings"], "airline", ["Lufthansa", "Condor"]),
+    (["Change of airport"], "stops_locations", ["Change of airport"]),
+    (["1,234"], "price", 1234),
+    (["Price unavailable"], "price", 0),
+    (["Avg emissions"], "emissions", 0),
+    (["1,120 kg CO2"], "co2", 1120),
+    (["2 stops", "Lufthansa", "3 hr 5 min FRA, JFK", "FRA, JFK"], "stops_locations", ["FRA", "JFK"]),
+])
+def test_classify_arg(args, attribute, expected):
+    assert getattr(make_flight(args), attribute) == expected
+
+
+def test_classify_arg_falls_through_when_attribute_is_set():
+    # a second duration-like token is not a flight time anymore: it becomes the airline
+    flight = make_flight(["1 hr 58 min", "2 hr"])
+    assert flight.flight_time == "1 hr 58 min"
+    assert flight.airline == ["2 hr"]
+
+
+def test_flight_batch_matches_flight_dataframe():
+    scrape = Scrape("DFW", "AVL", "2023-08-19")
+    expected = Flight.dataframe(scrape._clean_results_oneway(load_big_list()))
+    df = scrape._clean_results_batch(load_big_list()).dataframe()
+
+    assert list(df.columns) == list(expected.columns)
+    for col in ['depart_departure_datetime', 'depart_arrival_day', 'airlines', 'travel_time', 'origin',
+                'layover_n', 'layover_time', 'layover_location', 'price', 'price_trend', 'price_value', 'one_way']:
+        pd.testing.assert_series_equal(df[col], expected[col], check_dtype=False)
+
+
+def test_flight_batch_concatenates_pages():
+    scrape = Scrape("DFW", "AVL", "2023-08-19")
+    batch = scrape._clean_results_batch(load_big_list())
+    scrape._clean_results_batch(load_big_list(), batch)
+
+    df = batch.dataframe()
+    assert len(batch) == df.shape[0] == 16
+    assert df['return_departure_datetime'].isna().all()
+
+
+def test_section_spans_of_round_trip_page():
+    res2 = [x.encode("ascii", "ignore").decode().strip() for x in load_big_list()]
+    sections = Scrape._section_spans(Scrape._scan_markers(res2), len(res2))
+
+    # departing flights, then one section of returning flights per departing flight
+    assert len(sections) == res2.count("Sort by:")
+    (start, mid_start), (mid_end, end) = sections[0]
+    assert res2[start - 1] == "Sort by:"
+    assert res2[mid_start] == "Price insights"
+    assert res2[mid_end - 1] == "Other departing flights"
+    assert res2[end] == "34 more flights"
+    assert res2[sections[1][0][1]].startswith("Language")
+
+    flights = Scrape("DFW", "AVL", "2023-08-19", date_return="2023-08-28")._clean_results_oneway(load_big_list())
+    assert (flights[-1].origin, flights[-1].dest, flights[-1].price) == ("FLL", "AVL", 76)
+
+
+def test_durations_in_minutes_matches_row_by_row():
+    values = ["3 hr 20 min", "20 min", "5 hr", None, ["Change of airport"], "3 hr 20 min"]
+    expected = pd.Series(values, dtype=object).apply(Flight.get_duration_in_minutes_from_string)
+
+    durations = Flight.get_durations_in_minutes(values)
+    pd.testing.assert_series_equal(durations, expected)
+    assert Flight.get_durations_in_minutes(["1 hr 58 min", "2 hr"]).tolist() == [118, 120]
+
+    with pytest.raises(ValueError):
+        Flight.get_durations_in_minutes(["1 hr", "Nonstop"])
+
+
+def test_flight_keeps_no_parse_state():
+    flight = make_flight(["11:50PM", "6:05AM+1", "Lufthansa", "garbage"])
+
+    assert not hasattr(flight, "__dict__")
+    assert not hasattr(flight, "_times") and not hasattr(flight, "_trash")
+    assert (flight.id, flight.dow) == (1, 6)
+
+
+def test_parquet_export_roundtrip(tmp_path):
+    df = Scrape("DFW", "AVL", "2023-08-19")._clean_results_batch(load_big_list()).dataframe()
+    df['access_date'] = pd.Timestamp("2023-08-01 10:00")
+    later = df.assign(access_date=pd.Timestamp("2023-08-03 10:00"), origin="MUC")
+    Flight.export_to_parquet(df, str(tmp_path))
+    Flight.export_to_parquet(later, str(tmp_path))
+
+    loaded = Flight.read_parquet(str(tmp_path), origin="AVL", start="2023-08-01", end="2023-08-02")
+    assert len(loaded) == len(df)
+    assert loaded['airlines'].iloc[0].tolist() == ["Allegiant"]
+    assert loaded['depart_departure_datetime'].iloc[0] == datetime(2023, 8, 19, 17, 17)
+    assert loaded['price'].tolist() == df['price'].tolist()
+
+    assert len(Flight.read_parquet(str(tmp_path), start="2023-08-02")) == len(later)
@@ -0,0 +1,152 @@
+import threading
+import time
+
+import pandas as pd
+import pytest
+
+from src.google_flight_analysis.executor import ScrapeJob, ScrapeExecutor
+from src.google_flight_analysis.jobqueue import JobQueue
+
+JOBS = [ScrapeJob("DFW", "AVL", f"2023-10-{day:02d}") for day in range(1, 21)] + \
+       [ScrapeJob("DFW", "AVL", "2023-10-01", "2023-10-08")]
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = JobQueue.sqlite(path)
+    queue.create()
+    queue.add(JOBS)
+    return path
+
+
+def test_add_is_idempotent(path):
+    queue = JobQueue.sqlite(path)
+    queue.add(JOBS[:5], priority=10)
+    assert queue.counts() == {'pending': 21, 'leased': 0, 'done': 0, 'failed': 0}
+
+    claimed = queue.claim("w1", 2)
+    assert [c.job for c in claimed] == JOBS[:2]
+    assert [c.attempts for c in claimed] == [1, 1]
+    # round trip jobs keep their return date
+    assert JOBS[-1] in [c.job for c in queue.claim("w1", 100)]
+
+
+def test_workers_never_share_a_job(path):
+    claimed = []
+
+    def work(worker):
+        queue = JobQueue.sqlite(path)
+        while True:
+            jobs = queue.claim(worker, 3)
+            if not jobs:
+                return
+            claimed.extend(c.job for c in jobs)
+            queue.complete([c.id for c in jobs])
+
+    threads = [threading.Thread(target=work, args=(f"w{i}",)) for i in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(claimed) == len(JOBS) and set(claimed) == set(JOBS)
+    assert JobQueue.sqlite(path).counts()['done'] == len(JOBS)
+
+
+def test_expired_leases_are_reclaimed(path):
+    queue = JobQueue.sqlite(path, lease_seconds=0.2, max_attempts=2)
+    first = queue.claim("dead", 1)[0]
+    alive = queue.claim("alive", 1)[0]
+
+    time.sleep(0.3)
+    assert queue.heartbeat("alive", [alive.id]) == 1
+
+    # the dead worker's job is claimed again, the heartbeated one is not
+    reclaimed = queue.claim("w2", 2)
+    assert [c.job for c in reclaimed] == [first.job, JOBS[2]]
+    assert reclaimed[0].attempts == 2
+    assert queue.heartbeat("dead", [first.id]) == 0
+
+    # its last lease expires too: failed
+    time.sleep(0.3)
+    queue.claim("w3", 1)
+    assert queue.counts()['failed'] == 1
+
+
+def test_fail_and_release(path):
+    queue = JobQueue.sqlite(path, max_attempts=2)
+    job = queue.claim("w1", 1)[0]
+    queue.fail("w1", job.id, "timeout")
+    assert queue.counts()['pending'] == 21
+
+    # requeued behind the jobs not tried yet
+    claimed = queue.claim("w1", 100)
+    assert [c.job for c in claimed[:-1]] == JOBS[1:] and claimed[-1].job == job.job
+    queue.release("w1", [c.id for c in claimed[:-1]])
+    job = claimed[-1]
+    assert job.attempts == 2
+    queue.fail("w1", job.id, "timeout")
+    assert queue.counts()['failed'] == 1
+
+    claimed = queue.claim("w1", 5)
+    assert queue.release("w1", [c.id for c in claimed[:2]]) == 2
+    assert queue.claim("w2", 1)[0].attempts == 1
+
+
+def test_plan_schedules_failed_jobs_again(path):
+    queue = JobQueue.sqlite(path, max_attempts=1)
+    failed = queue.claim("w1", 1)[0]
+    queue.fail("w1", failed.id, "timeout")
+    done = queue.claim("w1", 1)[0]
+    queue.complete([done.id])
+    assert queue.counts()['failed'] == 1 and queue.counts()['done'] == 1
+
+    queue.plan(JOBS)
+    assert queue.counts() == {'pending': len(JOBS), 'leased': 0, 'done': 0, 'failed': 0}
+    claimed = queue.claim("w2", 100)
+    assert failed.job in [c.job for c in claimed] and done.job in [c.job for c in claimed]
+
+
+def test_consumer(path):
+    queue = JobQueue.sqlite(path, lease_seconds=60)
+    with queue.consume("w1", prefetch=2) as consumer:
+        assert len(consumer) == len(JOBS)
+        for i, job in enumerate(consumer):
+            if i == 0:
+                consumer.failed(job, "no results")
+            elif i < 10:
+                consumer.done(job)
+            else:
+                # stops with jobs still held
+                break
+
+    # done: 9, failed once then given back with the unfinished ones
+    assert queue.counts() == {'pending': 12, 'leased': 0, 'done': 9, 'failed': 0}
+
+
+def test_consumer_runs_to_the_end_of_the_queue(path, monkeypatch):
+    def fake_run_job(self, job, driver_pool):
+        return type("FakeScrape", (), {'data': pd.DataFrame({'price': [100]})})(), 0.0
+
+    monkeypatch.setattr(ScrapeExecutor, "_run_job", fake_run_job)
+    queue = JobQueue.sqlite(path, lease_seconds=60)
+    # a lease of another worker is waited for, until it is done
+    other = queue.claim("w2", 1)[0]
+    threading.Timer(0.2, queue.complete, args=([other.id],)).start()
+
+    done = []
+
+    def work():
+        with queue.consume("w1", prefetch=2, poll_interval=0.05) as consumer:
+            for job, _ in ScrapeExecutor(workers=1, driver_pool=object()).iter_results(consumer):
+                consumer.done(job)
+                done.append(job)
+
+    worker = threading.Thread(target=work, daemon=True)
+    worker.start()
+    worker.join(timeout=10)
+
+    assert not worker.is_alive()
+    assert len(done) == len(JOBS) - 1 and other.job not in done
+    assert queue.counts() == {'pending': 0, 'leased': 0, 'done': len(JOBS), 'failed': 0}
@@ -0,0 +1,62 @@
+import json
+
+import pytest
+
+from src.google_flight_analysis.metrics import Histogram, Metrics
+
+
+def test_histogram_buckets_and_quantiles():
+    h = Histogram(buckets=(0.1, 1, 10))
+    for value in [0.05, 0.05, 0.5, 2, 20]:
+        h.observe(value)
+
+    assert (h.count, h.min, h.max) == (5, 0.05, 20)
+    assert h.sum == pytest.approx(22.6)
+    assert h.cumulative_buckets() == [(0.1, 2), (1, 3), (10, 4), (float('inf'), 5)]
+    assert h.quantile(0.4) == 0.1
+    assert h.quantile(0.5) == 1
+    # last bucket: the max instead of inf
+    assert h.quantile(1) == 20
+    assert Histogram().quantile(0.5) is None
+
+
+def test_span_records_per_label_even_on_error():
+    m = Metrics()
+    with m.span("scrape", phase="parse"):
+        pass
+    with pytest.raises(ValueError):
+        with m.span("scrape", phase="page_load"):
+            raise ValueError()
+
+    assert m.get("scrape_seconds", phase="parse").count == 1
+    assert m.get("scrape_seconds", phase="page_load").count == 1
+    assert m.get("scrape_seconds", phase="consent") is None
+
+    m.reset()
+    assert m.to_dict() == {}
+
+
+def test_export_prometheus_and_json(tmp_path):
+    m = Metrics(buckets=(1, 10))
+    m.observe("scrape_seconds", 0.5, phase="parse")
+    m.observe("scrape_seconds", 5, phase="parse")
+    m.observe("database_seconds", 2, phase="copy", db="postgre")
+
+    text = m.to_prometheus()
+    assert "# TYPE scrape_seconds histogram" in text
+    assert 'scrape_seconds_bucket{phase="parse",le="1"} 1' in text
+    assert 'scrape_seconds_bucket{phase="parse",le="+Inf"} 2' in text
+    assert 'scrape_seconds_count{phase="parse"} 2' in text
+    assert 'database_seconds_sum{db="postgre",phase="copy"} 2' in text
+
+    m.export(str(tmp_path / "out" / "metrics.json"))
+    with open(tmp_path / "out" / "metrics.json") as f:
+        exported = json.load(f)
+    assert exported["scrape_seconds"][0]["labels"] == {"phase": "parse"}
+    assert exported["scrape_seconds"][0]["count"] == 2
+
+    m.export(str(tmp_path / "metrics.prom"))
+    assert (tmp_path / "metrics.prom").read_text() == text
+
+    # slowest series first
+    assert m.summary()[0].startswith("scrape_seconds{phase=parse}: n=2")
@@ -0,0 +1,83 @@
+import configparser
+from datetime import datetime, timedelta
+from itertools import product
+
+import pytest
+
+from src.google_flight_analysis.executor import ScrapeJob
+from src.google_flight_analysis.planner import SchedulePlanner, FreshnessFilter
+
+
+def grid(leave, ret, flexible_days):
+    """
+    Round trip grid of the nested loops formerly in flight_analysis.py.
+    """
+    leave, ret = datetime.strptime(leave, "%Y-%m-%d"), datetime.strptime(ret, "%Y-%m-%d")
+    days = range(-flexible_days, flexible_days + 1)
+    return [((leave + timedelta(days=i)).strftime("%Y-%m-%d"), (ret + timedelta(days=j)).strftime("%Y-%m-%d"))
+            for i, j in product(days, days) if leave + timedelta(days=i) < ret + timedelta(days=j)]
+
+
+@pytest.mark.parametrize("leave, ret, flexible_days", [
+    ("2023-09-02", "2023-11-07", 2),
+    ("2023-10-01", "2023-10-03", 3),  # overlapping leave and return days
+    ("2023-10-01", "2023-10-01", 0),  # no valid pair
+])
+def test_round_trip_grid_matches_nested_loops(leave, ret, flexible_days):
+    planner = SchedulePlanner([["DFW", "AVL", leave, ret, flexible_days]])
+
+    jobs = list(planner)
+    assert [(job.date_leave, job.date_return) for job in jobs] == grid(leave, ret, flexible_days)
+    assert planner.count() == len(jobs)
+
+
+def test_stay_constraints():
+    planner = SchedulePlanner([["DFW", "AVL", "2023-10-01", "2023-10-05", 2]], min_stay=3, max_stay=4)
+
+    stays = [(datetime.strptime(j.date_return, "%Y-%m-%d") - datetime.strptime(j.date_leave, "%Y-%m-%d")).days
+             for j in planner]
+    assert stays and min(stays) == 3 and max(stays) == 4
+    assert len(planner) == len(stays)
+
+
+def test_overlapping_routes_are_coalesced():
+    today = datetime(2023, 9, 30)
+    planner = SchedulePlanner([["MUC", "FCO", 3], ["MUC", "FCO", "2023-10-02", 1], ["FCO", "MUC", 1]], today=today)
+
+    assert list(planner) == [
+        ScrapeJob("MUC", "FCO", "2023-10-01"),
+        ScrapeJob("MUC", "FCO", "2023-10-02"),
+        ScrapeJob("MUC", "FCO", "2023-10-03"),
+        ScrapeJob("FCO", "MUC", "2023-10-01"),
+    ]
+    assert planner.count() == 4
+
+
+def test_invalid_route():
+    with pytest.raises(ValueError):
+        SchedulePlanner([["MUC", "FCO", "2023-10-02"]])
+
+
+def test_freshness_filter_skips_recent_searches():
+    now = datetime(2023, 10, 1, 12)
+
+    class LatestScrapes:
+        def latest_access_dates(self, since):
+            self.since = since
+            return {
+                ("MUC", "FCO", "2023-10-02", None): now - timedelta(hours=2),
+                ("MUC", "FCO", "2023-10-03", None): now - timedelta(hours=30),
+                ("FCO", "MUC", "2023-10-02", None): now - timedelta(hours=2),
+            }
+
+    config = configparser.ConfigParser()
+    config.read_string("[freshness]\nenabled = true\nhours = 24\nfco_muc = 1\n")
+    db = LatestScrapes()
+    skip = FreshnessFilter.from_config(db, config["freshness"], now=now)
+
+    planner = SchedulePlanner([["MUC", "FCO", "2023-10-02", 1], ["FCO", "MUC", "2023-10-02", 0]], skip=skip)
+
+    assert db.since == now - timedelta(hours=24)
+    assert [(job.origin, job.date_leave) for job in planner] == [("MUC", "2023-10-01"), ("MUC", "2023-10-03"),
+                                                                ("FCO", "2023-10-02")]
+    assert planner.count() == 3
@@ -0,0 +1,18 @@
+from src.google_flight_analysis.scrape import Scrape
+
+
+def test_page_state_defaults(page_driver):
+    assert Scrape._page_state(page_driver([None], "")) == {'lines': 0, 'terms': False, 'no_flights': False}
+    assert Scrape._page_state(page_driver([{'lines': 3}], ""))['lines'] == 3
+
+
+def test_whole_text_pulled_once_when_ready(page_driver):
+    text = "\n".join(f"line {i}" for i in range(50))
+    driver = page_driver([None, {'lines': 5}, {'lines': 20}, {'lines': 50}], text)
+
+    results = Scrape._make_url_request("https://example.com", driver, None)
+
+    assert results == text.split("\n")
+    assert driver.text_pulls == 1
+    # terms check, then polls until more than 40 lines
+    assert driver.scripts == 4
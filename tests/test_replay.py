@@ -0,0 +1,41 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+
+from src.google_flight_analysis.scrape import Scrape
+from src.google_flight_analysis.replay import load_tokens, recording_filename, parse_recording_filename
+
+
+def test_replay_recorded_page():
+    scrape = Scrape("DFW", "AVL", "2023-08-19", replay="assets/bigList.csv")
+    scrape.run_scrape()
+
+    assert isinstance(scrape.data, pd.DataFrame)
+    assert scrape.data.shape[0] == 8
+
+    in_memory = Scrape("DFW", "AVL", "2023-08-19", replay=load_tokens("assets/bigList.csv"))
+    in_memory.run_scrape()
+    assert in_memory.data['price'].tolist() == scrape.data['price'].tolist()
+
+
+def test_record_and_replay_folder(tmp_path):
+    scrape = Scrape("DFW", "AVL", "2023-08-19", record=str(tmp_path))
+    scrape._record_results(load_tokens("assets/bigList.csv"))
+
+    recordings = os.listdir(tmp_path)
+    assert len(recordings) == 1
+
+    params = parse_recording_filename(recordings[0])
+    assert (params['origin'], params['dest'], params['date_leave'], params['date_return']) == ("DFW", "AVL", "2023-08-19", None)
+
+    df = Scrape.replay_folder(str(tmp_path))
+    assert df.shape[0] == 8
+    assert (df['access_date'] == params['access_date']).all()
+
+
+def test_recording_filename_round_trip():
+    filename = recording_filename("MUC", "FCO", "2023-10-01", "2023-10-08", datetime(2023, 9, 1, 8, 30, 15))
+    assert filename == "230901_083015_MUC_FCO_231001_231008.csv"
+    assert parse_recording_filename(filename)['date_return'] == "2023-10-08"
+    assert parse_recording_filename("bigList.csv") is None
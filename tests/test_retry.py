@@ -0,0 +1,76 @@
+import time
+
+import pandas as pd
+import pytest
+
+from src.google_flight_analysis.executor import ScrapeJob, ScrapeExecutor
+from src.google_flight_analysis.retry import (CircuitBreaker, EmptyResultsError, NoFlightsError, RetryPolicy,
+                                              ScrapeTimeout)
+from src.google_flight_analysis.scrape import Scrape
+
+
+def test_retry_policy():
+    policy = RetryPolicy(max_attempts=3, base_delay=1, max_delay=3, jitter=0.5)
+    assert policy.should_retry(ScrapeTimeout(), 1) and policy.should_retry(EmptyResultsError(), 2)
+    assert not policy.should_retry(ScrapeTimeout(), 3)
+    assert not policy.should_retry(NoFlightsError(), 1) and not policy.should_retry(ValueError(), 1)
+
+    for attempt, delay in [(1, 1), (2, 2), (3, 3), (4, 3)]:
+        assert delay / 2 <= policy.delay(attempt) <= delay
+
+
+def test_circuit_breaker_opens_and_closes():
+    breaker = CircuitBreaker(window=4, failure_rate=0.5, min_calls=4, cooldown=0.1)
+    breaker.record_success()
+    breaker.record_failure(ScrapeTimeout())
+    breaker.record_failure(NoFlightsError())  # not a failure
+    breaker.record_failure(ValueError())  # not counted
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure(EmptyResultsError())
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # no page goes through during the cooldown, then a trial page fails
+    time_start = time.monotonic()
+    breaker.wait()
+    assert time.monotonic() - time_start >= 0.09
+    breaker.record_failure(ScrapeTimeout())
+    assert breaker.state == CircuitBreaker.OPEN and breaker.n_opened == 2
+
+    breaker.wait()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_executor_retries_and_classifies(monkeypatch):
+    attempts = {}
+
+    def fake_run_scrape(self):
+        attempts[self.date_leave] = attempts.get(self.date_leave, 0) + 1
+        if self.date_leave.endswith("1") and attempts[self.date_leave] < 3:
+            raise ScrapeTimeout("slow page")
+        if self.date_leave.endswith("2"):
+            raise NoFlightsError("no flights")
+        if self.date_leave.endswith("3"):
+            raise ValueError("parsing bug")
+        self.data = pd.DataFrame({'price': [100]})
+
+    monkeypatch.setattr(Scrape, "run_scrape", fake_run_scrape)
+    jobs = [ScrapeJob("MUC", "FCO", f"2023-10-0{i}") for i in range(1, 4)]
+    errors = []
+    executor = ScrapeExecutor(workers=2, driver_pool=object(),
+                              retry_policy=RetryPolicy(max_attempts=3, base_delay=0.01),
+                              circuit_breaker=CircuitBreaker())
+
+    results = list(executor.iter_results(jobs, on_error=lambda job, e: errors.append(job)))
+
+    assert attempts == {"2023-10-01": 3, "2023-10-02": 1, "2023-10-03": 1}
+    # no flights: done, without results
+    assert [job for job, _ in results] == jobs[:2] and results[1][1].empty
+    assert errors == [jobs[2]]
+
+
+def test_page_without_flights_is_not_waited_for(page_driver):
+    driver = page_driver([None, {'lines': 12, 'no_flights': True}], "")
+    with pytest.raises(NoFlightsError):
+        Scrape._make_url_request("https://example.com", driver, None)
+    assert driver.text_pulls == 0
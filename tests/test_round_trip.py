@@ -0,0 +1,101 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
+
+from src.google_flight_analysis.scrape import Scrape, _DEPARTING_OPTION_MARKER, _RETURN_SECTION_MARKER
+from src.google_flight_analysis.replay import load_tokens
+
+
+class FakeDriver:
+    """
+    Round trip results page with `n_options` departing options, the harvesting script of option `fail_at`
+    times out in the page, or raises `raises` if given.
+    """
+
+    def __init__(self, n_options, option, fail_at=None, raises=None):
+        self._n_options = n_options
+        self._option = option
+        self._fail_at = fail_at
+        self._raises = raises
+        self.async_scripts = []
+        self.timeouts = SimpleNamespace(script=30)
+
+    def execute_script(self, script, *args):
+        return self._n_options
+
+    def set_script_timeout(self, seconds):
+        self.timeouts.script = seconds
+
+    def execute_async_script(self, script, index, timeout_ms):
+        self.async_scripts.append(index)
+        assert self.timeouts.script == 2 * timeout_ms / 1000 + 5
+        if index == self._fail_at:
+            if self._raises is not None:
+                raise self._raises
+            return {'error': 'timeout waiting for return flights'}
+        return self._option
+
+
+@pytest.fixture(scope="module")
+def page():
+    return load_tokens("assets/bigList.csv")
+
+
+@pytest.fixture(scope="module")
+def option(page):
+    # an option's text as shown in the page, and a return section taken from the recorded page
+    sort_by = [i for i, x in enumerate(page) if x == "Sort by:"]
+    departing = ["Best", "5:17 PM", "–", "7:15 PM", "Allegiant", "1 hr 58 min", "AVL–FLL", "Nonstop",
+                 "$76", "round trip"]
+    return {'departing': departing, 'returning': page[sort_by[0]:sort_by[1]]}
+
+
+def test_harvest_one_script_call_per_option(option):
+    driver = FakeDriver(3, option)
+    results = Scrape._harvest_return_flights(driver, timeout=15)
+
+    assert driver.async_scripts == [0, 1, 2]
+    assert results.count(_DEPARTING_OPTION_MARKER) == 3
+    assert results.count(_RETURN_SECTION_MARKER) == 3
+
+    # stops at the first failure, keeping the options harvested so far
+    driver = FakeDriver(3, option, fail_at=1)
+    assert Scrape._harvest_return_flights(driver, timeout=15).count(_DEPARTING_OPTION_MARKER) == 1
+    assert driver.async_scripts == [0, 1]
+    assert driver.timeouts.script == 30
+
+
+@pytest.mark.parametrize("error", [TimeoutException("script timeout"), StaleElementReferenceException("stale")])
+def test_harvest_keeps_options_when_the_driver_raises(option, error):
+    driver = FakeDriver(4, option, fail_at=2, raises=error)
+    results = Scrape._harvest_return_flights(driver, timeout=15)
+
+    assert results.count(_DEPARTING_OPTION_MARKER) == 2
+    assert driver.async_scripts == [0, 1, 2]
+    # the pooled driver gets its script timeout back
+    assert driver.timeouts.script == 30
+
+
+def test_return_flights_tagged_with_departing_flight(page, option):
+    scrape = Scrape("AVL", "FLL", "2023-08-19", date_return="2023-08-25")
+    # the page's own return section is left out once return flights are harvested
+    n_departing = len(scrape._split_results(page, return_section=False)[1])
+
+    results = page + Scrape._harvest_return_flights(FakeDriver(2, option), timeout=15)
+    df = scrape._clean_results_batch(results).dataframe()
+
+    # the departing flights of the page, then one row per (departing option, return flight)
+    n_returns = (len(df) - n_departing) // 2
+    assert n_returns > 0
+    assert len(df) == n_departing + 2 * n_returns
+    assert df['return_departure_datetime'][:n_departing].isna().all()
+
+    harvested = df[n_departing:]
+    assert (harvested['depart_departure_datetime'] == np.datetime64("2023-08-19T17:17")).all()
+    assert (harvested['airlines'].str[0] == "Allegiant").all()
+    assert harvested['return_departure_datetime'].notna().all()
+    assert (harvested['return_departure_datetime'].dt.strftime("%Y-%m-%d") == "2023-08-25").all()
+    assert (harvested['return_departure_day'] == "Friday").all()
+    assert not harvested['one_way'].any()
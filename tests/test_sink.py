@@ -0,0 +1,68 @@
+import threading
+
+import pandas as pd
+
+from src.google_flight_analysis.sink import DatabaseSink
+
+
+class RecordingDatabase:
+    def __init__(self, fail_on=None):
+        self.batches = []
+        self.fail_on = fail_on
+
+    def add_pandas_df_to_db(self, df, method='insert', raise_errors=False):
+        assert raise_errors
+        if self.fail_on is not None and len(self.batches) == self.fail_on:
+            self.fail_on = None
+            raise ValueError("connection lost")
+        self.batches.append((list(df['price']), method))
+
+
+def results(*prices):
+    return pd.DataFrame({'price': list(prices)})
+
+
+def test_sink_flushes_every_n_rows_in_order():
+    db = RecordingDatabase()
+    with DatabaseSink(db, method='bulk', flush_rows=3) as sink:
+        sink.write(results(1, 2))
+        sink.write(results(3))
+        sink.write(results())
+        sink.write(results(4, 5))
+
+    assert db.batches == [([1, 2, 3], 'bulk'), ([4, 5], 'bulk')]
+    assert sink.stats['rows_written'] == 5
+
+
+def test_sink_keeps_writing_after_a_failed_batch():
+    db = RecordingDatabase(fail_on=0)
+    with DatabaseSink(db, flush_rows=0) as sink:
+        sink.write(results(1))
+        sink.write(results(2))
+
+    assert db.batches == [([2], 'insert')]
+    assert sink.stats['failed_batches'] == 1
+
+
+def test_sink_blocks_when_queue_is_full():
+    release = threading.Event()
+
+    class SlowDatabase(RecordingDatabase):
+        def add_pandas_df_to_db(self, df, method='insert', raise_errors=False):
+            release.wait()
+            super().add_pandas_df_to_db(df, method, raise_errors)
+
+    db = SlowDatabase()
+    sink = DatabaseSink(db, flush_rows=0, queue_size=1)
+    sink.write(results(1))  # taken by the writer thread
+    sink.write(results(2))  # waits in the queue
+
+    writer = threading.Thread(target=sink.write, args=(results(3),))
+    writer.start()
+    writer.join(0.1)
+    assert writer.is_alive()
+
+    release.set()
+    writer.join()
+    sink.close()
+    assert [prices for prices, _ in db.batches] == [[1], [2], [3]]
@@ -2,8 +2,7 @@ import os
 import logging
 import logging.config
 import json
-import requests #Airport codes eventually
-import csv #Airport codes eventually
+import requests
 
 # logging
 LOGS_PATH = os.path.join(os.path.dirname(__file__), "logs")
@@ -59,31 +58,24 @@ def get_routes_from_config(config_obj):
     return routes
 
 
-# TODO: I want to do something with these codes. Not sure what yet...
 def updateAirportCodes(pullNewData=True):
-    
+    """
+    Returns the AirportIndex of assets/airport_data.csv, downloading the latest OpenFlights data first.
+    The parsed index is cached next to the CSV (airport_data.npz) until the CSV changes.
+    """
+    # imported here: utils is imported before logging is configured, the airports module (and numpy) is not needed then
+    from src.google_flight_analysis.airports import AirportIndex, AIRPORT_DATA_PATH
+
     if pullNewData:
-        # Step 1: Pull data from the URL
         url = "https://raw.githubusercontent.com/jpatokal/openflights/master/data/airports.dat"
         response = requests.get(url)
-        data = response.text
+        response.raise_for_status()
 
-        # Step 2: Save data to a local CSV file
-        filename = "airport_data.csv"
-        with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-            writer = csv.writer(csvfile)
-            lines = data.split('\n')
-            for line in lines:
-                writer.writerow(line.split(','))
+        # save the data as is: it is already a CSV file
+        with open(AIRPORT_DATA_PATH, 'w', newline='', encoding='utf-8') as csvfile:
+            csvfile.write(response.text)
 
-    # Step 3: Load data from the CSV file
-    airport_data = []
-    with open(filename, 'r', encoding='utf-8') as csvfile:
-        reader = csv.reader(csvfile)
-        for row in reader:
-            airport_data.append([row[3], row[4]])
-    
-    return airport_data
+    return AirportIndex.load(AIRPORT_DATA_PATH, cache=os.path.splitext(AIRPORT_DATA_PATH)[0] + ".npz")
 
 
 # A quick check on config.ini formats. Not perfect but will catch most.